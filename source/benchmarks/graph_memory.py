@@ -0,0 +1,51 @@
+"""
+Compare the memory used by note relations in the object model against the
+CSR arrays of GraphStore on a synthetic vault.
+
+Run from the source directory:
+    python -m benchmarks.graph_memory --notes 100000 --links 10
+"""
+import argparse
+import tracemalloc
+from models.Note import Note
+from models.GraphStore import GraphStore
+from benchmarks.vault import build_vault, reset_notes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--notes', type=int, default=100_000)
+    parser.add_argument('--links', type=int, default=10)
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    reset_notes()
+    notes_only = tracemalloc.get_traced_memory()[0]
+    notes = build_vault(args.notes, args.links)
+    with_links = tracemalloc.get_traced_memory()[0]
+
+    edges = sum(len(n.parents) + len(n.children) + len(n.neighbors) for n in notes)
+    empty = [Note("", "") for _ in range(args.notes)]
+    # Subtract the cost of the same notes without any relations
+    baseline = tracemalloc.get_traced_memory()[0] - with_links
+    # The empty notes joined the vault: forget them all, `notes` keeps the
+    # generated ones alive for the store
+    del empty
+    reset_notes()
+
+    before_store = tracemalloc.get_traced_memory()[0]
+    store = GraphStore(notes)
+    store_total = tracemalloc.get_traced_memory()[0] - before_store
+    tracemalloc.stop()
+
+    object_model = with_links - notes_only - baseline
+    print(f"notes: {args.notes:,}  directed edges: {edges:,}")
+    print(f"object model relations: {object_model / 2**20:8.1f} MiB "
+          f"({object_model / edges:6.1f} B/edge)")
+    print(f"CSR arrays:             {store.nbytes() / 2**20:8.1f} MiB "
+          f"({store.nbytes() / edges:6.1f} B/edge)")
+    print(f"GraphStore incl. index: {store_total / 2**20:8.1f} MiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Time loading a synthetic vault from the JSON snapshot against the
+memory-mapped binary snapshot (plain and block-compressed).
+
+Run from the source directory:
+    python -m benchmarks.snapshot_startup --notes 100000 --text 2000
+"""
+import argparse
+import os
+import tempfile
+import time
+from models.NoteState import NoteState
+from benchmarks.vault import build_vault, reset_notes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--notes', type=int, default=100_000)
+    parser.add_argument('--links', type=int, default=5)
+    parser.add_argument('--text', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    notes = build_vault(args.notes, args.links, args.text)
+    with tempfile.TemporaryDirectory() as directory:
+        variants = {
+            'json': NoteState(os.path.join(directory, 'json', 'notes.json')),
+            'binary': NoteState(os.path.join(directory, 'binary', 'notes.json'), 'binary'),
+            'binary+zlib': NoteState(os.path.join(directory, 'zlib', 'notes.json'), 'binary', True),
+        }
+        for state in variants.values():
+            os.makedirs(os.path.dirname(state.filename))
+            state.save_notes(notes)
+
+        print(f"notes: {args.notes:,}  text: {args.text} chars")
+        for name, state in variants.items():
+            size = os.path.getsize(state._snapshot_filename())
+            best = float('inf')
+            for _ in range(args.repeat):
+                reset_notes()
+                start = time.perf_counter()
+                loaded = state.load_notes()
+                best = min(best, time.perf_counter() - start)
+                assert len(loaded) == len(notes)
+            print(f"{name:12} {size / 2**20:8.1f} MiB  load {best * 1000:8.1f} ms")
+            state.snapshot = None
+
+
+if __name__ == '__main__':
+    main()
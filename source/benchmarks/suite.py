@@ -0,0 +1,290 @@
+"""
+Headless benchmark suite: saving and loading, search, statistics, note
+events and graph layout timed on a generated vault, with the results kept as JSON.
+
+The vault comes from build_realistic_vault: power-law hubs, hierarchies
+up to 12 levels deep and log-normal text lengths. Every scenario runs
+`--repeat` times; the best and median times are reported. Write the
+results with --output and pass an earlier file to --compare to see how
+much each scenario changed since then.
+
+Run from the source directory:
+    python -m benchmarks.suite --notes 20000 --output before.json
+    python -m benchmarks.suite --notes 20000 --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from models.Note import Note
+from models.NoteState import NoteState
+from models.GraphStore import GraphStore
+from utils.GraphTraversal import ReachabilityIndex
+from utils.NoteHistory import NoteHistory
+from utils.NoteSearch import NoteSearch
+from utils.NoteStats import NoteStats
+from utils.SearchIndex import SearchIndex
+from utils.StatsEngine import StatsEngine
+from utils.TagIndex import TagIndex
+from utils.TermIndex import TermIndex
+from utils.UndoStack import UndoStack
+from benchmarks.vault import build_realistic_vault, build_vocabulary, reset_notes
+
+GROUPS = ('state', 'search', 'stats', 'events', 'graph')
+
+
+class Suite:
+    def __init__(self, repeat: int):
+        self.repeat = repeat
+        self.results: Dict[str, Dict[str, Any]] = {}
+
+    def measure(self, name: str, run: Callable[[], Any],
+                setup: Optional[Callable[[], Any]] = None, repeat: Optional[int] = None) -> None:
+        times = []
+        for _ in range(repeat or self.repeat):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+        self.results[name] = {
+            'best_ms': min(times) * 1000,
+            'median_ms': statistics.median(times) * 1000,
+            'runs': len(times),
+        }
+        print(f"{name:36} best {min(times) * 1000:10.2f} ms  "
+              f"median {statistics.median(times) * 1000:10.2f} ms", flush=True)
+
+
+def describe_vault(notes: List[Note]) -> Dict[str, Any]:
+    degrees = [len(n.parents) + len(n.children) + len(n.neighbors) for n in notes]
+    depths, _ = NoteStats.get_depths(notes)
+    texts = sorted(len(n.text) for n in notes)
+    return {
+        'notes': len(notes),
+        'directed_edges': sum(degrees),
+        'max_degree': max(degrees, default=0),
+        'max_depth': max(depths, default=0),
+        'median_text': texts[len(texts) // 2] if texts else 0,
+        'max_text': texts[-1] if texts else 0,
+        'tags': len({tag for n in notes for tag in n.tags}),
+    }
+
+
+def bench_state(suite: Suite, notes: List[Note]) -> None:
+    by_id = dict(Note._notes_by_id)
+    times = Note._times
+    with tempfile.TemporaryDirectory() as directory:
+        for snapshot_format in ('json', 'binary'):
+            state = NoteState(os.path.join(directory, snapshot_format, 'notes.json'), snapshot_format)
+            os.makedirs(os.path.dirname(state.filename))
+            suite.measure(f'save_notes[{snapshot_format}]', lambda: state.save_notes(notes))
+
+            def load():
+                reset_notes()
+                assert len(state.load_notes()) == len(notes)
+                state.snapshot = None
+            suite.measure(f'load_notes[{snapshot_format}]', load)
+    # Put the generated vault back for the other scenarios
+    reset_notes()
+    Note._all_notes = notes
+    Note._notes_by_id = by_id
+    Note._times = times
+
+
+def bench_search(suite: Suite, notes: List[Note], seed: int) -> None:
+    vocabulary, _ = build_vocabulary(20_000, seed)
+    common, medium, rare = vocabulary[0], vocabulary[100], vocabulary[5000]
+
+    def reset_index():
+        NoteSearch.index = SearchIndex()
+    suite.measure('search_notes[first, indexes a slice]', lambda: NoteSearch.search_notes(notes, medium),
+                  setup=reset_index, repeat=1)
+    suite.measure('SearchIndex.build[rest]', lambda: NoteSearch.index.build(notes), repeat=1)
+    suite.measure('search_notes[indexed]', lambda: NoteSearch.search_notes(notes, medium))
+    suite.measure('search_notes[2 chars, scan]', lambda: NoteSearch.search_notes(notes, medium[:2]))
+
+    def reset_ranked():
+        NoteSearch.ranked = TermIndex()
+    suite.measure('search_ranked[first, builds index]', lambda: NoteSearch.search_ranked(notes, rare),
+                  setup=reset_ranked, repeat=1)
+    for label, query in (('rare', rare), ('medium', medium), ('common', common),
+                         ('3 terms', f"{common} {medium} {rare}")):
+        suite.measure(f'search_ranked[{label}]', lambda: NoteSearch.search_ranked(notes, query))
+
+    tag_names, _ = build_vocabulary(200, seed + 1)
+    suite.measure('filter_by_tag[scan]', lambda: NoteSearch.filter_by_tag(notes, tag_names[0]))
+    suite.measure('TagIndex[build]', lambda: TagIndex(notes), repeat=1)
+    NoteSearch.tags = TagIndex(notes)
+    suite.measure('filter_by_tag[indexed]', lambda: NoteSearch.filter_by_tag(notes, tag_names[0]))
+    expression = f"{tag_names[0]} AND ({tag_names[1]} OR {tag_names[2]}) NOT {tag_names[3]}"
+    suite.measure('query_tags', lambda: NoteSearch.query_tags(expression))
+    NoteSearch.tags = None
+
+
+def bench_stats(suite: Suite, notes: List[Note]) -> None:
+    suite.measure('get_note_stats', lambda: NoteStats.get_note_stats(notes))
+    suite.measure('StatsEngine[build]', lambda: StatsEngine(notes), repeat=1)
+    engine = StatsEngine(notes)
+    suite.measure('StatsEngine.get_stats', lambda: engine.get_stats())
+    suite.measure('GraphStore[build]', lambda: GraphStore(notes))
+    store = GraphStore(notes)
+    suite.measure('get_store_stats', lambda: NoteStats.get_store_stats(store))
+
+
+def bench_events(suite: Suite, notes: List[Note]) -> None:
+    edited = notes[::max(len(notes) // 1000, 1)][:1000]
+
+    def edit():
+        for note in edited:
+            note.add_tag('bench-event')
+            note.remove_tag('bench-event')
+
+    def edit_batched():
+        with Note.events.batch():
+            edit()
+    suite.measure('tag edits[no subscribers]', edit)
+
+    # The subscribers main starts, except storage, which writes files
+    followers = [StatsEngine(notes), TagIndex(notes), NoteHistory(None), UndoStack(),
+                 ReachabilityIndex()]
+    for follower in followers:
+        follower.start()
+    NoteSearch.follow()
+    try:
+        Note.events.reset_stats()
+        suite.measure('tag edits[subscribed]', edit)
+        for name, stats in Note.events.stats().items():
+            print(f"  {name:34} {stats['us_per_event']:8.2f} us/event  "
+                  f"max {stats['max_ms']:8.3f} ms", flush=True)
+        suite.measure('tag edits[subscribed, batched]', edit_batched)
+    finally:
+        NoteSearch.unfollow()
+        for follower in followers:
+            follower.stop()
+
+
+def bench_graph(suite: Suite, notes: List[Note]) -> None:
+    try:
+        import dearpygui.dearpygui as dpg
+        from ui.NoteGraph import NoteGraph
+    except ImportError:
+        print("graph: skipped, Dear PyGui is not installed")
+        return
+
+    # A context without a viewport: items can be created but nothing is shown
+    dpg.create_context()
+    try:
+        graph = NoteGraph(None, None, 1200, 800)
+        hub = max(notes, key=lambda n: len(n.parents) + len(n.children) + len(n.neighbors))
+        leaf = next((n for n in reversed(notes) if not n.children), notes[-1])
+        for label, note in (('hub', hub), ('leaf', leaf)):
+            def reset():
+                graph.layout.cancel()
+                graph.layout_cache.clear()
+                graph.positions = {}
+                graph.positions_key = graph.layout_key = None
+                graph.active_note = note
+
+            def layout():
+                graph.calculate_positions()
+                # The force layout runs in a thread; wait for it to settle
+                while graph.layout.running:
+                    time.sleep(0.001)
+                graph.layout.poll()
+
+            graph.hops = 0
+            suite.measure(f'calculate_positions[{label}, fans]', layout, setup=reset)
+            graph.hops = 2
+            suite.measure(f'calculate_positions[{label}, 2 hops]', layout, setup=reset)
+
+            def keystroke():
+                # A title edit while the layout is on screen, as typing does
+                note.update(title=note.title + "x")
+                graph.calculate_positions()
+            suite.measure(f'calculate_positions[{label}, after a keystroke]', keystroke)
+        graph.layout.cancel()
+    finally:
+        dpg.destroy_context()
+
+
+def git_commit() -> Optional[str]:
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                                capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def compare(results: Dict[str, Dict[str, Any]], filename: str) -> None:
+    with open(filename, 'r', encoding='utf-8') as f:
+        previous = json.load(f)
+    print(f"\ncompared with {filename} (commit {previous.get('commit')}):")
+    for name, result in results.items():
+        before = previous['results'].get(name)
+        if before is None:
+            print(f"{name:36} new")
+            continue
+        ratio = result['best_ms'] / before['best_ms'] if before['best_ms'] else float('inf')
+        print(f"{name:36} {before['best_ms']:10.2f} -> {result['best_ms']:10.2f} ms  x{ratio:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--notes', type=int, default=20_000)
+    parser.add_argument('--links', type=int, default=3, help="neighbor links per note")
+    parser.add_argument('--text', type=int, default=800, help="median text length in characters")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', nargs='+', choices=GROUPS, default=list(GROUPS))
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--compare', help="JSON results of an earlier run to compare with")
+    args = parser.parse_args()
+
+    reset_notes()
+    start = time.perf_counter()
+    build_realistic_vault(args.notes, args.links, args.text, seed=args.seed)
+    notes = Note.get_all_notes()
+    vault = describe_vault(notes)
+    print(f"vault generated in {time.perf_counter() - start:.1f} s: "
+          + ", ".join(f"{key} {value:,}" for key, value in vault.items()))
+
+    suite = Suite(args.repeat)
+    if 'state' in args.only:
+        bench_state(suite, notes)
+    if 'search' in args.only:
+        bench_search(suite, notes, args.seed)
+    if 'stats' in args.only:
+        bench_stats(suite, notes)
+    if 'events' in args.only:
+        bench_events(suite, notes)
+    if 'graph' in args.only:
+        bench_graph(suite, notes)
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'arguments': vars(args),
+        'vault': vault,
+        'results': suite.results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"results written to {args.output}")
+    if args.compare:
+        compare(suite.results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
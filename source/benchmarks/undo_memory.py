@@ -0,0 +1,73 @@
+"""
+Measure the memory the undo stack keeps per edit over a long simulated
+editing session of a large note, and how long undoing all of it takes.
+
+Run from the source directory:
+    python -m benchmarks.undo_memory --size 100000 --keystrokes 20000
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from models.Note import Note
+from utils.UndoStack import UndoStack
+from benchmarks.vault import build_text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--size', type=int, default=100_000, help="note length in characters")
+    parser.add_argument('--keystrokes', type=int, default=20_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    note = Note("Long note", build_text(rng, args.size))
+    original = note.text
+
+    # Simulated time: short pauses while typing, longer ones between bursts
+    now = [0.0]
+    undo = UndoStack(max_steps=args.keystrokes)
+    undo.clock = lambda: now[0]
+    undo.track(note)
+    undo.start()
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    cursor = rng.randrange(len(original))
+    for _ in range(args.keystrokes):
+        text = note.text
+        if rng.random() < 0.02:
+            cursor = rng.randrange(len(text))  # jump somewhere else
+            now[0] += 3.0
+        if rng.random() < 0.15 and cursor > 0:
+            note.update(text=text[:cursor - 1] + text[cursor:])
+            cursor -= 1
+        else:
+            note.update(text=text[:cursor] + rng.choice("abcdefgh ") + text[cursor:])
+            cursor += 1
+        now[0] += 0.15
+    edit_time = time.perf_counter() - started
+    # The note's own text is replaced in place; count only what the stack holds
+    held = tracemalloc.get_traced_memory()[0] - before - (len(note.text) - len(original))
+    tracemalloc.stop()
+
+    stats = undo.stats()
+    started = time.perf_counter()
+    undo.undo(stats['undo_steps'])
+    undo_time = time.perf_counter() - started
+    undo.stop()
+    assert note.text == original
+
+    naive = args.keystrokes * args.size
+    print(f"note: {args.size:,} chars  keystrokes: {args.keystrokes:,}  "
+          f"undo steps: {stats['undo_steps']:,}  operations: {stats['operations']:,}")
+    print(f"undo stack:  {held / 2**20:8.2f} MiB ({held / args.keystrokes:8.1f} B/keystroke)")
+    print(f"full copies: {naive / 2**20:8.2f} MiB ({args.size:8.1f} B/keystroke)")
+    print(f"recording: {edit_time / args.keystrokes * 1e6:.1f} us/keystroke  "
+          f"undo all: {undo_time * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
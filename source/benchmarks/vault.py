@@ -0,0 +1,104 @@
+import itertools
+import math
+import random
+from typing import List, Tuple
+from models.Note import Note
+from models.NoteTimes import NoteTimes
+
+WORDS = ("note graph vault link idea draft todo meeting project summary "
+         "reference question answer source review plan").split()
+
+
+def build_text(rng: random.Random, length: int) -> str:
+    """Distinct filler text of roughly `length` characters"""
+    words = []
+    size = 0
+    while size < length:
+        word = rng.choice(WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return " ".join(words)[:length]
+
+
+def build_vault(note_count: int, links_per_note: int, text_length: int = 0,
+                seed: int = 0) -> List[Note]:
+    """Create a synthetic vault in Note._all_notes and return its notes"""
+    rng = random.Random(seed)
+    notes = [Note(f"Note {i}", build_text(rng, text_length)) for i in range(note_count)]
+    for i, note in enumerate(notes[1:], start=1):
+        # Earlier notes collect more children, giving a few large hubs
+        note.add_parent(notes[int(i * rng.random() ** 2)])
+        for _ in range(links_per_note - 1):
+            note.add_neighbor(notes[rng.randrange(note_count)])
+    return notes
+
+
+def reset_notes() -> None:
+    """Forget every note, as before loading a vault"""
+    Note._all_notes = []
+    Note._notes_by_id = {}
+    Note._times = NoteTimes()
+    Note._text_loader = None
+    Note._title_loader = None
+
+
+def build_vocabulary(size: int, seed: int = 0) -> Tuple[List[str], List[float]]:
+    """Distinct made-up words with Zipf cumulative weights, most frequent first"""
+    rng = random.Random(seed)
+    syllables = [c + v for c in "bdfgklmnprstvz" for v in "aeiou"]
+    words = {}
+    while len(words) < size:
+        words["".join(rng.choice(syllables) for _ in range(rng.randint(1, 4)))] = None
+    # Word frequencies in natural text fall off roughly as 1 / rank
+    weights = itertools.accumulate(1 / rank ** 1.07 for rank in range(1, size + 1))
+    return list(words), list(weights)
+
+
+def build_realistic_vault(note_count: int, links_per_note: int = 3, median_text: int = 800,
+                          max_depth: int = 12, seed: int = 0) -> List[Note]:
+    """
+    Create a vault shaped like a real one in Note._all_notes and return its notes.
+    Power-law degrees with a few hubs, hierarchies up to `max_depth`, log-normal text lengths.
+    """
+    rng = random.Random(seed)
+    vocabulary, weights = build_vocabulary(20_000, seed)
+    tag_names, tag_weights = build_vocabulary(200, seed + 1)
+    # Texts are cut from one long Zipf-distributed word stream at random
+    # offsets, which is much faster than drawing every word separately
+    stream = rng.choices(vocabulary, cum_weights=weights, k=1 << 18)
+    stream += stream
+
+    notes = []
+    depths = []
+    parents = []
+    # Every note appears once per relation plus once for itself, so picking
+    # uniformly from this list picks notes in proportion to their degree + 1
+    endpoints = []
+    for i in range(note_count):
+        length = min(int(rng.lognormvariate(math.log(median_text), 1.0)), 200 * median_text)
+        start = rng.randrange(1 << 18)
+        words = stream[start:start + min(max(1, length // 6), 1 << 18)]
+        # Blank lines between paragraphs of about 80 words
+        text = "\n\n".join(" ".join(words[p:p + 80]) for p in range(0, len(words), 80))
+        title = " ".join(rng.choices(vocabulary, cum_weights=weights, k=rng.randint(1, 5))).capitalize()
+        note = Note(f"{title} {i}", text)
+        note.tags = list(dict.fromkeys(rng.choices(tag_names, cum_weights=tag_weights,
+                                                   k=rng.randint(0, 4))))
+        notes.append(note)
+
+        parent = None
+        if i and rng.random() < 0.9:
+            parent = endpoints[rng.randrange(len(endpoints))]
+            while depths[parent] >= max_depth:
+                parent = parents[parent]
+            note.add_parent(notes[parent])
+            endpoints.append(parent)
+        depths.append(depths[parent] + 1 if parent is not None else 0)
+        parents.append(parent)
+
+        for _ in range(links_per_note if i else 0):
+            other = endpoints[rng.randrange(len(endpoints))]
+            note.add_neighbor(notes[other])
+            endpoints.append(other)
+        endpoints.extend([i] * (1 + (parent is not None) + (links_per_note if i else 0)))
+    return notes
@@ -0,0 +1,362 @@
+"""
+Headless command line access to the vault, for scripts and servers.
+
+Commands read the latest snapshot one note at a time instead of loading
+the whole vault, so they work on vaults larger than memory and start
+printing results right away. Only when the journal holds changes not yet
+in a snapshot is the vault loaded in full (run `compact` to fold them in).
+Nothing from the UI is imported, and modules are imported by the command
+that needs them to keep startup short.
+
+Run from the source directory:
+    python cli.py search "meeting notes" --limit 20
+    python cli.py search --ranked "graph layout"
+    python cli.py stats
+    python cli.py tags "work AND (urgent OR today) NOT done"
+    python cli.py path "Project X" "Weekly review" --relations parents children
+    python cli.py export vault.md --format markdown
+    python cli.py import other.json
+    python cli.py import ~/obsidian-vault --workers 8
+    python cli.py compact
+"""
+import argparse
+import sys
+
+RELATIONS = ('parents', 'children', 'neighbors')
+ALL_FIELDS = ('id', 'title', 'text', 'parents', 'children', 'neighbors', 'tags',
+              'created_at', 'modified_at')
+
+
+def open_state(args):
+    if args.storage == 'sqlite':
+        from models.SqliteNoteState import SqliteNoteState
+        return SqliteNoteState(args.vault or "notes.db")
+    from models.NoteState import NoteState
+    return NoteState(args.vault or "notes.json", args.storage)
+
+
+def records(state, fields):
+    """The notes of the vault as dicts of `fields`, streamed when possible"""
+    streaming = hasattr(state, 'stream_records')
+    if streaming and not state.has_pending_changes():
+        yield from state.stream_records(fields)
+        return
+    if streaming:
+        print("The journal holds changes not yet in a snapshot; loading the whole vault "
+              "(run `compact` to stream again)", file=sys.stderr)
+    for note in state.load_notes():
+        yield {name: [other.id for other in getattr(note, name)] if name in RELATIONS
+               else list(note.tags) if name == 'tags' else getattr(note, name)
+               for name in fields}
+
+
+def emit(args, record, **extra):
+    if args.json:
+        import json
+        sys.stdout.write(json.dumps(dict(record, **extra), ensure_ascii=False) + '\n')
+    else:
+        values = [f"{value:.4f}" if isinstance(value, float) else str(value) for value in extra.values()]
+        sys.stdout.write('\t'.join([record['id'], *values, record['title']]) + '\n')
+
+
+def search(args, state):
+    if args.ranked:
+        return search_ranked(args, state)
+    query = args.query.lower()
+    shown = 0
+    for record in records(state, ('id', 'title', 'text', 'tags')):
+        if (query in record['title'].lower() or query in record['text'].lower()
+                or any(query in tag.lower() for tag in record['tags'])):
+            emit(args, {'id': record['id'], 'title': record['title']})
+            shown += 1
+            if shown == args.limit:
+                break
+
+
+def search_ranked(args, state):
+    """BM25 in one pass: only the notes containing a query term are kept"""
+    import heapq
+    from utils.TermIndex import TermIndex
+    index = TermIndex()
+    query = set(index.tokenize(args.query))
+    frequencies = dict.fromkeys(query, 0)
+    count = 0
+    total_length = 0.0
+    matches = []
+    for record in records(state, ('id', 'title', 'text', 'tags')):
+        terms = index.term_frequencies(record['title'], record['text'], record['tags'])
+        length = sum(terms.values())
+        count += 1
+        total_length += length
+        found = {term: terms[term] for term in query if term in terms}
+        if found:
+            for term in found:
+                frequencies[term] += 1
+            matches.append((record['id'], record['title'], found, length))
+
+    average_length = total_length / count if count else 0.0
+    scored = ((index.score(found, length, frequencies, count, average_length), note_id, title)
+              for note_id, title, found, length in matches)
+    for score, note_id, title in heapq.nlargest(args.limit or 10, scored):
+        emit(args, {'id': note_id, 'title': title}, score=score)
+
+
+def stats(args, state):
+    import heapq
+    from collections import Counter
+    total = connections = isolated = 0
+    tags = Counter()
+    top = []
+    for record in records(state, ('id', 'title', 'tags') + RELATIONS):
+        degree = sum(len(record[name]) for name in RELATIONS)
+        total += 1
+        connections += degree
+        isolated += not degree
+        tags.update(record['tags'])
+        entry = (degree, -total, record['id'], record['title'])
+        if len(top) < args.top:
+            heapq.heappush(top, entry)
+        else:
+            heapq.heappushpop(top, entry)
+
+    most_connected = [(note_id, title, degree) for degree, _, note_id, title in sorted(top, reverse=True)]
+    if args.json:
+        import json
+        json.dump({
+            'total_notes': total,
+            'total_connections': connections,
+            'avg_connections_per_note': connections / total if total else 0,
+            'isolated_notes': isolated,
+            'most_connected_notes': [{'id': i, 'title': t, 'connections': d} for i, t, d in most_connected],
+            'tag_distribution': dict(tags.most_common(args.top)),
+        }, sys.stdout, ensure_ascii=False)
+        sys.stdout.write('\n')
+        return
+    print(f"Total notes: {total}")
+    print(f"Total connections: {connections}")
+    print(f"Average connections per note: {connections / total if total else 0:.2f}")
+    print(f"Isolated notes: {isolated}")
+    print("Most connected notes:")
+    for note_id, title, degree in most_connected:
+        print(f"  {degree:6}  {title}")
+    print("Most used tags:")
+    for tag, uses in tags.most_common(args.top):
+        print(f"  {uses:6}  {tag}")
+
+
+def tags(args, state):
+    if args.expression is None:
+        from collections import Counter
+        counts = Counter(tag for record in records(state, ('tags',)) for tag in record['tags'])
+        for tag, uses in counts.most_common():
+            sys.stdout.write(f"{uses}\t{tag}\n")
+        return
+
+    from utils.TagIndex import TagIndex
+    try:
+        matches = TagIndex.matcher(args.expression)
+    except ValueError as e:
+        sys.exit(f"error: {e}")
+    for record in records(state, ('id', 'title', 'tags')):
+        if matches(set(record['tags'])):
+            emit(args, {'id': record['id'], 'title': record['title']})
+
+
+def path(args, state):
+    """The notes on a shortest path between two notes, given by id or title"""
+    from models.Note import Note
+    from utils.GraphTraversal import GraphTraversal
+    notes = state.load_notes()
+    ends = []
+    for key in (args.source, args.target):
+        note = Note.get_note(key) or next((n for n in notes if n.title == key), None)
+        if note is None:
+            sys.exit(f"error: no note with the id or title {key!r}")
+        ends.append(note)
+    found = GraphTraversal.shortest_path(ends[0], ends[1], args.relations)
+    if found is None:
+        print("No path between the notes", file=sys.stderr)
+        sys.exit(1)
+    for note in found:
+        emit(args, {'id': note.id, 'title': note.title})
+
+
+def export(args, state):
+    import os
+    export_format = args.format or ('binary' if args.path.endswith('.snap') else 'json')
+    if export_format == 'binary':
+        # The snapshot writer needs every note at once
+        from models.BinarySnapshot import BinarySnapshot
+        notes = state.load_notes()
+        BinarySnapshot.write(args.path, notes)
+        print(f"Exported {len(notes)} notes to {args.path}", file=sys.stderr)
+        return
+    if export_format == 'markdown':
+        return export_markdown(args, state)
+
+    import json
+    count = 0
+    temporary = args.path + '.tmp'
+    with open(temporary, 'w', encoding='utf-8') as f:
+        f.write('[')
+        for record in records(state, ALL_FIELDS):
+            f.write((',' if count else '') + json.dumps(record, ensure_ascii=False, separators=(',', ':')))
+            count += 1
+        f.write(']')
+    os.replace(temporary, args.path)
+    print(f"Exported {count} notes to {args.path}", file=sys.stderr)
+
+
+def export_markdown(args, state):
+    """One file per note: tags and parents in front matter, neighbors as wikilinks"""
+    import json
+    import os
+    import re
+    os.makedirs(args.path, exist_ok=True)
+    # File names come from titles and are needed for links before the notes are written
+    names = {}
+    used = set()
+    for record in records(state, ('id', 'title')):
+        name = re.sub(r'[\\/:*?"<>|\[\]#^]+', '-', record['title']).strip(' .') or record['id']
+        candidate, number = name, 2
+        while candidate.lower() in used:
+            candidate = f"{name} ({number})"
+            number += 1
+        used.add(candidate.lower())
+        names[record['id']] = candidate
+
+    count = 0
+    for record in records(state, ALL_FIELDS):
+        header = [f"id: {record['id']}",
+                  f"title: {json.dumps(record['title'], ensure_ascii=False)}",
+                  f"tags: {json.dumps(record['tags'], ensure_ascii=False)}"]
+        parents = [f"[[{names[p]}]]" for p in record['parents'] if p in names]
+        if parents:
+            header.append(f"parents: {json.dumps(parents, ensure_ascii=False)}")
+        for field in ('created_at', 'modified_at'):
+            if record[field]:
+                header.append(f"{field}: {record[field]}")
+        body = record['text']
+        links = [f"[[{names[n]}]]" for n in record['neighbors'] if n in names]
+        if links:
+            body += "\n\nRelated: " + ", ".join(links)
+        with open(os.path.join(args.path, names[record['id']] + '.md'), 'w', encoding='utf-8') as f:
+            f.write("---\n" + "\n".join(header) + "\n---\n" + body + "\n")
+        count += 1
+    print(f"Exported {count} notes to {args.path}", file=sys.stderr)
+
+
+def import_vault(args, state):
+    """Add the notes of another vault snapshot, or a Markdown directory, not in this one yet"""
+    import os
+    from models.Note import Note
+    from models.NoteState import NoteState
+    notes = state.load_notes()
+    if os.path.isdir(args.path):
+        from utils.MarkdownImporter import MarkdownImporter
+        Note._all_notes = notes
+        report = MarkdownImporter(args.workers).import_directory(args.path, state)
+        print(f"Imported {report['notes']} notes from {report['files']} files "
+              f"({report['skipped']} already in the vault) in "
+              f"{report['parse_seconds'] + report['link_seconds'] + report['save_seconds']:.1f} s: "
+              f"{report['files_per_second']:.0f} files/s", file=sys.stderr)
+        print(f"Links: {report['links']['parent']} parent, {report['links']['child']} child, "
+              f"{report['links']['neighbor']} neighbor, {report['unresolved_links']} unresolved; "
+              f"parse {report['parse_seconds']:.2f} s, link {report['link_seconds']:.2f} s, "
+              f"save {report['save_seconds']:.2f} s", file=sys.stderr)
+        return
+    by_id = {note.id: note for note in notes}
+    links = []
+    skipped = 0
+    for record in NoteState(args.path).stream_records(ALL_FIELDS):
+        if record['id'] in by_id:
+            skipped += 1
+            continue
+        note = Note(record['title'], record['text'], record['id'])
+        note.tags = record['tags']
+        note.created_at = record['created_at'] or note.created_at
+        note.modified_at = record['modified_at'] or note.modified_at
+        by_id[note.id] = note
+        notes.append(note)
+        links.append((note, record))
+
+    # Both ends of a relation are stored, so linking from one side is enough
+    for note, record in links:
+        for parent_id in record['parents']:
+            if parent_id in by_id:
+                note.add_parent(by_id[parent_id])
+        for child_id in record['children']:
+            if child_id in by_id:
+                note.add_child(by_id[child_id])
+        for neighbor_id in record['neighbors']:
+            if neighbor_id in by_id:
+                note.add_neighbor(by_id[neighbor_id])
+    state.save_notes(notes)
+    print(f"Imported {len(links)} notes, skipped {skipped} already in the vault", file=sys.stderr)
+
+
+def compact(args, state):
+    """Fold the journal into a fresh snapshot"""
+    if args.storage == 'sqlite':
+        state.compact()
+        print("Vacuumed the SQLite database", file=sys.stderr)
+        return
+    notes = state.load_notes()
+    state.save_notes(notes)
+    print(f"Wrote a snapshot of {len(notes)} notes", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--vault', help="vault file (default notes.json, or notes.db for sqlite)")
+    parser.add_argument('--storage', choices=['json', 'binary', 'sqlite'], default='json',
+                        help="storage backend, as for main.py")
+    parser.add_argument('--json', action='store_true', help="print JSON lines instead of text")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('search', help="notes containing a text, or ranked by BM25")
+    command.add_argument('query')
+    command.add_argument('--ranked', action='store_true')
+    command.add_argument('--limit', type=int, default=0, help="stop after this many results")
+    command.set_defaults(run=search)
+
+    command = commands.add_parser('stats', help="note, connection and tag statistics")
+    command.add_argument('--top', type=int, default=5)
+    command.set_defaults(run=stats)
+
+    command = commands.add_parser('tags', help="tag counts, or notes matching a tag expression")
+    command.add_argument('expression', nargs='?')
+    command.set_defaults(run=tags)
+
+    command = commands.add_parser('path', help="shortest path between two notes")
+    command.add_argument('source')
+    command.add_argument('target')
+    command.add_argument('--relations', nargs='+', choices=RELATIONS, default=list(RELATIONS),
+                         help="relations to follow (default all)")
+    command.set_defaults(run=path)
+
+    command = commands.add_parser('export', help="write the vault as JSON, binary or Markdown")
+    command.add_argument('path')
+    command.add_argument('--format', choices=['json', 'binary', 'markdown'])
+    command.set_defaults(run=export)
+
+    command = commands.add_parser('import', help="add the notes of another vault or a Markdown directory")
+    command.add_argument('path')
+    command.add_argument('--workers', type=int, help="processes parsing Markdown files")
+    command.set_defaults(run=import_vault)
+
+    command = commands.add_parser('compact', help="fold the journal into a new snapshot")
+    command.set_defaults(run=compact)
+
+    args = parser.parse_args(argv)
+    try:
+        args.run(args, open_state(args))
+    except BrokenPipeError:
+        # The reader went away, e.g. `| head`; don't complain on exit either
+        import os
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,21 @@
+import argparse
+from typing import Optional
 import dearpygui.dearpygui as dpg
 from models.Note import Note
 from models.NoteState import NoteState
+from models.SqliteNoteState import SqliteNoteState
+from models.AutoSave import AutoSave
 from ui.NoteEditor import NoteEditor
 from ui.NoteGraph import NoteGraph
 from ui.NoteCreator import NoteCreator
 from ui.WindowManager import WindowManager
-from utils.NoteStats import NoteStats
+from ui.PerfOverlay import PerfOverlay
+from utils.StatsEngine import StatsEngine
+from utils.TagIndex import TagIndex
+from utils.NoteSearch import NoteSearch
+from utils.NoteHistory import NoteHistory
+from utils.UndoStack import UndoStack
+from utils.Profiler import Profiler
 
 
 def initialize_sample_notes():
@@ -33,9 +43,15 @@ def viewport_resize_callback(sender, app_data, user_data):
     window_manager.update_window_sizes(new_width, new_height)
 
 
-def main():
+def main(storage: str = "json", profile: bool = False, trace: Optional[str] = None):
     dpg.create_context()
 
+    # Spans and counters for the performance overlay (F3) and --trace
+    Profiler.enabled = profile or trace is not None
+    for state_class in (NoteState, SqliteNoteState):
+        for method in ('load_notes', 'save_notes'):
+            Profiler.instrument(state_class, method)
+
     VIEWPORT_WIDTH = 1200
     VIEWPORT_HEIGHT = 800
 
@@ -48,8 +64,11 @@ def main():
 
     window_manager = WindowManager()
 
-    # Load or create notes
-    note_state = NoteState()
+    # Load or create notes; the SQLite backend migrates notes.json on first use
+    if storage == "sqlite":
+        note_state = SqliteNoteState()
+    else:
+        note_state = NoteState(snapshot_format=storage)
     saved_notes = note_state.load_notes()
     if saved_notes:
         print("Loaded saved notes successfully.")
@@ -58,6 +77,27 @@ def main():
         print("No saved notes found. Creating sample data...")
         initialize_sample_notes()
 
+    # Journal every change from here on instead of rewriting the vault at exit
+    note_state.attach(Note._all_notes)
+    # Write the changes from a worker thread, coalescing bursts of edits
+    autosave = AutoSave(debounce=0.5)
+    autosave.start(note_state.subscription)
+    # Keep statistics current as notes change instead of rescanning the vault
+    stats_engine = StatsEngine(Note._all_notes)
+    stats_engine.start()
+    # Tag bitsets for tag filters and boolean tag queries
+    tag_index = TagIndex(Note._all_notes)
+    tag_index.start()
+    NoteSearch.tags = tag_index
+    # Reindex edited notes for search once per batch of changes
+    NoteSearch.follow()
+    # Record every change; older entries move to an append-only log
+    history = NoteHistory("notes.history")
+    history.start()
+    # Undo/redo of edits, relations and tags, from the editor
+    undo = UndoStack()
+    undo.start()
+
     # Get window dimensions
     graph_size = window_manager.get_window_size("graph_window")
     editor_size = window_manager.get_window_size("note_editor_window")
@@ -67,6 +107,10 @@ def main():
     editor = NoteEditor(editor_size[0], editor_size[1])
     creator = NoteCreator(creator_size[0], creator_size[1], editor)
     graph = NoteGraph(creator, editor, graph_size[0], graph_size[1])
+    overlay = PerfOverlay()
+    overlay.autosave = autosave
+    if profile:
+        overlay.set_visible(True)
 
     # Register window resize callbacks
     window_manager.register_window_callback("graph_window", graph.update_size)
@@ -77,6 +121,8 @@ def main():
     editor.graph = graph
     editor.creator = creator
     creator.graph = graph
+    editor.undo = undo
+    creator.undo = undo
 
     # Set initial active note
     if Note._all_notes:
@@ -86,7 +132,7 @@ def main():
         print(f"Active note set to: {active_note.title}")
 
     # Display initial statistics
-    stats = NoteStats.get_note_stats(Note._all_notes)
+    stats = stats_engine.get_stats()
     print("Initial note statistics:")
     print(f"Total notes: {stats['total_notes']}")
     print(f"Average connections per note: {stats['avg_connections_per_note']:.2f}")
@@ -100,13 +146,51 @@ def main():
 
     window_manager.update_window_sizes(VIEWPORT_WIDTH, VIEWPORT_HEIGHT)
 
-    dpg.start_dearpygui()
-
-    print("Saving notes before shutdown...")
-    note_state.save_notes(Note._all_notes)
+    while dpg.is_dearpygui_running():
+        # Pick up positions streamed from the background layout
+        graph.update_layout()
+        editor.update_lists()
+        # Once the first search started the index, finish it a slice at a
+        # time; indexing before that would load every lazily stored text
+        if len(NoteSearch.index):
+            NoteSearch.index.build(Note._all_notes, 0.002)
+        overlay.update()
+        dpg.render_dearpygui_frame()
+        Profiler.frame()
+    graph.layout.cancel()
+
+    print("Time spent in Note.events subscribers:")
+    for name, event_stats in Note.events.stats().items():
+        print(f"  {name}: {event_stats['events']} events, {event_stats['us_per_event']:.1f} us/event, "
+              f"max {event_stats['max_ms']:.2f} ms")
+    NoteSearch.unfollow()
+    undo.stop()
+    history.close()
+    tag_index.stop()
+    stats_engine.stop()
+    print("Flushing pending changes before shutdown...")
+    autosave.flush()
+    autosave.stop()
+    save_stats = autosave.stats()
+    print(f"Autosave: {save_stats['saved_changes']} changes in {save_stats['saves']} writes, "
+          f"max latency {save_stats['max_latency'] * 1000:.0f} ms")
+    cache_stats = graph.layout_cache.stats()
+    print(f"Layout cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
+    note_state.close()
+    if trace is not None:
+        Profiler.export_trace(trace)
+        print(f"Trace written to {trace}")
 
     dpg.destroy_context()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Note Viewer")
+    parser.add_argument("--storage", choices=["json", "binary", "sqlite"], default="json",
+                        help="storage backend for the vault")
+    parser.add_argument("--profile", action="store_true",
+                        help="collect timings from the start and show the performance overlay")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="collect timings and write them to FILE as a Chrome trace at exit")
+    args = parser.parse_args()
+    main(args.storage, args.profile, args.trace)
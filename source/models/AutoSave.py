@@ -0,0 +1,154 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+from .Note import Note
+from .NoteEvents import (Handler, NoteEvent, NotesLoaded, NoteUpdated, RelationAdded,
+                         RelationRemoved, Subscription)
+
+logger = logging.getLogger(__name__)
+
+
+class AutoSave:
+    """
+    Debounced background writer for the storage's events of Note.events.
+    A write may catch an edit half applied; the edit's own NoteUpdated follows and completes it.
+    """
+
+    def __init__(self, debounce: float = 0.5, max_delay: float = 5.0):
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.subscription: Optional[Subscription] = None
+        self._deliver: Optional[Handler] = None
+        self._pending: List[Tuple[NoteEvent, float]] = []
+        self._dirty: Set[Note] = set()
+        self._in_flight = 0
+        self._first_change = 0.0
+        self._last_change = 0.0
+        self._flush_requested = False
+        self._stopping = False
+        self._condition = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+
+        self.saves = 0
+        self.saved_changes = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self._total_latency = 0.0
+        # Writes the storage refused, and the last reason, for the UI
+        self.failed_writes = 0
+        self.last_error: Optional[str] = None
+
+    def start(self, subscription: Subscription) -> None:
+        """Take over the storage's subscription to Note.events"""
+        self.subscription = subscription
+        self._deliver = subscription.handler
+        subscription.handler = self.on_events
+        self._stopping = False
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def stop(self) -> None:
+        """Write everything still queued and give the subscription back"""
+        self.flush()
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+        if self.subscription is not None:
+            self.subscription.handler = self._deliver
+            self.subscription = None
+
+    def flush(self) -> None:
+        """Block until every queued change has been written"""
+        with self._condition:
+            self._flush_requested = True
+            self._condition.notify_all()
+            while self._pending or self._in_flight:
+                if self._worker is None:
+                    break
+                self._condition.wait()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                'queue_depth': len(self._pending),
+                'dirty_notes': len(self._dirty),
+                'saves': self.saves,
+                'saved_changes': self.saved_changes,
+                'last_latency': self.last_latency,
+                'max_latency': self.max_latency,
+                'avg_latency': self._total_latency / self.saved_changes if self.saved_changes else 0.0,
+                'failed_writes': self.failed_writes,
+                'last_error': self.last_error,
+            }
+
+    def on_events(self, events: List[NoteEvent]) -> None:
+        """Queue events for the storage; called on the UI thread"""
+        now = time.monotonic()
+        with self._condition:
+            for event in events:
+                if isinstance(event, NoteUpdated) and self._pending:
+                    last, queued_at = self._pending[-1]
+                    if isinstance(last, NoteUpdated) and last.note is event.note:
+                        # Same note edited again: merge into the queued update
+                        self._pending[-1] = (NoteUpdated(event.note, {**last.fields, **event.fields}),
+                                             queued_at)
+                        continue
+                if not self._pending:
+                    self._first_change = now
+                self._pending.append((event, now))
+                if isinstance(event, NotesLoaded):
+                    self._dirty.update(event.notes)
+                else:
+                    self._dirty.add(event.note)
+                    if isinstance(event, (RelationAdded, RelationRemoved)):
+                        self._dirty.add(event.other)
+            self._last_change = now
+            self._condition.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending and not self._stopping:
+                    self._condition.wait()
+                if not self._pending:
+                    return
+
+                # Let a burst of edits settle before writing it out
+                while not self._flush_requested and not self._stopping:
+                    deadline = min(self._last_change + self.debounce,
+                                   self._first_change + self.max_delay)
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+
+                batch = self._pending
+                self._pending = []
+                self._dirty.clear()
+                self._in_flight = len(batch)
+
+            for event, _ in batch:
+                try:
+                    self._deliver([event])
+                except Exception as e:
+                    logger.exception("Autosave failed to write %s", event.hook)
+                    with self._condition:
+                        self.failed_writes += 1
+                        self.last_error = f"{event.hook}: {e}"
+
+            done = time.monotonic()
+            with self._condition:
+                latencies = [done - queued_at for _, queued_at in batch]
+                self.saves += 1
+                self.saved_changes += len(batch)
+                self.last_latency = max(latencies)
+                self.max_latency = max(self.max_latency, self.last_latency)
+                self._total_latency += sum(latencies)
+                self._in_flight = 0
+                if not self._pending:
+                    self._flush_requested = False
+                self._condition.notify_all()
@@ -0,0 +1,316 @@
+import mmap
+import os
+import struct
+import sys
+import threading
+import zlib
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+from .Note import Note
+from .NoteTimes import to_iso
+
+
+class BinarySnapshot:
+    """
+    Memory-mapped binary vault snapshot: string table, note records, time columns and CSR relations.
+    Only the header is parsed on open; fields are decoded when read. Version 1 files are still read.
+    """
+
+    MAGIC = b'NOTESNAP'
+    VERSION = 2
+    FLAG_COMPRESSED = 1
+    BLOCK_SIZE = 1 << 16
+    HEADER = struct.Struct('<8sHHII')
+    SECTION = struct.Struct('<QQ')
+    RECORD_FIELDS = ('id', 'title', 'text')
+    TIME_FIELDS = ('created_at', 'modified_at')
+    RELATIONS = ('parents', 'children', 'neighbors')
+    SECTIONS = ('string_offsets', 'string_blocks', 'string_data', 'records',
+                'parents_offsets', 'parents_targets',
+                'children_offsets', 'children_targets',
+                'neighbors_offsets', 'neighbors_targets',
+                'tags_offsets', 'tags_targets',
+                'created_at', 'modified_at')
+    # Record fields and sections of each readable version
+    FORMATS = {
+        1: (RECORD_FIELDS + TIME_FIELDS, SECTIONS[:-2]),
+        2: (RECORD_FIELDS, SECTIONS),
+    }
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        with open(filename, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        # Decoding and close() may run on different threads
+        self._lock = threading.RLock()
+
+        magic, self.version, flags, self.note_count, self.string_count = \
+            self.HEADER.unpack_from(self._mmap, 0)
+        if magic != self.MAGIC or self.version not in self.FORMATS:
+            self.close()
+            raise ValueError(f"{filename} is not a version {self.VERSION} note snapshot")
+        self.compressed = bool(flags & self.FLAG_COMPRESSED)
+        self.record_fields, sections = self.FORMATS[self.version]
+
+        self._sections: Dict[str, memoryview] = {}
+        position = self.HEADER.size
+        for name in sections:
+            offset, length = self.SECTION.unpack_from(self._mmap, position)
+            self._sections[name] = self._view[offset:offset + length]
+            position += self.SECTION.size
+
+        self._string_offsets = self._array('string_offsets', 'Q')
+        self._string_blocks = self._array('string_blocks', 'Q')
+        self._records = self._array('records', 'I')
+        self._block_cache: Dict[int, bytes] = {}
+        self._index_by_id: Optional[Dict[str, int]] = None
+
+    def __len__(self) -> int:
+        return self.note_count
+
+    def _array(self, name: str, typecode: str):
+        section = self._sections[name]
+        if sys.byteorder == 'little':
+            return section.cast(typecode)
+        values = array(typecode, section.tobytes())
+        values.byteswap()
+        return values
+
+    def string(self, string_id: int) -> str:
+        with self._lock:
+            start = self._string_offsets[string_id]
+            end = self._string_offsets[string_id + 1]
+            if not self.compressed:
+                return str(self._sections['string_data'][start:end], 'utf-8')
+
+            first_block = start // self.BLOCK_SIZE
+            last_block = max(first_block, (end - 1) // self.BLOCK_SIZE)
+            data = b''.join(self._block(b) for b in range(first_block, last_block + 1))
+        base = first_block * self.BLOCK_SIZE
+        return str(data[start - base:end - base], 'utf-8')
+
+    def _block(self, block: int) -> bytes:
+        data = self._block_cache.get(block)
+        if data is None:
+            if len(self._block_cache) >= 16:
+                self._block_cache.clear()
+            start = self._string_blocks[block]
+            end = self._string_blocks[block + 1]
+            data = zlib.decompress(self._sections['string_data'][start:end])
+            self._block_cache[block] = data
+        return data
+
+    def field(self, i: int, name: str) -> Optional[str]:
+        """Decode one field ('id', 'title', 'text', 'created_at', ...) of note i"""
+        if name in self.record_fields:
+            value = self.string(self._records[i * len(self.record_fields) +
+                                              self.record_fields.index(name)])
+            # Version 1 wrote missing times as empty strings
+            return value if value or name not in self.TIME_FIELDS else None
+        return to_iso(self._array(name, 'q')[i])
+
+    def related(self, i: int, relation: str):
+        """Indices of the notes related to note i"""
+        offsets = self._array(relation + '_offsets', 'I')
+        return self._array(relation + '_targets', 'I')[offsets[i]:offsets[i + 1]]
+
+    def tags(self, i: int) -> List[str]:
+        offsets = self._array('tags_offsets', 'I')
+        targets = self._array('tags_targets', 'I')
+        return [self.string(targets[t]) for t in range(offsets[i], offsets[i + 1])]
+
+    def records(self, fields: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        """
+        Stream notes as dicts of the requested record fields, 'tags' and
+        relations (as note ids) without creating Note objects, so only the
+        pages holding those fields are read.
+        """
+        fields = tuple(fields)
+        for i in range(self.note_count):
+            record: Dict[str, Any] = {}
+            for name in fields:
+                if name == 'tags':
+                    record[name] = self.tags(i)
+                elif name in self.RELATIONS:
+                    record[name] = [self.field(j, 'id') for j in self.related(i, name)]
+                else:
+                    record[name] = self.field(i, name)
+            yield record
+
+    def text_by_id(self, note_id: str) -> str:
+        return self._field_by_id(note_id, 'text')
+
+    def title_by_id(self, note_id: str) -> str:
+        return self._field_by_id(note_id, 'title')
+
+    def _field_by_id(self, note_id: str, name: str) -> str:
+        with self._lock:
+            if self._mmap is None:
+                # Closed while the caller waited: close() decoded the field
+                note = Note.get_note(note_id)
+                return getattr(note, name) if note is not None else ""
+            i = self._index_by_id.get(note_id) if self._index_by_id is not None else None
+            return self.field(i, name) if i is not None else ""
+
+    def to_notes(self) -> List[Note]:
+        """Build Note objects for every record; titles and texts are decoded on first access"""
+        records = self._records
+        width = len(self.record_fields)
+        string = self.string
+        notes = [Note(None, None, string(records[i * width])) for i in range(self.note_count)]
+        if self.version == 1:
+            Note.set_iso_times(notes, *([self.field(i, name) for i in range(self.note_count)]
+                                        for name in self.TIME_FIELDS))
+        else:
+            Note.set_micro_times(notes, self._array('created_at', 'q'),
+                                 self._array('modified_at', 'q'))
+
+        for relation in self.RELATIONS:
+            offsets = self._array(relation + '_offsets', 'I')
+            targets = self._array(relation + '_targets', 'I')
+            for i, note in enumerate(notes):
+                setattr(note, relation, dict.fromkeys(
+                    notes[j] for j in targets[offsets[i]:offsets[i + 1]]))
+        Note._graph_version += 1
+
+        tag_offsets = self._array('tags_offsets', 'I')
+        tag_targets = self._array('tags_targets', 'I')
+        tag_names: Dict[int, str] = {}
+        for i, note in enumerate(notes):
+            for t in range(tag_offsets[i], tag_offsets[i + 1]):
+                string_id = tag_targets[t]
+                tag = tag_names.get(string_id)
+                if tag is None:
+                    tag = tag_names[string_id] = sys.intern(string(string_id))
+                note.tags.append(tag)
+
+        self._index_by_id = {note.id: i for i, note in enumerate(notes)}
+        Note._title_loader = self.title_by_id
+        Note._text_loader = self.text_by_id
+        return notes
+
+    def close(self) -> None:
+        """Unmap the file; notes still waiting on a field from it decode it now"""
+        with self._lock:
+            if self._mmap is None:
+                return
+            if self._index_by_id is not None and Note._text_loader == self.text_by_id:
+                for note_id in self._index_by_id:
+                    note = Note.get_note(note_id)
+                    # write() already read the fields of the notes it saved
+                    if note is not None and (note._title is None or note._text is None):
+                        note._load_fields()
+                Note._title_loader = Note._text_loader = None
+            self._index_by_id = None
+            self._block_cache.clear()
+            # The map can only be closed once no view of it is left
+            views = [self._string_offsets, self._string_blocks, self._records,
+                     *self._sections.values(), self._view]
+            self._sections = {}
+            self._string_offsets = self._string_blocks = self._records = None
+            for view in views:
+                if isinstance(view, memoryview):
+                    view.release()
+            self._mmap.close()
+            self._mmap = None
+
+    @classmethod
+    def write(cls, filename: str, notes: List[Note], compress: bool = False,
+              replacing: Optional['BinarySnapshot'] = None) -> None:
+        """
+        Write `notes` to `filename`. `replacing` is the open snapshot of that
+        file, if any: it is closed just before the file is replaced, since
+        a mapped file cannot be replaced on every platform.
+        """
+        strings: Dict[str, int] = {}
+
+        def intern(value: str) -> int:
+            string_id = strings.get(value)
+            if string_id is None:
+                string_id = strings[value] = len(strings)
+            return string_id
+
+        index = {note: i for i, note in enumerate(notes)}
+        records = array('I')
+        tags_offsets = array('I', [0])
+        tags_targets = array('I')
+        csr = {relation: (array('I', [0]), array('I')) for relation in cls.RELATIONS}
+        for note in notes:
+            # Texts get their ids in a second pass, see below
+            records.extend((intern(note.id), intern(note.title), 0))
+            tags_targets.extend(intern(tag) for tag in list(note.tags))
+            tags_offsets.append(len(tags_targets))
+            for relation, (offsets, targets) in csr.items():
+                targets.extend(index[other] for other in list(getattr(note, relation))
+                               if other in index)
+                offsets.append(len(targets))
+
+        # Interning texts last keeps the fields read at load time together at
+        # the front of the string table, so loading touches (and decompresses)
+        # as little of it as possible
+        text_field = cls.RECORD_FIELDS.index('text')
+        for i, note in enumerate(notes):
+            records[i * len(cls.RECORD_FIELDS) + text_field] = intern(note.text)
+
+        encoded = [value.encode('utf-8') for value in strings]
+        string_offsets = array('Q', [0])
+        total = 0
+        for data in encoded:
+            total += len(data)
+            string_offsets.append(total)
+        string_data = b''.join(encoded)
+
+        string_blocks = array('Q')
+        if compress:
+            blocks = [zlib.compress(string_data[start:start + cls.BLOCK_SIZE])
+                      for start in range(0, len(string_data), cls.BLOCK_SIZE)]
+            string_blocks.append(0)
+            for block in blocks:
+                string_blocks.append(string_blocks[-1] + len(block))
+            string_data = b''.join(blocks)
+
+        sections = {
+            'string_offsets': string_offsets,
+            'string_blocks': string_blocks,
+            'string_data': string_data,
+            'records': records,
+            'tags_offsets': tags_offsets,
+            'tags_targets': tags_targets,
+        }
+        sections['created_at'], sections['modified_at'] = Note.micro_times(notes)
+        for relation, (offsets, targets) in csr.items():
+            sections[relation + '_offsets'] = offsets
+            sections[relation + '_targets'] = targets
+
+        payloads = []
+        for name in cls.SECTIONS:
+            payload = sections[name]
+            if isinstance(payload, array):
+                if sys.byteorder != 'little':
+                    payload = array(payload.typecode, payload)
+                    payload.byteswap()
+                payload = payload.tobytes()
+            payloads.append(payload)
+
+        flags = cls.FLAG_COMPRESSED if compress else 0
+        header = cls.HEADER.pack(cls.MAGIC, cls.VERSION, flags, len(notes), len(strings))
+        position = len(header) + cls.SECTION.size * len(cls.SECTIONS)
+        table = []
+        for payload in payloads:
+            position += -position % 8  # keep every section 8-byte aligned
+            table.append(cls.SECTION.pack(position, len(payload)))
+            position += len(payload)
+
+        tmp_filename = filename + '.tmp'
+        with open(tmp_filename, 'wb') as f:
+            f.write(header)
+            f.write(b''.join(table))
+            for payload in payloads:
+                f.write(b'\0' * (-f.tell() % 8))
+                f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        if replacing is not None:
+            replacing.close()
+        os.replace(tmp_filename, filename)
@@ -0,0 +1,90 @@
+from array import array
+from typing import Dict, Iterable, List, Optional
+from .Note import Note
+
+
+class GraphStore:
+    """
+    Compact, read-only CSR view of the note graph and its tags.
+    A snapshot: rebuild it when is_current() turns False.
+    """
+
+    RELATIONS = ('parents', 'children', 'neighbors')
+
+    def __init__(self, notes: Iterable[Note]):
+        self.notes: List[Note] = list(notes)
+        self.index: Dict[Note, int] = {note: i for i, note in enumerate(self.notes)}
+        self.version = Note._graph_version
+
+        self.offsets: Dict[str, array] = {}
+        self.targets: Dict[str, array] = {}
+        for relation in self.RELATIONS:
+            offsets = array('i', [0])
+            targets = array('i')
+            for note in self.notes:
+                targets.extend(self.index[other] for other in getattr(note, relation)
+                               if other in self.index)
+                offsets.append(len(targets))
+            self.offsets[relation] = offsets
+            self.targets[relation] = targets
+
+        postings: Dict[str, List[int]] = {}
+        for i, note in enumerate(self.notes):
+            for tag in dict.fromkeys(note.tags):
+                postings.setdefault(tag, []).append(i)
+        self.tag_names: List[str] = list(postings)
+        self._tag_ids = {tag: tag_id for tag_id, tag in enumerate(self.tag_names)}
+        self.tag_offsets = array('i', [0])
+        self.tag_targets = array('i')
+        for tag in self.tag_names:
+            self.tag_targets.extend(postings[tag])
+            self.tag_offsets.append(len(self.tag_targets))
+
+    def __len__(self) -> int:
+        return len(self.notes)
+
+    def is_current(self) -> bool:
+        """False once notes were created, linked or retagged since the build"""
+        return self.version == Note._graph_version
+
+    def related(self, i: int, relation: str) -> memoryview:
+        """Indices of the notes related to note i, as a zero-copy view"""
+        offsets = self.offsets[relation]
+        return memoryview(self.targets[relation])[offsets[i]:offsets[i + 1]]
+
+    def degree(self, i: int, relation: Optional[str] = None) -> int:
+        if relation is not None:
+            offsets = self.offsets[relation]
+            return offsets[i + 1] - offsets[i]
+        return sum(self.offsets[r][i + 1] - self.offsets[r][i] for r in self.RELATIONS)
+
+    def degrees(self) -> array:
+        """Total degree of every note across all relation types"""
+        result = array('i', bytes(4 * len(self.notes)))
+        for relation in self.RELATIONS:
+            offsets = self.offsets[relation]
+            for i in range(len(self.notes)):
+                result[i] += offsets[i + 1] - offsets[i]
+        return result
+
+    def edge_count(self) -> int:
+        return sum(len(targets) for targets in self.targets.values())
+
+    def notes_with_tag(self, tag: str) -> memoryview:
+        """Indices of the notes carrying `tag`, in note order"""
+        tag_id = self._tag_ids.get(tag)
+        if tag_id is None:
+            return memoryview(array('i'))
+        offsets = self.tag_offsets
+        return memoryview(self.tag_targets)[offsets[tag_id]:offsets[tag_id + 1]]
+
+    def tag_counts(self) -> Dict[str, int]:
+        offsets = self.tag_offsets
+        return {tag: offsets[tag_id + 1] - offsets[tag_id]
+                for tag_id, tag in enumerate(self.tag_names)}
+
+    def nbytes(self) -> int:
+        """Size of the adjacency and tag arrays in bytes"""
+        arrays = [*self.offsets.values(), *self.targets.values(),
+                  self.tag_offsets, self.tag_targets]
+        return sum(a.itemsize * len(a) for a in arrays)
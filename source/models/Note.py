@@ -1,52 +1,279 @@
-from datetime import datetime
-from typing import List, Optional
+import sys
+import uuid
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from .NoteEvents import (EventBus, NoteCreated, NoteDeleted, NoteUpdated, RelationAdded,
+                         RelationRemoved, TagChanged)
+from .NoteTimes import NoteTimes, TimeValue, to_iso, to_micros, MISSING
 
 
 class Note:
+    __slots__ = ('id', '_title', '_text', 'parents', 'neighbors', 'children',
+                 'tags', '_row', 'relations_version', 'version', '__weakref__')
+
     _all_notes: List['Note'] = []
+    _notes_by_id: Dict[str, 'Note'] = {}
+    # Typed change events of every mutation, see EventBus
+    events = EventBus()
+    # Fetch the text and title of notes created without them (see
+    # SqliteNoteState and BinarySnapshot)
+    _text_loader: Optional[Callable[[str], str]] = None
+    _title_loader: Optional[Callable[[str], str]] = None
+    # Bumped whenever notes are created, linked or retagged, see GraphStore
+    _graph_version: int = 0
+    # created_at and modified_at of every note, as epoch columns
+    _times = NoteTimes()
 
-    def __init__(self, title: str, text: str = ""):
-        self.title: str = title
-        self.text: str = text
-        self.parents: List['Note'] = []
-        self.neighbors: List['Note'] = []
-        self.children: List['Note'] = []
+    def __init__(self, title: Optional[str], text: Optional[str] = "",
+                 note_id: Optional[str] = None):
+        self.id: str = note_id or uuid.uuid4().hex
+        # None means the title or text is loaded on first access
+        self._title: Optional[str] = title
+        self._text: Optional[str] = text
+        # Relations are insertion-ordered sets: dicts with None values
+        self.parents: Dict['Note', None] = {}
+        self.neighbors: Dict['Note', None] = {}
+        self.children: Dict['Note', None] = {}
         self.tags: List[str] = []
-        self.created_at: str = datetime.now().isoformat()
-        self.modified_at: str = self.created_at
+        # Row of the note's created_at and modified_at in Note._times
+        self._row: int = Note._times.add(self)
         Note._all_notes.append(self)
+        Note._notes_by_id[self.id] = self
+        Note._graph_version += 1
+        # Value of _graph_version when this note's relations last changed
+        self.relations_version: int = Note._graph_version
+        # Bumped whenever the title, text or tags change, for cached labels
+        self.version: int = 0
+        if Note.events.active:
+            Note.events.publish(NoteCreated(self))
+
+    @property
+    def title(self) -> str:
+        if self._title is None:
+            # Read once: a snapshot closing on another thread clears it
+            loader = Note._title_loader
+            self._title = loader(self.id) if loader else ""
+        return self._title
+
+    @title.setter
+    def title(self, value: str) -> None:
+        self._title = value
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            loader = Note._text_loader
+            self._text = loader(self.id) if loader else ""
+        return self._text
+
+    @text.setter
+    def text(self, value: str) -> None:
+        self._text = value
+
+    def _load_fields(self) -> None:
+        """Fetch a title and text that are still loaded on first access"""
+        if self._title is None:
+            self.title
+        if self._text is None:
+            self.text
+
+    @property
+    def created_at(self) -> Optional[str]:
+        return to_iso(Note._times.created[self._row])
+
+    @created_at.setter
+    def created_at(self, value: Optional[TimeValue]) -> None:
+        Note._times.set_created(self._row, to_micros(value) if value else MISSING)
+
+    @property
+    def modified_at(self) -> Optional[str]:
+        return to_iso(Note._times.modified[self._row])
+
+    @modified_at.setter
+    def modified_at(self, value: Optional[TimeValue]) -> None:
+        Note._times.set_modified(self._row, to_micros(value) if value else MISSING)
+
+    def update(self, title: Optional[str] = None, text: Optional[str] = None,
+               tags: Optional[List[str]] = None) -> None:
+        fields = {}
+        if title is not None and title != self.title:
+            fields['title'] = title
+        if text is not None and text != self.text:
+            fields['text'] = text
+        if tags is not None and tags != self.tags:
+            # Tag names are interned so each is stored once across notes
+            fields['tags'] = [sys.intern(tag) for tag in tags]
+        if not fields:
+            return
+
+        for name, value in fields.items():
+            setattr(self, name, value)
+        self.version += 1
+        Note._times.touch(self._row)
+        if 'tags' in fields:
+            Note._graph_version += 1
+        if Note.events.active:
+            Note.events.publish(NoteUpdated(self, fields))
 
     def add_parent(self, parent: 'Note') -> None:
         if parent not in self.parents:
-            self.parents.append(parent)
-            parent.children.append(self)
-            self.modified_at = datetime.now().isoformat()
+            self.parents[parent] = None
+            parent.children[self] = None
+            Note._times.touch(self._row)
+            Note._graph_version += 1
+            self.relations_version = parent.relations_version = Note._graph_version
+            if Note.events.active:
+                Note.events.publish(RelationAdded(self, 'parent', parent))
 
     def add_neighbor(self, neighbor: 'Note') -> None:
         if neighbor not in self.neighbors:
-            self.neighbors.append(neighbor)
-            neighbor.neighbors.append(self)
-            self.modified_at = datetime.now().isoformat()
+            self.neighbors[neighbor] = None
+            neighbor.neighbors[self] = None
+            Note._times.touch(self._row)
+            Note._graph_version += 1
+            self.relations_version = neighbor.relations_version = Note._graph_version
+            if Note.events.active:
+                Note.events.publish(RelationAdded(self, 'neighbor', neighbor))
 
     def add_child(self, child: 'Note') -> None:
         if child not in self.children:
-            self.children.append(child)
-            child.parents.append(self)
-            self.modified_at = datetime.now().isoformat()
+            self.children[child] = None
+            child.parents[self] = None
+            Note._times.touch(self._row)
+            Note._graph_version += 1
+            self.relations_version = child.relations_version = Note._graph_version
+            if Note.events.active:
+                Note.events.publish(RelationAdded(self, 'child', child))
+
+    def remove_parent(self, parent: 'Note') -> None:
+        if parent in self.parents:
+            del self.parents[parent]
+            parent.children.pop(self, None)
+            Note._times.touch(self._row)
+            Note._graph_version += 1
+            self.relations_version = parent.relations_version = Note._graph_version
+            if Note.events.active:
+                Note.events.publish(RelationRemoved(self, 'parent', parent))
+
+    def remove_neighbor(self, neighbor: 'Note') -> None:
+        if neighbor in self.neighbors:
+            del self.neighbors[neighbor]
+            neighbor.neighbors.pop(self, None)
+            Note._times.touch(self._row)
+            Note._graph_version += 1
+            self.relations_version = neighbor.relations_version = Note._graph_version
+            if Note.events.active:
+                Note.events.publish(RelationRemoved(self, 'neighbor', neighbor))
+
+    def remove_child(self, child: 'Note') -> None:
+        if child in self.children:
+            del self.children[child]
+            child.parents.pop(self, None)
+            Note._times.touch(self._row)
+            Note._graph_version += 1
+            self.relations_version = child.relations_version = Note._graph_version
+            if Note.events.active:
+                Note.events.publish(RelationRemoved(self, 'child', child))
+
+    def delete(self, unlist: bool = True) -> None:
+        """
+        Unlink the note from every other note and drop it from the vault.
+        With `unlist` False the caller drops it from Note._all_notes, so
+        bulk deletes can filter the list once.
+        """
+        # Loaders only serve notes of the vault: fetch lazy fields while
+        # they still can, so restore() brings them back
+        self._load_fields()
+        for parent in list(self.parents):
+            self.remove_parent(parent)
+        for child in list(self.children):
+            self.remove_child(child)
+        for neighbor in list(self.neighbors):
+            self.remove_neighbor(neighbor)
+        if Note._notes_by_id.get(self.id) is self:
+            del Note._notes_by_id[self.id]
+        if unlist and self in Note._all_notes:
+            Note._all_notes.remove(self)
+        Note._times.remove(self._row)
+        Note._graph_version += 1
+        if Note.events.active:
+            Note.events.publish(NoteDeleted(self))
+
+    def restore(self) -> None:
+        """Bring back a deleted note with its fields; relations are re-added separately"""
+        if Note._notes_by_id.get(self.id) is self:
+            return
+        Note._all_notes.append(self)
+        Note._notes_by_id[self.id] = self
+        Note._times.restore(self._row, self)
+        Note._graph_version += 1
+        self.relations_version = Note._graph_version
+        if Note.events.active:
+            Note.events.publish(NoteCreated(self))
+            for tag in self.tags:
+                Note.events.publish(TagChanged(self, tag, True))
 
     def add_tag(self, tag: str) -> None:
         if tag not in self.tags:
-            self.tags.append(tag)
-            self.modified_at = datetime.now().isoformat()
+            self.tags.append(sys.intern(tag))
+            self.version += 1
+            Note._times.touch(self._row)
+            Note._graph_version += 1
+            if Note.events.active:
+                Note.events.publish(TagChanged(self, tag, True))
 
     def remove_tag(self, tag: str) -> None:
         if tag in self.tags:
             self.tags.remove(tag)
-            self.modified_at = datetime.now().isoformat()
+            self.version += 1
+            Note._times.touch(self._row)
+            Note._graph_version += 1
+            if Note.events.active:
+                Note.events.publish(TagChanged(self, tag, False))
 
     @classmethod
     def get_all_notes(cls) -> List['Note']:
         return cls._all_notes
 
+    @classmethod
+    def get_note(cls, note_id: str) -> Optional['Note']:
+        return cls._notes_by_id.get(note_id)
+
+    @classmethod
+    def recently_modified(cls, limit: int = 20, since: Optional[TimeValue] = None) -> List['Note']:
+        """Up to `limit` notes modified at or after `since`, newest first"""
+        return cls._times.recently_modified(limit, since)
+
+    @classmethod
+    def created_between(cls, start: TimeValue, end: TimeValue) -> List['Note']:
+        """Notes created in [start, end), oldest first"""
+        return cls._times.created_between(start, end)
+
+    @classmethod
+    def stale_notes(cls, before: TimeValue, limit: Optional[int] = None) -> List['Note']:
+        """Notes not modified since `before`, least recently modified first"""
+        return cls._times.stale(before, limit)
+
+    @classmethod
+    def iso_times(cls, notes: Sequence['Note']) -> Tuple[List[Optional[str]], List[Optional[str]]]:
+        """created_at and modified_at of many notes, faster than one by one"""
+        return cls._times.iso([note._row for note in notes])
+
+    @classmethod
+    def set_iso_times(cls, notes: Sequence['Note'], created: Sequence[Optional[str]],
+                      modified: Sequence[Optional[str]]) -> None:
+        """Bulk created_at / modified_at assignment for loaders; unreadable times become None"""
+        cls._times.assign_iso([note._row for note in notes], created, modified)
+
+    @classmethod
+    def micro_times(cls, notes: Sequence['Note']) -> Tuple[Sequence[int], Sequence[int]]:
+        """created_at and modified_at of many notes as microseconds, MISSING if unset"""
+        return cls._times.micros([note._row for note in notes])
+
+    @classmethod
+    def set_micro_times(cls, notes: Sequence['Note'], created: Sequence[int],
+                        modified: Sequence[int]) -> None:
+        """Bulk assignment from microseconds, see micro_times"""
+        cls._times.assign([note._row for note in notes], created, modified)
+
     def __repr__(self) -> str:
         return f"Note(title='{self.title}', tags={self.tags})"
@@ -0,0 +1,199 @@
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+if TYPE_CHECKING:
+    from .Note import Note
+
+
+# Every event names the hook method it maps to, see EventBus.subscribe_hooks
+
+class NoteCreated(NamedTuple):
+    """A new note, or a deleted one restored"""
+    note: 'Note'
+    hook = 'note_created'
+
+
+class NoteUpdated(NamedTuple):
+    """New values of the title, text and tags that changed"""
+    note: 'Note'
+    fields: Dict[str, Any]
+    hook = 'note_updated'
+
+
+class RelationAdded(NamedTuple):
+    """`other` became a parent, child or neighbor of `note`"""
+    note: 'Note'
+    relation: str
+    other: 'Note'
+    hook = 'relation_added'
+
+
+class RelationRemoved(NamedTuple):
+    note: 'Note'
+    relation: str
+    other: 'Note'
+    hook = 'relation_removed'
+
+
+class TagChanged(NamedTuple):
+    note: 'Note'
+    tag: str
+    added: bool
+    hook = 'tag_changed'
+
+
+class NoteDeleted(NamedTuple):
+    """Sent after the note's relations were removed one by one"""
+    note: 'Note'
+    hook = 'note_deleted'
+
+
+class NotesLoaded(NamedTuple):
+    """Notes created or linked while events were suspended, e.g. by a load"""
+    notes: List['Note']
+    hook = 'notes_loaded'
+
+
+NoteEvent = Union[NoteCreated, NoteUpdated, RelationAdded, RelationRemoved,
+                  TagChanged, NoteDeleted, NotesLoaded]
+Handler = Callable[[List[NoteEvent]], None]
+
+
+class Subscription:
+    """A subscriber of an EventBus and the time spent delivering to it"""
+
+    __slots__ = ('name', 'handler', 'immediate', 'deliveries', 'events', 'seconds', 'max_seconds')
+
+    def __init__(self, name: str, handler: Handler, immediate: bool):
+        self.name = name
+        self.handler = handler
+        self.immediate = immediate
+        self.deliveries = 0
+        self.events = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+
+    def deliver(self, events: List[NoteEvent]) -> None:
+        start = time.perf_counter()
+        try:
+            self.handler(events)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.deliveries += 1
+            self.events += len(events)
+            self.seconds += elapsed
+            if elapsed > self.max_seconds:
+                self.max_seconds = elapsed
+
+
+class EventBus:
+    """
+    Typed change events of notes, see Note.events.
+    Inside batch() events are held for batched subscribers until the outermost batch ends;
+    `immediate` subscribers get every event as it happens.
+    """
+
+    def __init__(self):
+        self._subscriptions: Tuple[Subscription, ...] = ()
+        self._immediate: Tuple[Subscription, ...] = ()
+        self._batched: Tuple[Subscription, ...] = ()
+        self._held: List[NoteEvent] = []
+        self._batch_depth = 0
+        self._suspended = 0
+        # False while nobody listens, so Note can skip building events
+        self.active = False
+
+    def subscribe(self, handler: Handler, name: Optional[str] = None,
+                  immediate: bool = False) -> Subscription:
+        subscription = Subscription(name or getattr(handler, '__qualname__', repr(handler)),
+                                    handler, immediate)
+        self._set(self._subscriptions + (subscription,))
+        return subscription
+
+    def subscribe_hooks(self, target: Any, name: Optional[str] = None,
+                        immediate: bool = False) -> Subscription:
+        """
+        Subscribe an object with one method per event type, named after
+        the event's `hook` and taking its fields: note_created(note),
+        note_updated(note, fields) and so on. Missing methods are skipped.
+        """
+        def handle(events: List[NoteEvent]) -> None:
+            for event in events:
+                method = getattr(target, event.hook, None)
+                if method is not None:
+                    method(*event)
+        return self.subscribe(handle, name or type(target).__name__, immediate)
+
+    def unsubscribe(self, subscription: Optional[Subscription]) -> None:
+        if subscription in self._subscriptions:
+            self._set(tuple(s for s in self._subscriptions if s is not subscription))
+
+    def _set(self, subscriptions: Tuple[Subscription, ...]) -> None:
+        self._subscriptions = subscriptions
+        self._immediate = tuple(s for s in subscriptions if s.immediate)
+        self._batched = tuple(s for s in subscriptions if not s.immediate)
+        self.active = bool(subscriptions) and not self._suspended
+
+    def publish(self, event: NoteEvent) -> None:
+        if not self.active:
+            return
+        if self._batch_depth:
+            for subscription in self._immediate:
+                subscription.deliver([event])
+            self._held.append(event)
+            return
+        events = [event]
+        for subscription in self._subscriptions:
+            subscription.deliver(events)
+
+    @contextmanager
+    def batch(self):
+        """Deliver the events of the block together when it ends"""
+        self._batch_depth += 1
+        try:
+            yield
+        finally:
+            self._batch_depth -= 1
+            if not self._batch_depth:
+                self._flush()
+
+    def _flush(self) -> None:
+        # Subscribers may change notes in turn; those events follow
+        while self._held:
+            events, self._held = self._held, []
+            for subscription in self._batched:
+                subscription.deliver(events)
+
+    @contextmanager
+    def suspended(self):
+        """Publish nothing inside the block, for bulk loads"""
+        self._suspended += 1
+        self.active = False
+        try:
+            yield
+        finally:
+            self._suspended -= 1
+            self.active = bool(self._subscriptions) and not self._suspended
+
+    def subscriptions(self) -> Tuple[Subscription, ...]:
+        return self._subscriptions
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Per subscriber: deliveries, events, and the total, mean and max time spent"""
+        return {
+            subscription.name: {
+                'deliveries': subscription.deliveries,
+                'events': subscription.events,
+                'total_ms': subscription.seconds * 1000,
+                'us_per_event': subscription.seconds / subscription.events * 1e6
+                if subscription.events else 0.0,
+                'max_ms': subscription.max_seconds * 1000,
+            }
+            for subscription in self._subscriptions
+        }
+
+    def reset_stats(self) -> None:
+        for subscription in self._subscriptions:
+            subscription.deliveries = subscription.events = 0
+            subscription.seconds = subscription.max_seconds = 0.0
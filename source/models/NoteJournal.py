@@ -0,0 +1,168 @@
+import json
+import os
+import threading
+from typing import Any, Dict, Iterator, List, Set
+from .Note import Note
+
+
+class NoteJournal:
+    """
+    Append-only JSON-lines log of note mutations, by note id.
+    Replaying records already in the snapshot is harmless, so snapshots can be written while it grows.
+    """
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.record_count = 0
+        self._file = None
+        self._lock = threading.Lock()
+
+    def open(self) -> None:
+        self.record_count = sum(1 for _ in self.read_records())
+        self._file = open(self.filename, 'a', encoding='utf-8')
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+    def note_created(self, note: Note) -> None:
+        self._append({'op': 'new', 'id': note.id,
+                      'title': note.title, 'text': note.text, 'at': note.created_at})
+
+    def note_updated(self, note: Note, fields: Dict[str, Any]) -> None:
+        self._append({'op': 'set', 'id': note.id,
+                      'fields': fields, 'at': note.modified_at})
+
+    def relation_added(self, note: Note, relation: str, other: Note) -> None:
+        self._append({'op': 'link', 'id': note.id, 'rel': relation,
+                      'other': other.id, 'at': note.modified_at})
+
+    def relation_removed(self, note: Note, relation: str, other: Note) -> None:
+        self._append({'op': 'unlink', 'id': note.id, 'rel': relation,
+                      'other': other.id, 'at': note.modified_at})
+
+    def tag_changed(self, note: Note, tag: str, added: bool) -> None:
+        self._append({'op': 'tag' if added else 'untag', 'id': note.id,
+                      'tag': tag, 'at': note.modified_at})
+
+    def note_deleted(self, note: Note) -> None:
+        self._append({'op': 'del', 'id': note.id})
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line)
+            self._file.flush()
+            self.record_count += 1
+
+    def mark(self) -> int:
+        """Return the journal size in bytes; records before it are durable"""
+        with self._lock:
+            if self._file is None:
+                return 0
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            return self._file.tell()
+
+    def truncate(self, offset: int) -> None:
+        """Drop all records before `offset`, keeping those appended since"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+            try:
+                with open(self.filename, 'rb') as f:
+                    f.seek(offset)
+                    tail = f.read()
+            except FileNotFoundError:
+                tail = b''
+
+            tmp_filename = self.filename + '.tmp'
+            with open(tmp_filename, 'wb') as f:
+                f.write(tail)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_filename, self.filename)
+
+            self.record_count = tail.count(b'\n')
+            if self._file is not None:
+                self._file = open(self.filename, 'a', encoding='utf-8')
+
+    def clear(self) -> None:
+        """Drop every record, e.g. after a full snapshot was written"""
+        with self._lock:
+            offset = self._file.tell() if self._file is not None else None
+        if offset is None:
+            try:
+                offset = os.path.getsize(self.filename)
+            except FileNotFoundError:
+                return
+        self.truncate(offset)
+
+    def read_records(self) -> Iterator[Dict[str, Any]]:
+        try:
+            with open(self.filename, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn final line left by a crash mid-write
+                        return
+        except FileNotFoundError:
+            return
+
+    def replay(self, notes: List[Note]) -> int:
+        """Apply the journal to `notes` in place, returning the record count"""
+        notes_by_id = {note.id: note for note in notes}
+        deleted: Set[Note] = set()
+        count = 0
+        for record in self.read_records():
+            count += 1
+            op = record['op']
+            note = notes_by_id.get(record['id'])
+            if op == 'new':
+                if note is not None:
+                    continue
+                note = Note(record['title'], record['text'], record['id'])
+                note.created_at = record['at']
+                notes_by_id[note.id] = note
+                notes.append(note)
+            elif note is None:
+                continue
+            elif op == 'set':
+                for name, value in record['fields'].items():
+                    setattr(note, name, value)
+            elif op == 'link':
+                other = notes_by_id.get(record['other'])
+                if other is None:
+                    continue
+                getattr(note, 'add_' + record['rel'])(other)
+            elif op == 'unlink':
+                other = notes_by_id.get(record['other'])
+                if other is None:
+                    continue
+                getattr(note, 'remove_' + record['rel'])(other)
+            elif op == 'del':
+                # Dropped from the lists once below, not by a scan per record
+                note.delete(unlist=False)
+                del notes_by_id[note.id]
+                deleted.add(note)
+                continue
+            elif op == 'tag':
+                note.add_tag(record['tag'])
+            elif op == 'untag':
+                note.remove_tag(record['tag'])
+            else:
+                continue
+            note.modified_at = record['at']
+        if deleted:
+            notes[:] = [note for note in notes if note not in deleted]
+            if Note._all_notes is not notes:
+                Note._all_notes[:] = [note for note in Note._all_notes if note not in deleted]
+        return count
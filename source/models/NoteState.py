@@ -1,56 +1,227 @@
+import gc
 import json
+import os
+import sys
+import threading
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator, Optional
 from .Note import Note
+from .NoteEvents import NotesLoaded, Subscription
+from .NoteJournal import NoteJournal
+from .BinarySnapshot import BinarySnapshot
 
 
 class NoteState:
-    def __init__(self):
-        self.filename = "notes.json"
+    # Characters read at a time by stream_records
+    STREAM_CHUNK = 1 << 20
+    LIST_FIELDS = ('tags', 'parents', 'children', 'neighbors')
+
+    def __init__(self, filename: str = "notes.json", snapshot_format: str = "json",
+                 compress: bool = False):
+        self.filename = filename
+        # "binary" snapshots are memory-mapped on load, see BinarySnapshot
+        self.snapshot_format = snapshot_format
+        self.binary_filename = os.path.splitext(filename)[0] + ".snap"
+        self.compress = compress
+        self.snapshot: Optional[BinarySnapshot] = None
+        self.journal = NoteJournal(self.filename + ".journal")
+        # The journal's subscription to Note.events while attached
+        self.subscription: Optional[Subscription] = None
+        # Compact once this many records piled up, checking every interval
+        self.compact_threshold = 1000
+        self.compact_interval = 30.0
+        self._notes: Optional[List[Note]] = None
+        self._compact_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._compactor: Optional[threading.Thread] = None
 
     def save_notes(self, notes: List[Note]) -> None:
+        """Write a full snapshot; while attached this also compacts the journal"""
+        if self._notes is not None:
+            self.compact()
+        else:
+            self._write_snapshot(notes)
+            self.journal.clear()
+
+    def _write_snapshot(self, notes: List[Note]) -> None:
+        if self.snapshot_format == "binary":
+            BinarySnapshot.write(self.binary_filename, notes, self.compress, self.snapshot)
+            self.snapshot = None
+            return
+
         note_data = []
-        for note in notes:
+        created, modified = Note.iso_times(notes)
+        for note, created_at, modified_at in zip(notes, created, modified):
             note_dict = {
+                'id': note.id,
                 'title': note.title,
                 'text': note.text,
-                'parents': [p.title for p in note.parents],
-                'children': [c.title for c in note.children],
-                'neighbors': [n.title for n in note.neighbors],
-                'tags': note.tags,
-                'created_at': note.created_at,
-                'modified_at': note.modified_at
+                'parents': [p.id for p in list(note.parents)],
+                'children': [c.id for c in list(note.children)],
+                'neighbors': [n.id for n in list(note.neighbors)],
+                'tags': list(note.tags),
+                'created_at': created_at,
+                'modified_at': modified_at
             }
             note_data.append(note_dict)
 
-        with open(self.filename, 'w', encoding='utf-8') as f:
-            json.dump(note_data, f, ensure_ascii=False, indent=2)
+        tmp_filename = self.filename + '.tmp'
+        with open(tmp_filename, 'w', encoding='utf-8') as f:
+            json.dump(note_data, f, ensure_ascii=False, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_filename, self.filename)
+
+    def _snapshot_filename(self) -> str:
+        return self.binary_filename if self.snapshot_format == "binary" else self.filename
+
+    def _latest_snapshot(self) -> Optional[str]:
+        """The most recently written snapshot, which the journal continues"""
+        existing = [name for name in (self.filename, self.binary_filename) if os.path.exists(name)]
+        return max(existing, key=os.path.getmtime) if existing else None
 
     def load_notes(self) -> List[Note]:
+        # Loading allocates millions of long-lived objects; cyclic GC passes
+        # over them would only slow it down
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            # Subscribers hear of the loaded notes once, not of every note
+            with Note.events.suspended():
+                notes = self._load_snapshot()
+        finally:
+            if gc_enabled:
+                gc.enable()
+        Note.events.publish(NotesLoaded(notes))
+        return notes
+
+    def _load_snapshot(self) -> List[Note]:
+        if self._latest_snapshot() == self.binary_filename:
+            self.snapshot = BinarySnapshot(self.binary_filename)
+            notes = self.snapshot.to_notes()
+            self.journal.replay(notes)
+            return notes
+
+        notes = []
         try:
             with open(self.filename, 'r', encoding='utf-8') as f:
                 note_data = json.load(f)
 
-            title_to_note = {}
+            key_to_note = {}
             for data in note_data:
-                note = Note(data['title'], data['text'])
-                note.tags = data.get('tags', [])
-                note.created_at = data.get('created_at')
-                note.modified_at = data.get('modified_at')
-                title_to_note[data['title']] = note
+                note = Note(data['title'], data['text'], data.get('id'))
+                note.tags = [sys.intern(tag) for tag in data.get('tags', [])]
+                # Files written before notes had ids link them by title
+                key_to_note[data['id'] if 'id' in data else data['title']] = note
+                notes.append(note)
 
-            for data in note_data:
-                note = title_to_note[data['title']]
-                for parent_title in data['parents']:
-                    if parent_title in title_to_note:
-                        note.add_parent(title_to_note[parent_title])
-                for child_title in data['children']:
-                    if child_title in title_to_note:
-                        note.add_child(title_to_note[child_title])
-                for neighbor_title in data['neighbors']:
-                    if neighbor_title in title_to_note:
-                        note.add_neighbor(title_to_note[neighbor_title])
-
-            return list(title_to_note.values())
+            # Both ends of every relation are stored, so the relation sets can
+            # be assigned directly, which also keeps their saved order
+            for note, data in zip(notes, note_data):
+                for relation in ('parents', 'children', 'neighbors'):
+                    setattr(note, relation, dict.fromkeys(
+                        key_to_note[key] for key in data[relation] if key in key_to_note))
+            Note._graph_version += 1
+            Note.set_iso_times(notes, [data.get('created_at') for data in note_data],
+                               [data.get('modified_at') for data in note_data])
         except FileNotFoundError:
-            return []
\ No newline at end of file
+            pass
+
+        self.journal.replay(notes)
+        return notes
+
+    def has_pending_changes(self) -> bool:
+        """Whether the journal holds changes not yet folded into a snapshot"""
+        try:
+            return os.path.getsize(self.journal.filename) > 0
+        except FileNotFoundError:
+            return False
+
+    def stream_records(self, fields: Iterable[str]) -> Iterator[Dict[str, Any]]:
+        """Notes of the latest snapshot as dicts of `fields`, one at a time; journaled changes are left out"""
+        fields = tuple(fields)
+        latest = self._latest_snapshot()
+        if latest is None:
+            return
+        if latest == self.binary_filename:
+            snapshot = BinarySnapshot(latest)
+            try:
+                yield from snapshot.records(fields)
+            finally:
+                snapshot.close()
+            return
+
+        decoder = json.JSONDecoder()
+        with open(latest, 'r', encoding='utf-8') as f:
+            buffer = f.read(self.STREAM_CHUNK).lstrip()
+            if not buffer.startswith('['):
+                raise ValueError(f"{latest} is not a JSON note snapshot")
+            position = 1
+            while True:
+                # Skip to the next element, reading on when the buffer runs out
+                while True:
+                    while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                        position += 1
+                    if position < len(buffer):
+                        break
+                    buffer, position = f.read(self.STREAM_CHUNK), 0
+                    if not buffer:
+                        return
+                if buffer[position] == ']':
+                    return
+                try:
+                    data, position = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    # The element continues past the buffer
+                    chunk = f.read(self.STREAM_CHUNK)
+                    if not chunk:
+                        raise
+                    buffer, position = buffer[position:] + chunk, 0
+                    continue
+                # Files written before notes had ids link them by title
+                data.setdefault('id', data['title'])
+                yield {name: data.get(name, [] if name in self.LIST_FIELDS else None)
+                       for name in fields}
+
+    def attach(self, notes: List[Note]) -> None:
+        """
+        Journal every mutation of `notes` from now on and compact the
+        journal into a snapshot in the background.
+        """
+        if self._latest_snapshot() != self._snapshot_filename():
+            self._write_snapshot(notes)
+            self.journal.clear()
+
+        self._notes = notes
+        self.journal.open()
+        self.subscription = Note.events.subscribe_hooks(self.journal, immediate=True)
+
+        self._stop_event.clear()
+        self._compactor = threading.Thread(target=self._compact_loop, daemon=True)
+        self._compactor.start()
+
+    def close(self) -> None:
+        """Stop journaling; cost depends on pending records, not vault size"""
+        Note.events.unsubscribe(self.subscription)
+        self.subscription = None
+        self._stop_event.set()
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
+        self.journal.close()
+        self._notes = None
+
+    def compact(self) -> None:
+        """Fold the journal into a fresh snapshot"""
+        with self._compact_lock:
+            if self._notes is None:
+                return
+            offset = self.journal.mark()
+            # Everything journaled before the mark is already in memory
+            self._write_snapshot(list(self._notes))
+            self.journal.truncate(offset)
+
+    def _compact_loop(self) -> None:
+        while not self._stop_event.wait(self.compact_interval):
+            if self.journal.record_count >= self.compact_threshold:
+                self.compact()
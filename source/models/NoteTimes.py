@@ -0,0 +1,286 @@
+import threading
+import warnings
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any, List, Optional, Sequence, Tuple, Union
+
+if TYPE_CHECKING:
+    from .Note import Note
+
+EPOCH = datetime(1970, 1, 1)
+ONE_MICROSECOND = timedelta(microseconds=1)
+# Stored for a missing time; the same value as NumPy's NaT
+MISSING = -(1 << 63)
+
+# A datetime, an ISO string, or a timedelta meaning that long ago
+TimeValue = Union[datetime, str, timedelta]
+
+# NumPy module once imported, False when it is not installed
+_numpy: Any = None
+
+
+def numpy():
+    """
+    NumPy for the bulk paths, or None without it. Imported on first use,
+    since every program importing Note would otherwise pay for it at
+    startup.
+    """
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy as module
+        except ImportError:
+            module = False
+        _numpy = module
+    return _numpy or None
+
+
+def now_micros() -> int:
+    return (datetime.now() - EPOCH) // ONE_MICROSECOND
+
+
+def to_micros(value: TimeValue) -> int:
+    """Microseconds since 1970-01-01 on the local wall clock"""
+    if isinstance(value, timedelta):
+        value = datetime.now() - value
+    elif isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return (value - EPOCH) // ONE_MICROSECOND
+
+
+def to_iso(micros: int) -> Optional[str]:
+    if micros == MISSING:
+        return None
+    return (EPOCH + timedelta(microseconds=micros)).isoformat(timespec='microseconds')
+
+
+def parse_many(values: Sequence[Optional[str]]) -> List[int]:
+    """to_micros over ISO strings; empty and unreadable values become MISSING"""
+    np = numpy()
+    if np is not None:
+        try:
+            # Offsets would be applied as UTC, not local time: let the
+            # warning NumPy gives for them send those to the slow path
+            with warnings.catch_warnings():
+                warnings.simplefilter('error')
+                return np.array([value or 'NaT' for value in values],
+                                dtype='datetime64[us]').view(np.int64).tolist()
+        except (ValueError, TypeError, Warning):
+            pass
+    result = []
+    for value in values:
+        try:
+            result.append(to_micros(value) if isinstance(value, str) and value else MISSING)
+        except ValueError:
+            result.append(MISSING)
+    return result
+
+
+class TimeIndex:
+    """
+    (time, row) pairs of one column sorted by time; changed rows append a pair and leave the old one stale.
+    View the arrays as NumPy only under `lock`, since appending fails while a view exists.
+    """
+
+    def __init__(self, column: array, lock: threading.Lock):
+        self.column = column
+        self.lock = lock
+        self.times = array('q')
+        self.rows = array('q')
+        self.stale = 0
+        self.ordered = True
+
+    def changed(self, row: int, old: int, new: int) -> None:
+        if old != MISSING:
+            self.stale += 1
+        if new == MISSING:
+            return
+        if self.times and new < self.times[-1]:
+            self.ordered = False
+        with self.lock:
+            self.times.append(new)
+            self.rows.append(row)
+
+    def invalidate(self) -> None:
+        self.ordered = False
+
+    def ensure(self) -> None:
+        if not self.ordered or self.stale > max(len(self.times) // 2, 1024):
+            self.rebuild()
+
+    def rebuild(self) -> None:
+        column = self.column
+        np = numpy()
+        if np is not None and len(column):
+            with self.lock:
+                values = np.frombuffer(column, dtype=np.int64)
+                rows = np.flatnonzero(values != MISSING)
+                rows = rows[np.argsort(values[rows], kind='stable')].astype(np.int64)
+                self.rows = array('q', rows.tobytes())
+                self.times = array('q', values[rows].tobytes())
+                # Release the view before the lock
+                del values
+        else:
+            rows = sorted((row for row in range(len(column)) if column[row] != MISSING),
+                          key=column.__getitem__)
+            self.rows = array('q', rows)
+            self.times = array('q', (column[row] for row in rows))
+        self.stale = 0
+        self.ordered = True
+
+    def span(self, start: int = MISSING, end: Optional[int] = None) -> Tuple[int, int]:
+        """Positions of the pairs with start <= time < end"""
+        self.ensure()
+        return (bisect_left(self.times, start) if start != MISSING else 0,
+                bisect_left(self.times, end) if end is not None else len(self.times))
+
+    def select(self, i: int, j: int, live: bytearray) -> List[int]:
+        """Rows of the valid pairs at positions i..j of live notes, by time"""
+        np = numpy() if j - i > 64 else None
+        if np is not None:
+            with self.lock:
+                rows = np.frombuffer(self.rows, dtype=np.int64)[i:j]
+                keep = ((np.frombuffer(self.column, dtype=np.int64)[rows]
+                         == np.frombuffer(self.times, dtype=np.int64)[i:j])
+                        & (np.frombuffer(live, dtype=np.uint8)[rows] != 0))
+                selected = rows[keep].tolist()
+                del rows
+            return selected
+        column = self.column
+        return [row for row, time in zip(self.rows[i:j], self.times[i:j])
+                if column[row] == time and live[row]]
+
+
+class NoteTimes:
+    """
+    created_at and modified_at of every note as int64 microsecond columns, one row per note.
+    Deleted notes keep their row for restore(). Other threads read through iso(), which copies.
+    """
+
+    def __init__(self):
+        self.created = array('q')
+        self.modified = array('q')
+        self.live = bytearray()
+        self.notes: List[Optional['Note']] = []
+        # Held while the columns grow or are viewed as NumPy arrays
+        self._lock = threading.Lock()
+        self.created_index = TimeIndex(self.created, self._lock)
+        self.modified_index = TimeIndex(self.modified, self._lock)
+
+    def __len__(self) -> int:
+        return len(self.notes)
+
+    def add(self, note: 'Note') -> int:
+        row = len(self.notes)
+        now = now_micros()
+        self.notes.append(note)
+        with self._lock:
+            self.created.append(now)
+            self.modified.append(now)
+            self.live.append(1)
+        self.created_index.changed(row, MISSING, now)
+        self.modified_index.changed(row, MISSING, now)
+        return row
+
+    def remove(self, row: int) -> None:
+        self.notes[row] = None
+        self.live[row] = 0
+
+    def restore(self, row: int, note: 'Note') -> None:
+        self.notes[row] = note
+        self.live[row] = 1
+
+    def set_created(self, row: int, micros: int) -> None:
+        old = self.created[row]
+        if old != micros:
+            self.created[row] = micros
+            self.created_index.changed(row, old, micros)
+
+    def set_modified(self, row: int, micros: int) -> None:
+        old = self.modified[row]
+        if old != micros:
+            self.modified[row] = micros
+            self.modified_index.changed(row, old, micros)
+
+    def touch(self, row: int) -> None:
+        self.set_modified(row, now_micros())
+
+    def assign_iso(self, rows: Sequence[int], created: Sequence[Optional[str]],
+                   modified: Sequence[Optional[str]]) -> None:
+        """Set the times of many rows from ISO strings, as loaded from disk"""
+        for column, index, values in ((self.created, self.created_index, created),
+                                      (self.modified, self.modified_index, modified)):
+            for row, micros in zip(rows, parse_many(values)):
+                column[row] = micros
+            index.invalidate()
+
+    def assign(self, rows: Sequence[int], created: Sequence[int], modified: Sequence[int]) -> None:
+        """Set the times of many rows from microseconds, as loaded from disk"""
+        if len(rows) and rows[-1] - rows[0] == len(rows) - 1:
+            # Rows of notes just created in a row: one slice copy per column
+            first, last = rows[0], rows[-1] + 1
+            self.created[first:last] = array('q', created)
+            self.modified[first:last] = array('q', modified)
+        else:
+            for row, created_at, modified_at in zip(rows, created, modified):
+                self.created[row] = created_at
+                self.modified[row] = modified_at
+        self.created_index.invalidate()
+        self.modified_index.invalidate()
+
+    def micros(self, rows: Sequence[int]) -> Tuple[array, array]:
+        """created and modified of many rows, as saved to disk"""
+        created, modified = self.created, self.modified
+        return (array('q', [created[row] for row in rows]),
+                array('q', [modified[row] for row in rows]))
+
+    def iso(self, rows: Sequence[int]) -> Tuple[List[Optional[str]], List[Optional[str]]]:
+        """ISO created_at and modified_at strings of many rows, as saved to disk"""
+        np = numpy() if rows else None
+        if np is None:
+            return ([to_iso(self.created[row]) for row in rows],
+                    [to_iso(self.modified[row]) for row in rows])
+        selected = np.asarray(rows, dtype=np.int64)
+        result = []
+        for column in (self.created, self.modified):
+            # A copy, not a view: this runs on the snapshot writer's thread
+            # while notes may be created
+            values = np.frombuffer(column.tobytes(), dtype=np.int64)[selected]
+            strings = np.datetime_as_string(values.view('datetime64[us]')).tolist()
+            if (values == MISSING).any():
+                strings = [None if value == 'NaT' else value for value in strings]
+            result.append(strings)
+        return result[0], result[1]
+
+    def recently_modified(self, limit: int, since: Optional[TimeValue] = None) -> List['Note']:
+        """Up to `limit` notes modified at or after `since`, newest first"""
+        index = self.modified_index
+        stop, end = index.span(to_micros(since) if since is not None else MISSING)
+        rows: List[int] = []
+        # Pairs are sorted oldest first: walk back from the end in chunks
+        while end > stop and len(rows) < limit:
+            start = max(stop, end - max(2 * (limit - len(rows)), 256))
+            rows.extend(reversed(index.select(start, end, self.live)))
+            end = start
+        return [self.notes[row] for row in rows[:limit]]
+
+    def created_between(self, start: TimeValue, end: TimeValue) -> List['Note']:
+        """Notes created at or after `start` and before `end`, oldest first"""
+        i, j = self.created_index.span(to_micros(start), to_micros(end))
+        return [self.notes[row] for row in self.created_index.select(i, j, self.live)]
+
+    def stale(self, before: TimeValue, limit: Optional[int] = None) -> List['Note']:
+        """Notes last modified before `before`, least recently modified first"""
+        index = self.modified_index
+        start, stop = index.span(MISSING, to_micros(before))
+        if limit is None:
+            return [self.notes[row] for row in index.select(start, stop, self.live)]
+        rows: List[int] = []
+        while start < stop and len(rows) < limit:
+            end = min(stop, start + max(2 * (limit - len(rows)), 256))
+            rows.extend(index.select(start, end, self.live))
+            start = end
+        return [self.notes[row] for row in rows[:limit]]
@@ -0,0 +1,215 @@
+import os
+import sqlite3
+import sys
+import threading
+from typing import Any, Dict, List, Optional
+from .Note import Note
+from .NoteEvents import NotesLoaded, Subscription
+from .NoteState import NoteState
+
+
+class SqliteNoteState:
+    """
+    SQLite storage backend with the same interface as NoteState.
+    Texts load on first access; while attached, every mutation is its own transaction.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS notes (
+            seq INTEGER PRIMARY KEY,
+            id TEXT NOT NULL UNIQUE,
+            title TEXT NOT NULL,
+            text TEXT NOT NULL,
+            created_at TEXT,
+            modified_at TEXT
+        );
+        CREATE TABLE IF NOT EXISTS edges (
+            source TEXT NOT NULL,
+            relation TEXT NOT NULL,
+            target TEXT NOT NULL,
+            UNIQUE (source, relation, target)
+        );
+        CREATE TABLE IF NOT EXISTS tags (
+            note_id TEXT NOT NULL,
+            tag TEXT NOT NULL,
+            UNIQUE (note_id, tag)
+        );
+    """
+
+    # Rows written for a relation added via Note.add_<relation>
+    EDGE_ROWS = {
+        'parent': (('parents', False), ('children', True)),
+        'child': (('children', False), ('parents', True)),
+        'neighbor': (('neighbors', False), ('neighbors', True)),
+    }
+
+    def __init__(self, filename: str = "notes.db", json_filename: str = "notes.json"):
+        self.filename = filename
+        self.json_filename = json_filename
+        # Writes may come from the autosave worker while the UI thread
+        # fetches texts, so all access goes through one lock
+        self.connection = sqlite3.connect(filename, check_same_thread=False)
+        self._lock = threading.RLock()
+        # One small transaction per edit: WAL keeps each commit cheap
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.executescript(self.SCHEMA)
+        self.subscription: Optional[Subscription] = None
+
+    def load_notes(self) -> List[Note]:
+        # Subscribers hear of the loaded notes once, not of every note
+        with Note.events.suspended():
+            notes = self._load_rows()
+        Note.events.publish(NotesLoaded(notes))
+        return notes
+
+    def _load_rows(self) -> List[Note]:
+        cursor = self.connection.cursor()
+        if cursor.execute("SELECT 1 FROM notes LIMIT 1").fetchone() is None:
+            if os.path.exists(self.json_filename):
+                return self.migrate_from_json(self.json_filename)
+            return []
+
+        notes_by_id: Dict[str, Note] = {}
+        notes = []
+        created = []
+        modified = []
+        for note_id, title, created_at, modified_at in cursor.execute(
+                "SELECT id, title, created_at, modified_at FROM notes ORDER BY seq"):
+            note = Note(title, None, note_id)
+            notes_by_id[note_id] = note
+            notes.append(note)
+            created.append(created_at)
+            modified.append(modified_at)
+        Note.set_iso_times(notes, created, modified)
+
+        for source, relation, target in cursor.execute(
+                "SELECT source, relation, target FROM edges ORDER BY rowid"):
+            if source in notes_by_id and target in notes_by_id:
+                getattr(notes_by_id[source], relation)[notes_by_id[target]] = None
+        Note._graph_version += 1
+
+        for note_id, tag in cursor.execute("SELECT note_id, tag FROM tags ORDER BY rowid"):
+            if note_id in notes_by_id:
+                notes_by_id[note_id].tags.append(sys.intern(tag))
+
+        Note._text_loader = self.load_text
+        return notes
+
+    def load_text(self, note_id: str) -> str:
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT text FROM notes WHERE id = ?", (note_id,)).fetchone()
+        return row[0] if row else ""
+
+    def migrate_from_json(self, json_filename: str) -> List[Note]:
+        """Copy a notes.json vault (and its journal) into the database once"""
+        json_state = NoteState(json_filename)
+        notes = json_state.load_notes()
+        self.save_notes(notes)
+        return notes
+
+    def save_notes(self, notes: List[Note]) -> None:
+        """Rewrite the whole database in one transaction"""
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM edges")
+            self.connection.execute("DELETE FROM tags")
+            # Drop notes deleted since the last save; the others are upserted
+            saved = {note.id for note in notes}
+            self.connection.executemany(
+                "DELETE FROM notes WHERE id = ?",
+                [row for row in self.connection.execute("SELECT id FROM notes").fetchall()
+                 if row[0] not in saved])
+            created, modified = Note.iso_times(notes)
+            for note, created_at, modified_at in zip(notes, created, modified):
+                # Texts that were never loaded are left as stored
+                self.connection.execute(
+                    "INSERT INTO notes (id, title, text, created_at, modified_at) "
+                    "VALUES (?, ?, COALESCE(?, ''), ?, ?) "
+                    "ON CONFLICT (id) DO UPDATE SET title = excluded.title, "
+                    "text = COALESCE(?, notes.text), created_at = excluded.created_at, "
+                    "modified_at = excluded.modified_at",
+                    (note.id, note.title, note._text, created_at, modified_at, note._text))
+                for relation in ('parents', 'children', 'neighbors'):
+                    self.connection.executemany(
+                        "INSERT INTO edges (source, relation, target) VALUES (?, ?, ?)",
+                        [(note.id, relation, other.id) for other in getattr(note, relation)])
+                self.connection.executemany(
+                    "INSERT OR IGNORE INTO tags (note_id, tag) VALUES (?, ?)",
+                    [(note.id, tag) for tag in note.tags])
+
+    def attach(self, notes: List[Note]) -> None:
+        """Persist every mutation of the notes from now on"""
+        self.subscription = Note.events.subscribe_hooks(self, immediate=True)
+
+    def close(self) -> None:
+        Note.events.unsubscribe(self.subscription)
+        self.subscription = None
+        if Note._text_loader == self.load_text:
+            Note._text_loader = None
+        with self._lock:
+            self.connection.close()
+
+    def compact(self) -> None:
+        """Rebuild the database file without the space freed by deletes"""
+        with self._lock:
+            self.connection.execute("VACUUM")
+
+    def note_created(self, note: Note) -> None:
+        with self._lock, self.connection:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO notes (id, title, text, created_at, modified_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (note.id, note.title, note.text, note.created_at, note.modified_at))
+
+    def note_updated(self, note: Note, fields: Dict[str, Any]) -> None:
+        with self._lock, self.connection:
+            for name in ('title', 'text'):
+                if name in fields:
+                    self.connection.execute(
+                        f"UPDATE notes SET {name} = ? WHERE id = ?", (fields[name], note.id))
+            if 'tags' in fields:
+                self.connection.execute("DELETE FROM tags WHERE note_id = ?", (note.id,))
+                self.connection.executemany(
+                    "INSERT OR IGNORE INTO tags (note_id, tag) VALUES (?, ?)",
+                    [(note.id, tag) for tag in fields['tags']])
+            self._touch(note)
+
+    def relation_added(self, note: Note, relation: str, other: Note) -> None:
+        with self._lock, self.connection:
+            for stored_relation, reverse in self.EDGE_ROWS[relation]:
+                source, target = (other, note) if reverse else (note, other)
+                self.connection.execute(
+                    "INSERT OR IGNORE INTO edges (source, relation, target) VALUES (?, ?, ?)",
+                    (source.id, stored_relation, target.id))
+            self._touch(note)
+
+    def relation_removed(self, note: Note, relation: str, other: Note) -> None:
+        with self._lock, self.connection:
+            for stored_relation, reverse in self.EDGE_ROWS[relation]:
+                source, target = (other, note) if reverse else (note, other)
+                self.connection.execute(
+                    "DELETE FROM edges WHERE source = ? AND relation = ? AND target = ?",
+                    (source.id, stored_relation, target.id))
+            self._touch(note)
+
+    def note_deleted(self, note: Note) -> None:
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM notes WHERE id = ?", (note.id,))
+            self.connection.execute(
+                "DELETE FROM edges WHERE source = ? OR target = ?", (note.id, note.id))
+            self.connection.execute("DELETE FROM tags WHERE note_id = ?", (note.id,))
+
+    def tag_changed(self, note: Note, tag: str, added: bool) -> None:
+        with self._lock, self.connection:
+            if added:
+                self.connection.execute(
+                    "INSERT OR IGNORE INTO tags (note_id, tag) VALUES (?, ?)", (note.id, tag))
+            else:
+                self.connection.execute(
+                    "DELETE FROM tags WHERE note_id = ? AND tag = ?", (note.id, tag))
+            self._touch(note)
+
+    def _touch(self, note: Note) -> None:
+        self.connection.execute(
+            "UPDATE notes SET modified_at = ? WHERE id = ?", (note.modified_at, note.id))
@@ -0,0 +1,60 @@
+import random
+from typing import List
+
+from models.Note import Note
+from models.NoteEvents import EventBus
+from models.NoteTimes import NoteTimes
+
+RELATIONS = ('parent', 'child', 'neighbor')
+RELATION_SETS = ('parents', 'children', 'neighbors')
+TAGS = ('idea', 'todo', 'done', 'ref', 'ünï')
+
+
+def reset_vault() -> None:
+    """Forget every note and event subscriber, as in a fresh process"""
+    Note._all_notes = []
+    Note._notes_by_id = {}
+    Note._times = NoteTimes()
+    Note._text_loader = None
+    Note._title_loader = None
+    Note.events = EventBus()
+
+
+def describe(notes: List[Note]) -> list:
+    """Ids, fields, tags and relations of `notes`, comparable across loads"""
+    return [(note.id, note.title, note.text, list(note.tags),
+             [[other.id for other in getattr(note, relation)] for relation in RELATION_SETS])
+            for note in notes]
+
+
+def random_edits(rng: random.Random, count: int, deleted: List[Note] = None) -> None:
+    """Apply `count` random mutations to the vault: notes, links (self-links too), tags, deletions"""
+    deleted = [] if deleted is None else deleted
+    for _ in range(count):
+        notes = Note.get_all_notes()
+        roll = rng.random()
+        if roll < 0.15 or len(notes) < 2:
+            Note(rng.choice(("Alpha", "beta", "Gamma note", "")), rng.choice(("", "some text", "Text ünï")))
+        elif roll < 0.2:
+            note = rng.choice(notes)
+            note.delete()
+            deleted.append(note)
+        elif roll < 0.25 and deleted:
+            deleted.pop(rng.randrange(len(deleted))).restore()
+        elif roll < 0.6:
+            note, other = rng.choice(notes), rng.choice(notes)
+            relation = rng.choice(RELATIONS)
+            action = 'add_' if rng.random() < 0.7 else 'remove_'
+            getattr(note, action + relation)(other)
+        elif roll < 0.8:
+            note = rng.choice(notes)
+            tag = rng.choice(TAGS)
+            if rng.random() < 0.6:
+                note.add_tag(tag)
+            else:
+                note.remove_tag(tag)
+        else:
+            note = rng.choice(notes)
+            note.update(title=rng.choice((None, note.title + "x", "Alpha")),
+                        text=rng.choice((None, note.text + " more", "other text")),
+                        tags=rng.choice((None, rng.sample(TAGS, 2))))
@@ -0,0 +1,75 @@
+import os
+import random
+import tempfile
+import unittest
+
+from models.AutoSave import AutoSave
+from models.Note import Note
+from models.SqliteNoteState import SqliteNoteState
+from tests import describe, random_edits, reset_vault
+
+
+class AutoSaveTest(unittest.TestCase):
+    def setUp(self):
+        reset_vault()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(reset_vault)
+        self.filename = os.path.join(directory.name, 'notes.db')
+        self.json_filename = os.path.join(directory.name, 'notes.json')
+
+    def test_written_vault_matches_after_flush(self):
+        rng = random.Random(3)
+        random_edits(rng, 50)
+        state = SqliteNoteState(self.filename, self.json_filename)
+        state.save_notes(Note.get_all_notes())
+        state.attach(Note._all_notes)
+        autosave = AutoSave(debounce=0.01, max_delay=0.05)
+        autosave.start(state.subscription)
+        for _ in range(5):
+            random_edits(rng, 100)
+            autosave.flush()
+        expected = describe(Note.get_all_notes())
+        autosave.stop()
+        self.assertIsNone(autosave.subscription)
+        state.close()
+
+        reset_vault()
+        state = SqliteNoteState(self.filename, self.json_filename)
+        self.addCleanup(state.close)
+        self.assertEqual(describe(state.load_notes()), expected)
+        stats = autosave.stats()
+        self.assertEqual(stats['queue_depth'], 0)
+        self.assertEqual(stats['failed_writes'], 0)
+
+    def test_keystrokes_coalesce(self):
+        note = Note("Title", "")
+        written = []
+        subscription = Note.events.subscribe(written.extend, immediate=True)
+        autosave = AutoSave(debounce=10, max_delay=10)
+        autosave.start(subscription)
+        self.addCleanup(autosave.stop)
+        for length in range(1, 20):
+            note.update(text="x" * length)
+        note.update(title="Renamed")
+        autosave.flush()
+        self.assertEqual(len(written), 1)
+        self.assertEqual(written[0].fields, {'text': "x" * 19, 'title': "Renamed"})
+
+    def test_failed_writes_are_kept(self):
+        def fail(events):
+            raise OSError("disk full")
+        subscription = Note.events.subscribe(fail, immediate=True)
+        autosave = AutoSave(debounce=0)
+        autosave.start(subscription)
+        self.addCleanup(autosave.stop)
+        with self.assertLogs('models.AutoSave', 'ERROR'):
+            Note("Title", "")
+            autosave.flush()
+        stats = autosave.stats()
+        self.assertEqual(stats['failed_writes'], 1)
+        self.assertEqual(stats['last_error'], "note_created: disk full")
+
+
+if __name__ == '__main__':
+    unittest.main()
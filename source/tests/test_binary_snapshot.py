@@ -0,0 +1,100 @@
+import os
+import tempfile
+import unittest
+
+from models.BinarySnapshot import BinarySnapshot
+from models.Note import Note
+from models.NoteState import NoteState
+from tests import reset_vault as reset_notes
+
+
+def describe(notes):
+    """Everything a snapshot stores about `notes`, comparable across loads"""
+    created, modified = Note.iso_times(notes)
+    return [(note.id, note.title, note.text, list(note.tags),
+             [[other.id for other in getattr(note, relation)]
+              for relation in ('parents', 'children', 'neighbors')],
+             created_at, modified_at)
+            for note, created_at, modified_at in zip(notes, created, modified)]
+
+
+class BinarySnapshotTest(unittest.TestCase):
+    def setUp(self):
+        reset_notes()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.addCleanup(reset_notes)
+
+        root = Note("Root", "The first note")
+        same = Note("Twin", "")
+        other = Note("Twin", "ünïcödé — 日本語 🧠\nsecond line")
+        long = Note("", "long text " * 20000)
+        root.add_child(same)
+        root.add_child(other)
+        same.add_neighbor(other)
+        long.add_parent(other)
+        other.add_tag("tag")
+        other.add_tag("ünï")
+        long.add_tag("tag")
+        Note.set_iso_times([root, same, other, long],
+                           ["2024-01-02T03:04:05.123456", None, "2024-05-06T07:08:09", None],
+                           ["2024-01-03T00:00:00", None, "2024-05-07T00:00:00", "2025-01-01T00:00:00"])
+        self.notes = Note.get_all_notes()
+        self.expected = describe(self.notes)
+
+    def load(self, snapshot_format: str, compress: bool = False):
+        """Save the vault in `snapshot_format` and load it back as a fresh vault"""
+        name = snapshot_format + ('-compressed' if compress else '')
+        state = NoteState(os.path.join(self.directory.name, name, 'notes.json'),
+                          snapshot_format, compress=compress)
+        os.makedirs(os.path.dirname(state.filename))
+        state.save_notes(self.notes)
+        reset_notes()
+        return state, state.load_notes()
+
+    def test_round_trip_matches_json(self):
+        _, from_json = self.load('json')
+        self.assertEqual(describe(from_json), self.expected)
+        for compress in (False, True):
+            with self.subTest(compress=compress):
+                state, loaded = self.load('binary', compress)
+                self.assertEqual(describe(loaded), self.expected)
+                state.snapshot.close()
+
+    def test_fields_stay_lazy_until_read(self):
+        state, loaded = self.load('binary')
+        self.assertTrue(all(note._title is None and note._text is None for note in loaded))
+        self.assertEqual(loaded[2].title, "Twin")
+        self.assertIsNone(loaded[2]._text)
+        state.snapshot.close()
+
+    def test_close_decodes_pending_fields(self):
+        state, loaded = self.load('binary', compress=True)
+        state.snapshot.close()
+        self.assertIsNone(Note._text_loader)
+        self.assertEqual(describe(loaded), self.expected)
+
+    def test_rewrite_replaces_mapped_file(self):
+        state, loaded = self.load('binary')
+        loaded[0].title = "Renamed"
+        expected = describe(loaded)
+        state.save_notes(loaded)
+        self.assertIsNone(state.snapshot)
+        reset_notes()
+        self.assertEqual(describe(state.load_notes()), expected)
+        state.snapshot.close()
+
+    def test_records_match_loaded_notes(self):
+        state, loaded = self.load('binary')
+        fields = ('id', 'title', 'text', 'tags', 'parents', 'children', 'neighbors',
+                  'created_at', 'modified_at')
+        records = list(state.stream_records(fields))
+        self.assertEqual([(record['id'], record['title'], record['text'], record['tags'],
+                           [record['parents'], record['children'], record['neighbors']],
+                           record['created_at'], record['modified_at']) for record in records],
+                         self.expected)
+        state.snapshot.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
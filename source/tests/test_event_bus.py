@@ -0,0 +1,132 @@
+import random
+import unittest
+
+from models.Note import Note
+from models.NoteEvents import EventBus, NoteCreated, NoteUpdated
+from tests import RELATION_SETS, random_edits, reset_vault
+
+# The relation sets a link event changes, on the note and on the other note
+SIDES = {'parent': ('parents', 'children'), 'child': ('children', 'parents'),
+         'neighbor': ('neighbors', 'neighbors')}
+
+
+class Mirror:
+    """The vault rebuilt from events alone"""
+
+    def __init__(self):
+        self.notes = {}
+
+    def note_created(self, note):
+        self.notes[note.id] = {'title': note.title, 'text': note.text, 'tags': set(),
+                               **{relation: set() for relation in RELATION_SETS}}
+
+    def note_updated(self, note, fields):
+        for name, value in fields.items():
+            self.notes[note.id][name] = set(value) if name == 'tags' else value
+
+    def relation_added(self, note, relation, other):
+        mine, theirs = SIDES[relation]
+        self.notes[note.id][mine].add(other.id)
+        self.notes[other.id][theirs].add(note.id)
+
+    def relation_removed(self, note, relation, other):
+        mine, theirs = SIDES[relation]
+        self.notes[note.id][mine].discard(other.id)
+        self.notes[other.id][theirs].discard(note.id)
+
+    def tag_changed(self, note, tag, added):
+        tags = self.notes[note.id]['tags']
+        if added:
+            tags.add(tag)
+        else:
+            tags.discard(tag)
+
+    def note_deleted(self, note):
+        del self.notes[note.id]
+
+
+def vault_state():
+    return {note.id: {'title': note.title, 'text': note.text, 'tags': set(note.tags),
+                      **{relation: {other.id for other in getattr(note, relation)}
+                         for relation in RELATION_SETS}}
+            for note in Note.get_all_notes()}
+
+
+class EventBusTest(unittest.TestCase):
+    def setUp(self):
+        reset_vault()
+        self.addCleanup(reset_vault)
+
+    def test_mirrors_rebuilt_from_events_match_the_vault(self):
+        rng = random.Random(17)
+        immediate, batched = Mirror(), Mirror()
+        Note.events.subscribe_hooks(immediate, 'immediate', immediate=True)
+        Note.events.subscribe_hooks(batched, 'batched')
+        deleted = []
+        for _ in range(40):
+            if rng.random() < 0.5:
+                with Note.events.batch():
+                    random_edits(rng, 10, deleted)
+                    with Note.events.batch():
+                        random_edits(rng, 5, deleted)
+                    # Immediate subscribers are never held back
+                    self.assertEqual(immediate.notes, vault_state())
+            else:
+                random_edits(rng, 15, deleted)
+            self.assertEqual(immediate.notes, vault_state())
+            self.assertEqual(batched.notes, vault_state())
+
+    def test_batches_deliver_in_order_once_the_outermost_ends(self):
+        immediate, batched = [], []
+        Note.events.subscribe(lambda events: immediate.append(list(events)), immediate=True)
+        Note.events.subscribe(lambda events: batched.append(list(events)))
+        with Note.events.batch():
+            note = Note("Title", "")
+            with Note.events.batch():
+                note.update(text="text")
+            self.assertEqual(batched, [])
+            self.assertEqual(len(immediate), 2)
+        self.assertEqual(batched, [[NoteCreated(note), NoteUpdated(note, {'text': "text"})]])
+        note.update(title="New")
+        self.assertEqual(batched[-1], [NoteUpdated(note, {'title': "New"})])
+
+    def test_events_published_while_flushing_follow(self):
+        seen = []
+
+        def react(events):
+            seen.extend(event.hook for event in events)
+            if any(isinstance(event, NoteCreated) for event in events):
+                events[0].note.add_tag("auto")
+        Note.events.subscribe(react)
+        with Note.events.batch():
+            Note("Title", "")
+        self.assertEqual(seen, ['note_created', 'tag_changed'])
+
+    def test_suspended_and_unsubscribed(self):
+        received = []
+        subscription = Note.events.subscribe(received.extend)
+        with Note.events.suspended():
+            self.assertFalse(Note.events.active)
+            Note("Quiet", "")
+        self.assertTrue(Note.events.active)
+        self.assertEqual(received, [])
+        Note.events.unsubscribe(subscription)
+        self.assertFalse(Note.events.active)
+        Note("Unheard", "")
+        self.assertEqual(received, [])
+
+    def test_stats_count_deliveries_and_events(self):
+        bus = EventBus()
+        bus.subscribe(lambda events: None, 'sink')
+        with bus.batch():
+            for _ in range(3):
+                bus.publish(NoteCreated(None))
+        bus.publish(NoteCreated(None))
+        stats = bus.stats()['sink']
+        self.assertEqual((stats['deliveries'], stats['events']), (2, 4))
+        bus.reset_stats()
+        self.assertEqual(bus.stats()['sink']['events'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import random
+import unittest
+from collections import deque
+
+from models.GraphStore import GraphStore
+from models.Note import Note
+from utils.GraphAnalytics import GraphAnalytics
+from tests import random_edits, reset_vault
+
+
+def weighted_edges(notes, weights):
+    """(source, target, weight) of every link, by position in `notes`"""
+    index = {note: i for i, note in enumerate(notes)}
+    return [(i, index[other], weights[relation])
+            for i, note in enumerate(notes)
+            for relation in GraphStore.RELATIONS if weights[relation] > 0
+            for other in getattr(note, relation)]
+
+
+def pagerank_scan(count, edges, damping=0.85, iterations=200):
+    out_weight = [0.0] * count
+    for source, _, weight in edges:
+        out_weight[source] += weight
+    rank = [1.0 / count] * count
+    for _ in range(iterations):
+        dangling = sum(rank[i] for i in range(count) if out_weight[i] == 0)
+        new_rank = [(1 - damping) / count + damping * dangling / count] * count
+        for source, target, weight in edges:
+            new_rank[target] += damping * rank[source] * weight / out_weight[source]
+        rank = new_rank
+    return rank
+
+
+def components_scan(count, edges):
+    """Sets of note positions connected by links in either direction"""
+    adjacent = [[] for _ in range(count)]
+    for source, target, _ in edges:
+        adjacent[source].append(target)
+        adjacent[target].append(source)
+    seen, components = set(), []
+    for start in range(count):
+        if start in seen:
+            continue
+        seen.add(start)
+        component, queue = {start}, deque([start])
+        while queue:
+            for other in adjacent[queue.popleft()]:
+                if other not in seen:
+                    seen.add(other)
+                    component.add(other)
+                    queue.append(other)
+        components.append(component)
+    return components
+
+
+def betweenness_scan(count, edges):
+    """Exact betweenness (Brandes), counting parallel links as separate paths"""
+    adjacent = [[] for _ in range(count)]
+    for source, target, _ in edges:
+        adjacent[source].append(target)
+    scores = [0.0] * count
+    for source in range(count):
+        distance = [-1] * count
+        paths = [0.0] * count
+        predecessors = [[] for _ in range(count)]
+        distance[source], paths[source] = 0, 1.0
+        order, queue = [], deque([source])
+        while queue:
+            tail = queue.popleft()
+            order.append(tail)
+            for head in adjacent[tail]:
+                if distance[head] == -1:
+                    distance[head] = distance[tail] + 1
+                    queue.append(head)
+                if distance[head] == distance[tail] + 1:
+                    paths[head] += paths[tail]
+                    predecessors[head].append(tail)
+        dependency = [0.0] * count
+        for head in reversed(order):
+            for tail in predecessors[head]:
+                dependency[tail] += paths[tail] / paths[head] * (1 + dependency[head])
+            if head != source:
+                scores[head] += dependency[head]
+    return [score / 2 for score in scores]
+
+
+@unittest.skipUnless(GraphAnalytics.available(), "GraphAnalytics needs NumPy")
+class GraphAnalyticsTest(unittest.TestCase):
+    def setUp(self):
+        reset_vault()
+        self.addCleanup(reset_vault)
+
+    def vaults(self):
+        for seed in range(4):
+            reset_vault()
+            random_edits(random.Random(seed), 250)
+            yield seed, Note.get_all_notes()
+
+    def test_measures_match_a_scan(self):
+        for weights in ({}, {'neighbors': 0}):
+            for seed, notes in self.vaults():
+                with self.subTest(seed=seed, weights=weights):
+                    analytics = GraphAnalytics(GraphStore(notes), weights)
+                    edges = weighted_edges(notes, analytics.weights)
+
+                    for score, expected in zip(analytics.pagerank(tolerance=1e-12),
+                                               pagerank_scan(len(notes), edges)):
+                        self.assertAlmostEqual(score, expected, places=7)
+
+                    for score, expected in zip(analytics.betweenness(samples=len(notes)),
+                                               betweenness_scan(len(notes), edges)):
+                        self.assertAlmostEqual(score, expected, places=6)
+
+                    labels = analytics.components()
+                    expected = components_scan(len(notes), edges)
+                    self.assertEqual({frozenset(i for i in range(len(notes)) if labels[i] == c)
+                                      for c in set(labels.tolist())},
+                                     {frozenset(component) for component in expected})
+                    self.assertEqual(int((labels == 0).sum()), max(map(len, expected)))
+
+    def test_orphan_clusters_leave_out_the_largest_component_and_single_notes(self):
+        for seed, notes in self.vaults():
+            with self.subTest(seed=seed):
+                analytics = GraphAnalytics(GraphStore(notes))
+                components = sorted(components_scan(len(notes), weighted_edges(notes, analytics.weights)),
+                                    key=len, reverse=True)
+                clusters = analytics.orphan_clusters()
+                self.assertEqual(sorted(map(len, clusters), reverse=True),
+                                 [len(c) for c in components[1:] if len(c) >= 2])
+                self.assertEqual([len(c) for c in clusters], sorted(map(len, clusters), reverse=True))
+
+
+if __name__ == '__main__':
+    unittest.main()
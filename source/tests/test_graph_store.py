@@ -0,0 +1,51 @@
+import random
+import unittest
+
+from models.GraphStore import GraphStore
+from models.Note import Note
+from utils.NoteStats import NoteStats
+from tests import TAGS, random_edits, reset_vault
+
+
+class GraphStoreTest(unittest.TestCase):
+    def setUp(self):
+        reset_vault()
+        self.addCleanup(reset_vault)
+        random_edits(random.Random(13), 400)
+        self.notes = Note.get_all_notes()
+        self.store = GraphStore(self.notes)
+
+    def test_arrays_match_the_notes(self):
+        store = self.store
+        for i, note in enumerate(self.notes):
+            for relation in GraphStore.RELATIONS:
+                self.assertEqual([store.notes[j] for j in store.related(i, relation)],
+                                 list(getattr(note, relation)))
+                self.assertEqual(store.degree(i, relation), len(getattr(note, relation)))
+            self.assertEqual(store.degrees()[i], sum(len(getattr(note, r)) for r in GraphStore.RELATIONS))
+        for tag in TAGS + ('missing',):
+            self.assertEqual([store.notes[i] for i in store.notes_with_tag(tag)],
+                             [note for note in self.notes if tag in note.tags])
+        self.assertEqual(store.edge_count(), sum(store.degrees()))
+
+    def test_stats_match_a_scan_of_the_notes(self):
+        expected = NoteStats.get_note_stats(self.notes)
+        stats = NoteStats.get_store_stats(self.store)
+        for key in ('total_notes', 'total_connections', 'avg_connections_per_note',
+                    'tag_distribution', 'depth_distribution'):
+            self.assertEqual(stats[key], expected[key], key)
+        self.assertEqual(set(stats['isolated_notes']), set(expected['isolated_notes']))
+        self.assertEqual(set(stats['notes_in_cycles']), set(expected['notes_in_cycles']))
+        self.assertEqual([degree for _, degree in stats['most_connected_notes']],
+                         [degree for _, degree in expected['most_connected_notes']])
+
+    def test_goes_stale_on_structural_edits_only(self):
+        note = self.notes[0]
+        note.update(title=note.title + "x")
+        self.assertTrue(self.store.is_current())
+        note.add_tag("new tag")
+        self.assertFalse(self.store.is_current())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import random
+import unittest
+from collections import deque
+
+from models.Note import Note
+from utils.GraphTraversal import GraphTraversal, ReachabilityIndex
+from tests import RELATION_SETS, random_edits, reset_vault
+
+
+def distances(start, relations):
+    """Plain breadth-first distances from `start` along `relations`"""
+    found = {start: 0}
+    queue = deque([start])
+    while queue:
+        note = queue.popleft()
+        for relation in relations:
+            for other in getattr(note, relation):
+                if other not in found:
+                    found[other] = found[note] + 1
+                    queue.append(other)
+    return found
+
+
+class GraphTraversalTest(unittest.TestCase):
+    def setUp(self):
+        reset_vault()
+        self.addCleanup(reset_vault)
+        self.rng = random.Random(21)
+
+    def test_walks_match_plain_distances(self):
+        random_edits(self.rng, 400)
+        for start in self.rng.sample(Note.get_all_notes(), 20):
+            for relations in (RELATION_SETS, ('children',), ('parents', 'neighbors')):
+                expected = distances(start, relations)
+                self.assertEqual(dict(GraphTraversal.bfs(start, relations)), expected)
+                self.assertEqual(dict(GraphTraversal.bfs(start, relations, max_depth=2)),
+                                 {note: d for note, d in expected.items() if d <= 2})
+                walked = dict(GraphTraversal.dfs(start, relations))
+                self.assertEqual(set(walked), set(expected))
+                self.assertTrue(all(walked[note] >= d for note, d in expected.items()))
+                self.assertTrue(all(d <= 2 for _, d in GraphTraversal.dfs(start, relations, 2)))
+            self.assertEqual(set(GraphTraversal.descendants(start)),
+                             set(distances(start, ('children',))) - {start})
+            self.assertEqual(set(GraphTraversal.ancestors(start)),
+                             set(distances(start, ('parents',))) - {start})
+
+    def test_shortest_paths_are_shortest(self):
+        random_edits(self.rng, 400)
+        notes = Note.get_all_notes()
+        for _ in range(300):
+            source, target = self.rng.choice(notes), self.rng.choice(notes)
+            relations = self.rng.choice((RELATION_SETS, ('children',), ('neighbors', 'parents')))
+            path = GraphTraversal.shortest_path(source, target, relations)
+            expected = distances(source, relations).get(target)
+            if expected is None:
+                self.assertIsNone(path)
+                continue
+            self.assertEqual(len(path) - 1, expected)
+            self.assertIs(path[0], source)
+            self.assertIs(path[-1], target)
+            for note, following in zip(path, path[1:]):
+                self.assertTrue(any(following in getattr(note, relation) for relation in relations))
+
+    def test_reachability_index_matches_a_walk(self):
+        index = ReachabilityIndex()
+        random_edits(self.rng, 150)
+        index.start()
+        self.addCleanup(index.stop)
+        deleted = []
+        for _ in range(6):
+            random_edits(self.rng, 100, deleted)
+            notes = Note.get_all_notes()
+            for ancestor in notes:
+                below = distances(ancestor, ('children',))
+                for note in notes:
+                    self.assertEqual(index.reaches(ancestor, note), note in below)
+                    self.assertEqual(index.is_ancestor(ancestor, note),
+                                     note is not ancestor and note in below)
+            for _ in range(50):
+                parent, child = self.rng.choice(notes), self.rng.choice(notes)
+                self.assertEqual(index.would_create_cycle(parent, child),
+                                 parent in distances(child, ('children',)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import contextlib
+import io
+import os
+import random
+import tempfile
+import unittest
+
+import cli
+from models.Note import Note
+from models.NoteState import NoteState
+from utils.MarkdownImporter import MarkdownImporter
+from tests import RELATION_SETS, random_edits, reset_vault
+
+
+def vault_state():
+    """Fields and relations of every note by id; imports drop links of a note to itself"""
+    return {note.id: (note.title, note.text, note.tags,
+                      [sorted(other.id for other in getattr(note, relation) if other is not note)
+                       for relation in RELATION_SETS])
+            for note in Note.get_all_notes()}
+
+
+class MarkdownImporterTest(unittest.TestCase):
+    def setUp(self):
+        reset_vault()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(reset_vault)
+        self.directory = directory.name
+
+    def export(self, name: str) -> str:
+        """Write the vault as Markdown with `cli.py export`, returning the directory"""
+        filename = os.path.join(self.directory, name + '.json')
+        NoteState(filename).save_notes(Note.get_all_notes())
+        path = os.path.join(self.directory, name)
+        with contextlib.redirect_stderr(io.StringIO()):
+            cli.main(['--vault', filename, 'export', path, '--format', 'markdown'])
+        return path
+
+    def test_exported_vault_imports_back(self):
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                reset_vault()
+                random_edits(random.Random(6), 300)
+                expected = vault_state()
+                path = self.export(f'vault-{workers}')
+                reset_vault()
+                report = MarkdownImporter(workers, chunk_size=4).import_directory(path)
+                self.assertEqual(report['notes'], len(expected))
+                self.assertEqual(report['unresolved_links'], 0)
+                self.assertEqual(vault_state(), expected)
+
+    def test_notes_already_in_the_vault_are_skipped(self):
+        random_edits(random.Random(2), 100)
+        expected = vault_state()
+        path = self.export('vault')
+        report = MarkdownImporter(1).import_directory(path)
+        self.assertEqual(report['notes'], 0)
+        self.assertEqual(report['skipped'], len(expected))
+        self.assertEqual(vault_state(), expected)
+
+    def test_wikilinks_resolve_by_file_name_path_and_title(self):
+        os.makedirs(os.path.join(self.directory, 'notes', 'sub'))
+        files = {
+            'notes/Index.md': "---\ntags: [home]\nchildren:\n  - \"[[sub/Deep]]\"\n---\n"
+                              "See [[Other|alias]] and [[A Title#heading]] and [[Missing]].",
+            'notes/Other.md': "Plain text, no front matter",
+            'notes/sub/Deep.md': "---\ntitle: A Title\nparents: [\"[[Index]]\"]\n---\nDeep",
+        }
+        for name, content in files.items():
+            with open(os.path.join(self.directory, name), 'w', encoding='utf-8') as f:
+                f.write(content)
+        report = MarkdownImporter(1).import_directory(os.path.join(self.directory, 'notes'))
+        by_title = {note.title: note for note in Note.get_all_notes()}
+        index, other, deep = by_title['Index'], by_title['Other'], by_title['A Title']
+        self.assertEqual(index.tags, ['home'])
+        self.assertEqual(list(index.children), [deep])
+        self.assertEqual(list(deep.parents), [index])
+        self.assertEqual(set(index.neighbors), {other, deep})
+        self.assertEqual(report['unresolved_links'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
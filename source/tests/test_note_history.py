@@ -0,0 +1,64 @@
+import json
+import os
+import random
+import tempfile
+import unittest
+
+from models.Note import Note
+from utils.NoteHistory import NoteHistory
+from tests import random_edits, reset_vault
+
+
+class NoteHistoryTest(unittest.TestCase):
+    def setUp(self):
+        reset_vault()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(reset_vault)
+        self.history = NoteHistory(os.path.join(directory.name, 'notes.history'), retention=50)
+        self.history.start()
+        self.addCleanup(self.history.stop)
+
+    def all_changes(self):
+        """Every recorded change, read from the whole log and from memory"""
+        changes = []
+        if os.path.exists(self.history.filename):
+            with open(self.history.filename, 'r', encoding='utf-8') as f:
+                changes = [json.loads(line) for line in f]
+        return changes + [self.history._as_dict(entry) for entry in self.history._entries]
+
+    def assertMatchesScan(self, notes):
+        changes = self.all_changes()
+        timestamps = sorted({change['timestamp'] for change in changes})
+        bounds = [None, timestamps[0], timestamps[len(timestamps) // 2], timestamps[-1]]
+        for note in notes:
+            for since in bounds:
+                for until in bounds:
+                    expected = [change for change in changes if change['note_id'] == note.id
+                                and (since is None or change['timestamp'] >= since)
+                                and (until is None or change['timestamp'] < until)]
+                    self.assertEqual(self.history.query(since, until, note), expected)
+        self.assertEqual(self.history.query(), changes)
+
+    def test_note_queries_match_a_scan_as_the_log_grows(self):
+        rng = random.Random(5)
+        for _ in range(4):
+            random_edits(rng, 150)
+            # Notes of the vault and deleted ones alike
+            notes = list(Note.get_all_notes())
+            self.assertMatchesScan(rng.sample(notes, min(10, len(notes))))
+        self.assertGreater(os.path.getsize(self.history.filename), 0)
+
+    def test_history_by_title(self):
+        note = Note("Old title", "")
+        note.update(title="New title")
+        note.add_tag("idea")
+        self.assertEqual([change['change_type'] for change in self.history.get_note_history("Old title")],
+                         ['create'])
+        self.assertEqual([change['change_type'] for change in self.history.get_note_history("New title")],
+                         ['update', 'tag'])
+        self.assertEqual(len(self.history.get_note_history(note)), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
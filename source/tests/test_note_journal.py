@@ -0,0 +1,57 @@
+import os
+import random
+import tempfile
+import unittest
+
+from models.Note import Note
+from models.NoteState import NoteState
+from tests import describe, random_edits, reset_vault
+
+
+class NoteJournalTest(unittest.TestCase):
+    def setUp(self):
+        reset_vault()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.addCleanup(reset_vault)
+
+    def edit_and_reload(self, snapshot_format: str, seed: int):
+        """Journal random edits of a saved vault, then load it into a fresh one"""
+        filename = os.path.join(self.directory.name, f'{snapshot_format}-{seed}', 'notes.json')
+        os.makedirs(os.path.dirname(filename))
+        rng = random.Random(seed)
+        random_edits(rng, 100)
+        state = NoteState(filename, snapshot_format)
+        state.save_notes(Note.get_all_notes())
+        state.attach(Note._all_notes)
+        random_edits(rng, 500)
+        expected = describe(Note.get_all_notes())
+        self.assertGreater(state.journal.record_count, 0)
+        state.close()
+
+        reset_vault()
+        state = NoteState(filename, snapshot_format)
+        loaded = state.load_notes()
+        self.addCleanup(lambda: state.snapshot and state.snapshot.close())
+        return expected, loaded
+
+    def test_replay_matches_the_edited_vault(self):
+        for snapshot_format in ('json', 'binary'):
+            for seed in range(3):
+                with self.subTest(snapshot_format=snapshot_format, seed=seed):
+                    expected, loaded = self.edit_and_reload(snapshot_format, seed)
+                    self.assertEqual(describe(loaded), expected)
+                    reset_vault()
+
+    def test_replayed_deletes_leave_the_vault_lists_consistent(self):
+        expected, loaded = self.edit_and_reload('json', 7)
+        self.assertEqual([note.id for note in Note.get_all_notes()], [row[0] for row in expected])
+        self.assertEqual(set(Note._notes_by_id), {row[0] for row in expected})
+        for note in loaded:
+            for relation in ('parents', 'children', 'neighbors'):
+                self.assertTrue(all(Note.get_note(other.id) is other
+                                    for other in getattr(note, relation)))
+
+
+if __name__ == '__main__':
+    unittest.main()
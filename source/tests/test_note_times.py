@@ -0,0 +1,101 @@
+import random
+import unittest
+
+from models.Note import Note
+from models.NoteTimes import MISSING, to_iso, to_micros
+from tests import reset_vault
+
+START = to_micros("2000-01-01T00:00:00")
+SPAN = to_micros("2030-01-01T00:00:00") - START
+
+
+class NoteTimesTest(unittest.TestCase):
+    def setUp(self):
+        reset_vault()
+        self.addCleanup(reset_vault)
+        self.rng = random.Random(12)
+        # Every time is used once, so orders never depend on ties
+        self.used = set()
+
+    def new_time(self):
+        while True:
+            micros = START + self.rng.randrange(SPAN)
+            if micros not in self.used:
+                self.used.add(micros)
+                return micros
+
+    def random_changes(self, count, deleted):
+        rng = self.rng
+        for _ in range(count):
+            notes = Note.get_all_notes()
+            roll = rng.random()
+            if roll < 0.3 or not notes:
+                note = Note("Title", "")
+                note.created_at = to_iso(self.new_time())
+                note.modified_at = to_iso(self.new_time())
+            elif roll < 0.6:
+                # Mostly newer times, as edits give, sometimes older ones
+                note = rng.choice(notes)
+                note.modified_at = to_iso(self.new_time())
+            elif roll < 0.65:
+                rng.choice(notes).created_at = to_iso(self.new_time())
+            elif roll < 0.7:
+                note = rng.choice(notes)
+                setattr(note, rng.choice(('created_at', 'modified_at')), None)
+            elif roll < 0.8:
+                note = rng.choice(notes)
+                note.delete()
+                deleted.append(note)
+            elif deleted:
+                deleted.pop(rng.randrange(len(deleted))).restore()
+
+    def assertMatchesScan(self):
+        times = Note._times
+        notes = Note.get_all_notes()
+        created = {note: times.created[note._row] for note in notes
+                   if times.created[note._row] != MISSING}
+        modified = {note: times.modified[note._row] for note in notes
+                    if times.modified[note._row] != MISSING}
+        by_modified = sorted(modified, key=modified.get)
+        for _ in range(20):
+            low, high = sorted((START + self.rng.randrange(SPAN), START + self.rng.randrange(SPAN)))
+            limit = self.rng.choice((1, 10, 100, 10_000))
+            self.assertEqual(Note.created_between(to_iso(low), to_iso(high)),
+                             sorted((n for n, t in created.items() if low <= t < high), key=created.get))
+            self.assertEqual(Note.recently_modified(limit, to_iso(low)),
+                             [n for n in reversed(by_modified) if modified[n] >= low][:limit])
+            self.assertEqual(Note.recently_modified(limit),
+                             list(reversed(by_modified))[:limit])
+            self.assertEqual(times.stale(to_iso(high), limit),
+                             [n for n in by_modified if modified[n] < high][:limit])
+            self.assertEqual(times.stale(to_iso(high)),
+                             [n for n in by_modified if modified[n] < high])
+
+    def test_range_queries_match_a_scan(self):
+        deleted = []
+        for _ in range(8):
+            self.random_changes(150, deleted)
+            self.assertMatchesScan()
+
+    def test_bulk_assignment_matches_a_scan(self):
+        notes = [Note("Title", "") for _ in range(300)]
+        created = [to_iso(self.new_time()) if self.rng.random() < 0.9 else None for _ in notes]
+        modified = [to_iso(self.new_time()) for _ in notes]
+        Note.set_iso_times(notes, created, modified)
+        self.assertEqual(Note.iso_times(notes), (created, modified))
+        self.assertMatchesScan()
+        Note.set_micro_times(notes, *Note.micro_times(list(reversed(notes))))
+        self.assertEqual(Note.iso_times(notes), (created[::-1], modified[::-1]))
+        self.assertMatchesScan()
+
+    def test_rows_stay_with_their_notes(self):
+        note = Note("Title", "")
+        row = note._row
+        note.delete()
+        self.assertIsNone(Note._times.notes[row])
+        note.restore()
+        self.assertIs(Note._times.notes[row], note)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import random
+import unittest
+
+from models.Note import Note
+from tests import random_edits, reset_vault
+from utils.NoteSearch import NoteSearch
+from utils.SearchIndex import SearchIndex
+from utils.TermIndex import TermIndex
+
+QUERIES = ("alpha", "ALPHA", "text", "ünï", "more", "other text", "gam", "no such thing", "al", "x",
+           "idea", "tod")
+
+
+def scan(notes, query):
+    query = query.lower()
+    return [note for note in notes
+            if query in note.title.lower() or query in note.text.lower()
+            or any(query in tag.lower() for tag in note.tags)]
+
+
+class SearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        reset_vault()
+        self.addCleanup(reset_vault)
+        self.addCleanup(NoteSearch.unfollow)
+        NoteSearch.index = SearchIndex()
+        NoteSearch.ranked = TermIndex()
+        self.rng = random.Random(5)
+        random_edits(self.rng, 80)
+
+    def assertMatchesScan(self, notes):
+        for query in QUERIES:
+            self.assertEqual(NoteSearch.index.search(notes, query), scan(notes, query), query)
+
+    def test_full_index(self):
+        notes = Note.get_all_notes()
+        self.assertTrue(NoteSearch.index.build(notes))
+        self.assertTrue(NoteSearch.index.covers(notes))
+        self.assertMatchesScan(notes)
+
+    def test_partial_index_scans_the_rest(self):
+        for i in range(100):
+            Note(f"Alpha {i}", "text")
+        notes = Note.get_all_notes()
+        NoteSearch.index.build(notes, 0)
+        self.assertFalse(NoteSearch.index.covers(notes))
+        self.assertMatchesScan(notes)
+
+    def test_follows_random_edits(self):
+        NoteSearch.follow()
+        NoteSearch.index.build(Note.get_all_notes())
+        for _ in range(100):
+            random_edits(self.rng, self.rng.randint(1, 4))
+            self.assertMatchesScan(Note.get_all_notes())
+
+    def test_other_list_of_same_length(self):
+        notes = Note.get_all_notes()
+        NoteSearch.index.build(notes)
+        other = list(reversed(notes))
+        self.assertFalse(NoteSearch.index.build(other))
+        self.assertFalse(NoteSearch.index.covers(other))
+        self.assertMatchesScan(other)
+        # Same length, other notes
+        subset = notes[:len(notes) // 2] * 2
+        self.assertMatchesScan(subset)
+
+    def test_unfollowed_changes_fall_back_to_scan(self):
+        notes = Note.get_all_notes()
+        NoteSearch.index.build(notes)
+        Note("Alpha late", "other text")
+        self.assertMatchesScan(notes)
+
+    def test_edit_spans(self):
+        note = Note("Title", "one two three four")
+        index = SearchIndex()
+        index.update_note(note)
+        for text in ("one two three four five", "zero one two three four five", "zero one",
+                     "", "ÜNÏ ünï", "one two three four"):
+            note.update(text=text)
+            index.update_note(note)
+            for query in ("one", "two thr", "ünï", "five", "zero"):
+                self.assertEqual(index.search([note], query), scan([note], query), (text, query))
+            fresh = SearchIndex()
+            fresh.update_note(note)
+            self.assertEqual(index._postings, fresh._postings, text)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import random
+import tempfile
+import unittest
+
+from models.Note import Note
+from models.SqliteNoteState import SqliteNoteState
+from tests import describe, random_edits, reset_vault
+
+
+class SqliteNoteStateTest(unittest.TestCase):
+    def setUp(self):
+        reset_vault()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.addCleanup(reset_vault)
+        self.directory = directory.name
+        self.filename = os.path.join(directory.name, 'notes.db')
+        self.json_filename = os.path.join(directory.name, 'notes.json')
+
+    def reload(self, state: SqliteNoteState):
+        state.close()
+        reset_vault()
+        state = SqliteNoteState(state.filename, self.json_filename)
+        self.addCleanup(state.close)
+        return state, state.load_notes()
+
+    def test_attached_edits_match_the_vault(self):
+        for seed in range(3):
+            with self.subTest(seed=seed):
+                reset_vault()
+                rng = random.Random(seed)
+                random_edits(rng, 50)
+                state = SqliteNoteState(os.path.join(self.directory, f'notes-{seed}.db'),
+                                        self.json_filename)
+                state.save_notes(Note.get_all_notes())
+                state.attach(Note._all_notes)
+                random_edits(rng, 400)
+                expected = describe(Note.get_all_notes())
+                state, loaded = self.reload(state)
+                self.assertEqual(describe(loaded), expected)
+
+    def test_save_notes_drops_deleted_notes(self):
+        rng = random.Random(9)
+        random_edits(rng, 200)
+        state = SqliteNoteState(self.filename, self.json_filename)
+        state.save_notes(Note.get_all_notes())
+        for note in rng.sample(Note.get_all_notes(), 10):
+            note.delete()
+        expected = describe(Note.get_all_notes())
+        state.save_notes(Note.get_all_notes())
+        state, loaded = self.reload(state)
+        self.assertEqual(describe(loaded), expected)
+
+    def test_texts_load_lazily(self):
+        note = Note("Title", "Body ünï")
+        state = SqliteNoteState(self.filename, self.json_filename)
+        state.save_notes([note])
+        state, (loaded,) = self.reload(state)
+        self.assertIsNone(loaded._text)
+        self.assertEqual(loaded.text, "Body ünï")
+
+
+if __name__ == '__main__':
+    unittest.main()
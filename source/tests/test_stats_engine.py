@@ -0,0 +1,64 @@
+import random
+import unittest
+
+from models.Note import Note
+from tests import random_edits, reset_vault
+from utils.NoteStats import NoteStats
+from utils.StatsEngine import StatsEngine
+
+
+class StatsEngineTest(unittest.TestCase):
+    def setUp(self):
+        reset_vault()
+        self.addCleanup(reset_vault)
+
+    def assertMatchesScan(self, engine: StatsEngine):
+        expected = NoteStats.get_note_stats(Note.get_all_notes())
+        actual = engine.get_stats()
+        for key in ('total_notes', 'total_connections', 'avg_connections_per_note',
+                    'tag_distribution', 'depth_distribution'):
+            self.assertEqual(actual[key], expected[key], key)
+        self.assertEqual(set(actual['isolated_notes']), set(expected['isolated_notes']))
+        self.assertEqual(set(actual['notes_in_cycles']), set(expected['notes_in_cycles']))
+        # Ties may be ordered differently: compare the degrees
+        self.assertEqual([degree for _, degree in actual['most_connected_notes']],
+                         [degree for _, degree in expected['most_connected_notes']])
+
+    def test_follows_random_edits(self):
+        rng = random.Random(12)
+        random_edits(rng, 30)
+        engine = StatsEngine(Note.get_all_notes())
+        engine.start()
+        for _ in range(200):
+            random_edits(rng, rng.randint(1, 5))
+            self.assertMatchesScan(engine)
+
+    def test_batched_edits(self):
+        rng = random.Random(7)
+        engine = StatsEngine([])
+        engine.start()
+        for _ in range(50):
+            with Note.events.batch():
+                random_edits(rng, 10)
+            self.assertMatchesScan(engine)
+
+    def test_new_root_counts_at_depth_zero(self):
+        engine = StatsEngine(Note.get_all_notes())
+        engine.start()
+        Note("Root", "")
+        engine.get_stats()
+        Note("Another root", "")
+        self.assertEqual(engine.get_stats()['depth_distribution'][0], 2)
+
+    def test_self_neighbor_counts_once(self):
+        note = Note("Self", "")
+        engine = StatsEngine(Note.get_all_notes())
+        engine.start()
+        note.add_neighbor(note)
+        self.assertMatchesScan(engine)
+        note.remove_neighbor(note)
+        self.assertMatchesScan(engine)
+
+
+if __name__ == '__main__':
+    unittest.main()
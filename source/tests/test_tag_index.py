@@ -0,0 +1,61 @@
+import random
+import unittest
+
+from models.Note import Note
+from utils.TagIndex import TagIndex
+from tests import TAGS, random_edits, reset_vault
+
+EXPRESSIONS = ('idea', 'ünï', 'idea AND todo', 'idea OR "ref"', 'NOT done',
+               'idea AND (todo OR ref) NOT done', '(ünï OR done) AND NOT (idea OR todo)',
+               'missing', 'missing OR ref')
+
+
+class TagIndexTest(unittest.TestCase):
+    def setUp(self):
+        reset_vault()
+        self.addCleanup(reset_vault)
+
+    def assertMatchesScan(self, index):
+        notes = Note.get_all_notes()
+        for expression in EXPRESSIONS:
+            matches = TagIndex.matcher(expression)
+            expected = [note for note in notes if matches(note.tags)]
+            self.assertEqual(index.query(expression), expected, expression)
+            self.assertEqual(index.count(expression), len(expected))
+        for tag in TAGS:
+            self.assertEqual(index.with_tag(tag), [note for note in notes if tag in note.tags])
+
+    def test_followed_index_matches_a_scan(self):
+        for batched in (False, True):
+            with self.subTest(batched=batched):
+                reset_vault()
+                rng = random.Random(4)
+                random_edits(rng, 100)
+                index = TagIndex(Note.get_all_notes())
+                index.start()
+                self.addCleanup(index.stop)
+                self.assertMatchesScan(index)
+                deleted = []
+                for _ in range(10):
+                    if batched:
+                        with Note.events.batch():
+                            random_edits(rng, 60, deleted)
+                    else:
+                        random_edits(rng, 60, deleted)
+                    self.assertMatchesScan(index)
+
+    def test_matcher_agrees_with_bitsets(self):
+        rng = random.Random(8)
+        random_edits(rng, 300)
+        self.assertMatchesScan(TagIndex(Note.get_all_notes()))
+
+    def test_bad_expressions(self):
+        index = TagIndex([])
+        for expression in ('idea AND', '(idea', 'idea)', 'AND', ''):
+            with self.subTest(expression=expression):
+                with self.assertRaises(ValueError):
+                    index.query(expression)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import random
+import unittest
+
+from models.Note import Note
+from tests import random_edits, reset_vault
+from utils.NoteSearch import NoteSearch
+from utils.SearchIndex import SearchIndex
+from utils.TermIndex import TermIndex
+
+QUERIES = ("alpha", "text", "ünï", "more other", "gamma note", "idea todo", "nothing")
+
+
+class TermIndexTest(unittest.TestCase):
+    def setUp(self):
+        reset_vault()
+        self.addCleanup(reset_vault)
+        self.addCleanup(NoteSearch.unfollow)
+        NoteSearch.index = SearchIndex()
+        NoteSearch.ranked = TermIndex()
+        self.rng = random.Random(16)
+        random_edits(self.rng, 60)
+
+    def assertMatchesFresh(self, index: TermIndex):
+        fresh = TermIndex()
+        fresh.sync(Note.get_all_notes())
+        self.assertEqual(index._terms, fresh._terms)
+        for query in QUERIES:
+            # Ties may come in another order: compare the scores
+            self.assertEqual([round(score, 9) for _, score in index.search(query, 5)],
+                             [round(score, 9) for _, score in fresh.search(query, 5)], query)
+
+    def test_sync_after_unfollowed_edits(self):
+        index = TermIndex()
+        index.sync(Note.get_all_notes())
+        for _ in range(50):
+            random_edits(self.rng, 3)
+            for note in Note.get_all_notes():
+                index.update_note(note)
+            index.sync(Note.get_all_notes())
+            self.assertMatchesFresh(index)
+
+    def test_follows_random_edits(self):
+        NoteSearch.follow()
+        NoteSearch.search_ranked(Note.get_all_notes(), "alpha")
+        for _ in range(100):
+            random_edits(self.rng, self.rng.randint(1, 4))
+            NoteSearch.ranked.sync(Note.get_all_notes())
+            self.assertMatchesFresh(NoteSearch.ranked)
+
+    def test_create_and_delete_without_events_keep_length(self):
+        index = TermIndex()
+        index.sync(Note.get_all_notes())
+        Note("Alpha created", "text")
+        Note.get_all_notes()[0].delete()
+        index.sync(Note.get_all_notes())
+        self.assertMatchesFresh(index)
+
+    def test_long_postings_use_impact_order(self):
+        TermIndex.SCAN_LIMIT, limit = 5, TermIndex.SCAN_LIMIT
+        self.addCleanup(setattr, TermIndex, 'SCAN_LIMIT', limit)
+        index = TermIndex()
+        index.sync(Note.get_all_notes())
+        for _ in range(30):
+            random_edits(self.rng, 3)
+            for note in Note.get_all_notes():
+                index.update_note(note)
+            index.sync(Note.get_all_notes())
+            self.assertMatchesFresh(index)
+
+
+if __name__ == '__main__':
+    unittest.main()
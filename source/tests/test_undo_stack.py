@@ -0,0 +1,85 @@
+import itertools
+import random
+import unittest
+
+from models.Note import Note
+from utils.UndoStack import UndoStack
+from tests import RELATION_SETS, random_edits, reset_vault
+
+
+def vault_state():
+    """Every note's fields and relations, independent of list and insertion order"""
+    return {note.id: (note.title, note.text, sorted(note.tags),
+                      [sorted(other.id for other in getattr(note, relation))
+                       for relation in RELATION_SETS])
+            for note in Note.get_all_notes()}
+
+
+class UndoStackTest(unittest.TestCase):
+    def setUp(self):
+        reset_vault()
+        self.addCleanup(reset_vault)
+        self.start_stack()
+
+    def start_stack(self):
+        self.stack = UndoStack(checkpoint_interval=3)
+        # Far apart in time, so no two edits coalesce into one step
+        ticks = itertools.count(step=10)
+        self.stack.clock = lambda: next(ticks)
+        self.stack.start()
+
+    def record(self, rng, count):
+        """Make `count` random edits, one step each, returning the vault state before each step"""
+        states, deleted = [], []
+        for _ in range(count):
+            before = vault_state()
+            steps = self.stack.stats()['undo_steps']
+            with self.stack.step():
+                random_edits(rng, 1, deleted)
+            # Edits that changed nothing, like removing a missing tag, leave no step
+            if self.stack.stats()['undo_steps'] > steps:
+                states.append(before)
+        return states
+
+    def test_undo_and_redo_one_step_at_a_time_match_the_recorded_states(self):
+        for seed in range(3):
+            with self.subTest(seed=seed):
+                reset_vault()
+                self.start_stack()
+                states = self.record(random.Random(seed), 200)
+                final = vault_state()
+                for expected in reversed(states):
+                    self.stack.undo()
+                    self.assertEqual(vault_state(), expected)
+                self.assertFalse(self.stack.can_undo())
+                for expected in states[1:] + [final]:
+                    self.stack.redo()
+                    self.assertEqual(vault_state(), expected)
+                self.assertFalse(self.stack.can_redo())
+
+    def test_undo_of_many_steps_at_once(self):
+        rng = random.Random(11)
+        states = self.record(rng, 150)
+        final = vault_state()
+        position = len(states)
+        while position:
+            count = min(rng.randint(1, 40), position)
+            self.stack.undo(count)
+            position -= count
+            self.assertEqual(vault_state(), states[position])
+        self.stack.redo(len(states))
+        self.assertEqual(vault_state(), final)
+
+    def test_keystrokes_coalesce_into_one_step(self):
+        note = Note("Title", "")
+        self.stack.clock = lambda: 0.0
+        for length in range(1, 30):
+            note.update(text="x" * length)
+        self.stack.undo()
+        self.assertEqual(note.text, "")
+        self.stack.redo()
+        self.assertEqual(note.text, "x" * 29)
+
+
+if __name__ == '__main__':
+    unittest.main()
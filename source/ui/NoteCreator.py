@@ -1,5 +1,6 @@
 # NoteCreator.py
 import dearpygui.dearpygui as dpg
+from contextlib import nullcontext
 from models.Note import Note
 
 class NoteCreator:
@@ -7,6 +8,7 @@ class NoteCreator:
         self.editor = editor
         self.active_note = None
         self.graph = None  # Will be set from main.py
+        self.undo = None  # UndoStack, set from main.py
         self.create_gui(width, height)
 
     def create_gui(self, width, height):
@@ -46,19 +48,21 @@ class NoteCreator:
         if not self.active_note:
             return
 
-        new_note = Note(
-            f"New {relation_type.capitalize()} Note",
-            f"This is a new {relation_type} note."
-        )
+        # The note and its relation are undone as one step
+        with self.undo.step() if self.undo else nullcontext():
+            new_note = Note(
+                f"New {relation_type.capitalize()} Note",
+                f"This is a new {relation_type} note."
+            )
 
-        # Create the appropriate relation
-        if relation_type == "child":
-            self.active_note.add_child(new_note)
-        elif relation_type == "parent":
-            new_note.add_child(self.active_note)
-        elif relation_type == "neighbor":
-            self.active_note.add_neighbor(new_note)
-            new_note.add_neighbor(self.active_note)
+            # Create the appropriate relation
+            if relation_type == "child":
+                self.active_note.add_child(new_note)
+            elif relation_type == "parent":
+                new_note.add_child(self.active_note)
+            elif relation_type == "neighbor":
+                self.active_note.add_neighbor(new_note)
+                new_note.add_neighbor(self.active_note)
 
         # Update the view
         if self.graph:
@@ -2,7 +2,8 @@
 import dearpygui.dearpygui as dpg
 from typing import Optional
 from models.Note import Note
-import datetime
+from utils.Profiler import Profiler
+from ui.RelationList import RelationList
 
 
 class NoteEditor:
@@ -10,6 +11,9 @@ class NoteEditor:
         self.current_note: Optional[Note] = None
         self.graph = None  # Will be set from main.py
         self.creator = None  # Will be set from main.py
+        self.undo = None  # UndoStack, set from main.py
+        # Note and relations version the relation lists were filled for
+        self._relations_key = None
         self.create_gui(width, height)
 
     def create_gui(self, width, height):
@@ -20,6 +24,10 @@ class NoteEditor:
                         tag="note_editor_window",
                         no_close=True,
                         no_collapse=True):
+            with dpg.group(horizontal=True):
+                dpg.add_button(label="Undo", callback=self.on_undo)
+                dpg.add_button(label="Redo", callback=self.on_redo)
+
             # Title input
             dpg.add_input_text(
                 label="Title",
@@ -48,9 +56,11 @@ class NoteEditor:
 
             # Relations section
             with dpg.collapsing_header(label="Relations", tag="relations_header"):
-                dpg.add_group(tag="parents_group", label="Parents")
-                dpg.add_group(tag="neighbors_group", label="Neighbors")
-                dpg.add_group(tag="children_group", label="Children")
+                self.relation_lists = [
+                    RelationList("Parents", "parents_group", "relations_header", self.on_relation_click),
+                    RelationList("Neighbors", "neighbors_group", "relations_header", self.on_relation_click),
+                    RelationList("Children", "children_group", "relations_header", self.on_relation_click),
+                ]
 
     def update_size(self, width, height):
         """Update window size and adjust content"""
@@ -63,16 +73,41 @@ class NoteEditor:
             if self.graph:
                 self.graph.update_graph()
 
+    @Profiler.timed('NoteEditor.save_changes')
     def save_changes(self):
         """Save current changes to the active note"""
         if not self.current_note:
             return
 
         # Update note properties
-        self.current_note.title = dpg.get_value("note_title")
-        self.current_note.text = dpg.get_value("note_text")
-        self.current_note.tags = [tag.strip() for tag in dpg.get_value("note_tags").split(",") if tag.strip()]
-        self.current_note.modified_at = datetime.datetime.now().isoformat()
+        self.current_note.update(
+            title=dpg.get_value("note_title"),
+            text=dpg.get_value("note_text"),
+            tags=[tag.strip() for tag in dpg.get_value("note_tags").split(",") if tag.strip()]
+        )
+
+    def on_undo(self):
+        if self.undo:
+            self.refresh_after(self.undo.undo())
+
+    def on_redo(self):
+        if self.undo:
+            self.refresh_after(self.undo.redo())
+
+    def refresh_after(self, touched):
+        """Bring the views up to date after an undo or redo"""
+        # Undoing the creation of the current note removes it
+        if self.current_note and Note.get_note(self.current_note.id) is not self.current_note:
+            fallback = next((n for n in touched if Note.get_note(n.id) is n), None)
+            if fallback is None and Note._all_notes:
+                fallback = Note._all_notes[0]
+            if self.graph and fallback:
+                self.graph.set_active_note(fallback)
+                return
+
+        self.update_note_view()
+        if self.graph:
+            self.graph.update_graph()
 
     def update_note_view(self):
         """Update the editor view with current note data"""
@@ -93,27 +128,33 @@ class NoteEditor:
 
     def clear_relations(self):
         """Clear all relation groups"""
-        for group in ["parents_group", "neighbors_group", "children_group"]:
-            dpg.delete_item(group, children_only=True)
+        for relation_list in self.relation_lists:
+            relation_list.set_notes([])
+        self._relations_key = None
 
+    @Profiler.timed('NoteEditor.update_relations')
     def update_relations(self):
         """Update the relations view"""
-        self.clear_relations()
-
-        def add_relation_links(notes, group_tag):
-            for note in notes:
-                dpg.add_button(
-                    label=f"{note.title} [{', '.join(note.tags)}]",
-                    callback=self.on_relation_click,
-                    user_data=note,
-                    parent=group_tag,
-                    width=-1
-                )
+        note = self.current_note
+        if note is None:
+            self.clear_relations()
+            return
 
-        if self.current_note:
-            add_relation_links(self.current_note.parents, "parents_group")
-            add_relation_links(self.current_note.neighbors, "neighbors_group")
-            add_relation_links(self.current_note.children, "children_group")
+        key = (note, note.relations_version)
+        if key == self._relations_key:
+            # Same relations: keep scroll and filter, only relabel the rows
+            for relation_list in self.relation_lists:
+                relation_list.refresh()
+            return
+        self._relations_key = key
+        for relation_list, notes in zip(self.relation_lists,
+                                         (note.parents, note.neighbors, note.children)):
+            relation_list.set_notes(notes)
+
+    def update_lists(self):
+        """Page relation rows in as the lists scroll; call once per frame"""
+        for relation_list in self.relation_lists:
+            relation_list.update()
 
     def on_relation_click(self, sender, app_data, user_data):
         """Handle clicks on relation links"""
@@ -124,4 +165,6 @@ class NoteEditor:
     def set_note(self, note: Note):
         """Set the current note and update the view"""
         self.current_note = note
+        if self.undo and note:
+            self.undo.track(note)
         self.update_note_view()
\ No newline at end of file
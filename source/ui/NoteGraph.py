@@ -1,7 +1,13 @@
 import dearpygui.dearpygui as dpg
 import math
-from typing import Dict, Tuple, Optional
+import random
+from typing import Dict, List, Tuple, Optional, Collection, Set
 from models.Note import Note
+from models.GraphStore import GraphStore
+from utils.SpatialIndex import SpatialIndex
+from utils.ForceLayout import ForceLayout
+from utils.LayoutCache import LayoutCache
+from utils.Profiler import Profiler
 
 
 class NoteGraph:
@@ -10,6 +16,9 @@ class NoteGraph:
         self.editor = editor
         self.active_note: Optional[Note] = None
         self.positions: Dict[Note, Tuple[float, float]] = {}
+        # Optional CSR snapshot of the vault, used while it is up to date;
+        # for read-only views, edits leave it stale until it is rebuilt
+        self.store: Optional[GraphStore] = None
         self.zoom_level = 1.0
         self.scroll_x = 0.0
         self.scroll_y = 0.0
@@ -20,8 +29,42 @@ class NoteGraph:
         self.horizontal_spacing = 150
         self.vertical_spacing = 100
 
+        # Retained draw items, updated in place instead of being recreated
+        self.node_items: Dict[Note, Tuple[int, int]] = {}
+        self.node_state: Dict[Note, tuple] = {}
+        self.edge_items: Dict[Tuple[Note, Note, str], int] = {}
+        self.edge_state: Dict[Tuple[Note, Note, str], tuple] = {}
+        self.drawn_positions: Dict[Note, Tuple[float, float]] = {}
+        self.drawn_graph_version = -1
+        self.drawn_view: Optional[Tuple[float, float, float, float]] = None
+        self.drawn_lod = False
+        # Connections between laid-out notes with their end points and
+        # bounds, collected when positions or relations change and culled
+        # when the view does
+        self.layout_edges: List[tuple] = []
+
+        # Grid over logical positions for picking and viewport culling
+        self.spatial_index = SpatialIndex(cell_size=max(self.horizontal_spacing, self.vertical_spacing))
+        # Below this zoom labels are hidden and only hierarchy links are drawn, thinner
+        self.lod_zoom_threshold = 0.5
+
+        # Notes up to `hops` relations away are laid out by a force simulation
+        # running in the background (needs NumPy, otherwise only direct
+        # relations are shown on fixed fans)
+        self.hops = 2
+        self.max_layout_notes = 3000
+        self.layout = ForceLayout(edge_length=self.horizontal_spacing)
+        self.layout_notes: List[Note] = []
+        # Finished layouts by (active note, hops, neighborhood version)
+        self.layout_cache = LayoutCache()
+        self.layout_key: Optional[tuple] = None  # key of the running simulation
+        # (active note, hops, Note._graph_version) the positions were computed for
+        self.positions_key: Optional[tuple] = None
+
         # Visual settings
+        # In screen pixels at every zoom level, like the label size
         self.node_radius = 20
+        self.label_offset = (-40, -7)  # approximate center offset for text
         self.colors = {
             "background": (32, 32, 32, 255),
             "node": (100, 100, 100, 255),
@@ -45,7 +88,11 @@ class NoteGraph:
                         no_scroll_with_mouse=True):
             # Main drawing canvas
             with dpg.drawlist(width=width, height=height, tag="draw_layer"):
-                pass
+                # Items use logical coordinates; the layers' transform maps
+                # them to the screen. Edges sit below nodes, labels on top.
+                dpg.add_draw_node(tag="edge_layer")
+                dpg.add_draw_node(tag="node_layer")
+                dpg.add_draw_node(tag="label_layer")
 
             # Controls group
             with dpg.group(horizontal=True, pos=(10, 10)):
@@ -59,18 +106,31 @@ class NoteGraph:
                 dpg.add_mouse_click_handler(callback=self.on_mouse_click)
 
     def update_size(self, width, height):
-        """Update window size and redraw graph"""
+        """Update window size and recenter the graph"""
         self.window_width = width
         self.window_height = height
         dpg.configure_item("draw_layer", width=width, height=height)
-        self.update_graph()
+        self.draw_graph()
 
     def reset_view(self) -> None:
         """Reset zoom and scroll position to default values"""
         self.zoom_level = 1.0
         self.scroll_x = 0.0
         self.scroll_y = 0.0
-        self.update_graph()
+        self.draw_graph()
+
+    def apply_view_transform(self) -> None:
+        """Apply zoom and scroll as a single transform of the draw layers"""
+        view = (dpg.create_scale_matrix([self.zoom_level, self.zoom_level, 1])
+                * dpg.create_translation_matrix([-self.scroll_x, -self.scroll_y]))
+        center = [self.window_width / 2, self.window_height / 2]
+        transform = dpg.create_translation_matrix(center) * view
+        dpg.apply_transform("edge_layer", transform)
+        dpg.apply_transform("node_layer", transform)
+        # Transforms move points only, so circle radii and text sizes stay in
+        # screen pixels; labels are shifted to the node center in pixels too
+        dpg.apply_transform("label_layer", dpg.create_translation_matrix(
+            [center[0] + self.label_offset[0], center[1] + self.label_offset[1]]) * view)
 
     def set_active_note(self, note: Note) -> None:
         """Set the active note and update the graph view"""
@@ -79,6 +139,7 @@ class NoteGraph:
         self.editor.update_note_view()
         self.update_graph()
 
+    @Profiler.timed('NoteGraph.update_graph')
     def update_graph(self) -> None:
         """Update the entire graph visualization"""
         if not self.active_note:
@@ -87,9 +148,116 @@ class NoteGraph:
         self.calculate_positions()
         self.draw_graph()
 
+    @Profiler.timed('NoteGraph.calculate_positions')
     def calculate_positions(self) -> None:
         """Calculate positions for all visible nodes"""
-        self.positions.clear()
+        # Title and text edits leave the graph version alone: nothing to lay out
+        positions_key = (self.active_note, self.hops, Note._graph_version)
+        if positions_key == self.positions_key:
+            return
+        self.positions_key = positions_key
+        if not self.active_note:
+            self.layout_key = None
+            self.calculate_fan_positions()
+            self.spatial_index.rebuild(self.positions)
+            return
+
+        force = self.hops > 0 and ForceLayout.available()
+        hops = self.hops if force else 1
+        reached = self.collect_neighborhood(hops)
+        # Relation changes stamp both notes with a new, higher version, so
+        # the maximum changes whenever anything in the neighborhood does
+        key = (self.active_note, hops, max(note.relations_version for note in reached))
+
+        if key == self.layout_key:
+            # Same neighborhood as the simulation under way: let it settle
+            return
+        self.layout_key = None
+        cached = self.layout_cache.get(key)
+        if cached is not None:
+            self.layout.cancel()
+            self.positions = cached
+        elif force:
+            self.calculate_neighborhood_positions(reached)
+            self.layout_key = key  # cached once the simulation settles
+        else:
+            self.calculate_fan_positions()
+            self.layout_cache.put(key, self.positions)
+        self.spatial_index.rebuild(self.positions)
+
+    def calculate_neighborhood_positions(self, reached: Dict[Note, Optional[Note]]) -> None:
+        """Seed the k-hop neighborhood and start the force layout on it"""
+        previous = self.positions
+        origin = previous.get(self.active_note, (0.0, 0.0))
+
+        # Warm start: notes already on screen keep their place, shifted so the
+        # active note is at the center; new ones start near the note they were
+        # reached from
+        positions: Dict[Note, Tuple[float, float]] = {}
+        for note, source in reached.items():
+            if note in previous:
+                x, y = previous[note]
+                positions[note] = (x - origin[0], y - origin[1])
+            elif source is None:
+                positions[note] = (0.0, 0.0)
+            else:
+                angle = random.uniform(0, 2 * math.pi)
+                base_x, base_y = positions[source]
+                positions[note] = (base_x + math.cos(angle) * self.vertical_spacing,
+                                   base_y + math.sin(angle) * self.vertical_spacing)
+        positions[self.active_note] = (0.0, 0.0)
+
+        self.layout_notes = list(reached)
+        index = {note: i for i, note in enumerate(self.layout_notes)}
+        edges = []
+        for i, note in enumerate(self.layout_notes):
+            for parent in self.get_related(note, 'parents'):
+                if parent in index:
+                    edges.append((i, index[parent]))
+            for neighbor in self.get_related(note, 'neighbors'):
+                j = index.get(neighbor)
+                if j is not None and i < j:
+                    edges.append((i, j))
+
+        self.positions = positions
+        self.layout.start([positions[note] for note in self.layout_notes], edges,
+                          pinned=index[self.active_note])
+
+    def collect_neighborhood(self, hops: int) -> Dict[Note, Optional[Note]]:
+        """Notes within `hops` relations of the active note, mapped to the note they were reached from"""
+        reached: Dict[Note, Optional[Note]] = {self.active_note: None}
+        frontier = [self.active_note]
+        for _ in range(hops):
+            next_frontier = []
+            for note in frontier:
+                for relation in ('parents', 'children', 'neighbors'):
+                    for other in self.get_related(note, relation):
+                        if other in reached:
+                            continue
+                        if len(reached) >= self.max_layout_notes:
+                            return reached
+                        reached[other] = note
+                        next_frontier.append(other)
+            frontier = next_frontier
+        return reached
+
+    def update_layout(self) -> None:
+        """Show the newest positions streamed by the layout thread; call once per frame"""
+        # Checked before polling so the final positions are never missed
+        finished = not self.layout.running
+        positions = self.layout.poll()
+        if positions is not None:
+            self.positions = {note: (x, y) for note, (x, y) in zip(self.layout_notes, positions)}
+            self.spatial_index.rebuild(self.positions)
+            self.draw_graph()
+        if finished and self.layout_key is not None:
+            self.layout_cache.put(self.layout_key, self.positions)
+            self.layout_key = None
+
+    def calculate_fan_positions(self) -> None:
+        """Place the direct relations of the active note on fixed fans"""
+        self.layout.cancel()
+        self.positions = {}
 
         if not self.active_note:
             return
@@ -98,92 +266,174 @@ class NoteGraph:
         self.positions[self.active_note] = (0, 0)
 
         # Position parents above in a fan layout
-        parent_count = len(self.active_note.parents)
-        for i, parent in enumerate(self.active_note.parents):
+        parents = self.get_related(self.active_note, 'parents')
+        parent_count = len(parents)
+        for i, parent in enumerate(parents):
             angle = math.pi / 2 + (math.pi / (parent_count + 1) * (i + 1) - math.pi / 2)
             x = math.cos(angle) * self.vertical_spacing
             y = -math.sin(angle) * self.vertical_spacing
             self.positions[parent] = (x, y)
 
         # Position children below in a fan layout
-        child_count = len(self.active_note.children)
-        for i, child in enumerate(self.active_note.children):
+        children = self.get_related(self.active_note, 'children')
+        child_count = len(children)
+        for i, child in enumerate(children):
             angle = -math.pi / 2 + (math.pi / (child_count + 1) * (i + 1) - math.pi / 2)
             x = math.cos(angle) * self.vertical_spacing
             y = -math.sin(angle) * self.vertical_spacing
             self.positions[child] = (x, y)
 
         # Position neighbors to the sides
-        neighbor_count = len(self.active_note.neighbors)
-        for i, neighbor in enumerate(self.active_note.neighbors):
+        neighbors = self.get_related(self.active_note, 'neighbors')
+        for i, neighbor in enumerate(neighbors):
             x = self.horizontal_spacing * (1 if i % 2 == 0 else -1) * ((i // 2) + 1)
             self.positions[neighbor] = (x, 0)
 
+    def get_related(self, note: Note, relation: str) -> Collection[Note]:
+        """Related notes of one relation type, read from the store when current"""
+        store = self.store
+        if store is not None and store.is_current() and note in store.index:
+            notes = store.notes
+            return [notes[i] for i in store.related(store.index[note], relation)]
+        return getattr(note, relation)
+
+    def get_view_rect(self) -> Tuple[float, float, float, float]:
+        """Logical bounds (x0, y0, x1, y1) of the window, widened by the size of a node"""
+        margin = (self.node_radius + 60) / self.zoom_level  # room for the label
+        x0, y0 = self.screen_to_logical(0, 0)
+        x1, y1 = self.screen_to_logical(self.window_width, self.window_height)
+        return (x0 - margin, y0 - margin, x1 + margin, y1 + margin)
+
+    def get_visible_notes(self, view: Tuple[float, float, float, float]) -> Set[Note]:
+        """Notes whose node may overlap the window, looked up in the spatial index"""
+        return set(self.spatial_index.query_rect(*view))
+
+    @Profiler.timed('NoteGraph.draw_graph')
     def draw_graph(self) -> None:
-        """Draw the complete graph with connections and nodes"""
-        dpg.delete_item("draw_layer", children_only=True)
-
-        # Draw connections first (so they appear behind nodes)
-        self.draw_connections()
-        # Then draw nodes
-        self.draw_nodes()
-
-    def draw_nodes(self) -> None:
-        """Draw all visible nodes"""
-        center_x = self.window_width / 2
-        center_y = self.window_height / 2
-
-        for note, pos in self.positions.items():
-            screen_x = (pos[0] - self.scroll_x) * self.zoom_level + center_x
-            screen_y = (pos[1] - self.scroll_y) * self.zoom_level + center_y
-
-            # Draw node circle
-            color = self.colors["active_node"] if note == self.active_note else self.colors["node"]
-            dpg.draw_circle([screen_x, screen_y],
-                            self.node_radius * self.zoom_level,
-                            fill=color,
-                            color=self.colors["node_border"],
-                            parent="draw_layer")
-
-            # Draw node title centered on the node
-            dpg.draw_text(
-                [screen_x - 40, screen_y - 7],  # Approximate center offset for text
-                text=note.title[:10],  # Limit title length to prevent overflow
-                color=self.colors["text"],
-                size=14,  # Fixed text size
-                parent="draw_layer"
-            )
-
-    def draw_connections(self) -> None:
-        """Draw all connections between nodes"""
-        center_x = self.window_width / 2
-        center_y = self.window_height / 2
-
-        for note, pos in self.positions.items():
-            start_x = (pos[0] - self.scroll_x) * self.zoom_level + center_x
-            start_y = (pos[1] - self.scroll_y) * self.zoom_level + center_y
-
-            # Draw parent connections
+        """Bring the retained draw items in line with the visible part of the graph"""
+        view = self.get_view_rect()
+        visible = self.get_visible_notes(view)
+        lod = self.zoom_level < self.lod_zoom_threshold
+
+        # Edges only change when positions, relations, the view or detail level did
+        if (lod != self.drawn_lod
+                or self.positions != self.drawn_positions
+                or Note._graph_version != self.drawn_graph_version):
+            self.collect_edges(lod)
+            self.drawn_view = None
+        if view != self.drawn_view:
+            self.draw_connections(view, lod)
+            self.drawn_positions = dict(self.positions)
+            self.drawn_graph_version = Note._graph_version
+            self.drawn_view = view
+            self.drawn_lod = lod
+        self.draw_nodes(visible, lod)
+        self.apply_view_transform()
+        if Profiler.enabled:
+            # A circle and a label per node, a line per edge
+            Profiler.gauge('draw_items', 2 * len(self.node_items) + len(self.edge_items))
+
+    def draw_nodes(self, visible: Set[Note], lod: bool) -> None:
+        """Add, remove or reconfigure only the visible nodes that changed"""
+        for note in [n for n in self.node_items if n not in visible]:
+            for item in self.node_items.pop(note):
+                dpg.delete_item(item)
+            del self.node_state[note]
+
+        for note in visible:
+            pos = self.positions[note]
+            title = note.title[:10]  # Limit title length to prevent overflow
+            is_active = note == self.active_note
+            state = (pos, title, is_active, lod)
+            if self.node_state.get(note) == state:
+                continue
+
+            color = self.colors["active_node"] if is_active else self.colors["node"]
+            items = self.node_items.get(note)
+            if items is None:
+                circle = dpg.draw_circle(list(pos),
+                                         self.node_radius,
+                                         fill=color,
+                                         color=self.colors["node_border"],
+                                         parent="node_layer")
+                label = dpg.draw_text(list(pos),
+                                      text=title,
+                                      color=self.colors["text"],
+                                      size=14,  # Fixed text size
+                                      show=not lod,
+                                      parent="label_layer")
+                self.node_items[note] = (circle, label)
+            else:
+                circle, label = items
+                dpg.configure_item(circle, center=list(pos), fill=color)
+                dpg.configure_item(label, pos=list(pos), text=title, show=not lod)
+            self.node_state[note] = state
+
+    def collect_edges(self, lod: bool) -> None:
+        """Gather the connections between laid-out notes into layout_edges"""
+        positions = self.positions
+        edges = []
+        for note, pos in positions.items():
+            # Every parent link is also a child link of the parent: one side suffices
             for parent in note.parents:
-                if parent in self.positions:
-                    parent_pos = self.positions[parent]
-                    end_x = (parent_pos[0] - self.scroll_x) * self.zoom_level + center_x
-                    end_y = (parent_pos[1] - self.scroll_y) * self.zoom_level + center_y
-                    dpg.draw_line([start_x, start_y], [end_x, end_y],
-                                  color=self.colors["parent_connection"],
-                                  thickness=2,
-                                  parent="draw_layer")
-
-            # Draw neighbor connections
+                end = positions.get(parent)
+                if end is not None:
+                    edges.append(((note, parent, "parent"), pos, end))
+            if lod:
+                continue
             for neighbor in note.neighbors:
-                if neighbor in self.positions:
-                    neighbor_pos = self.positions[neighbor]
-                    end_x = (neighbor_pos[0] - self.scroll_x) * self.zoom_level + center_x
-                    end_y = (neighbor_pos[1] - self.scroll_y) * self.zoom_level + center_y
-                    dpg.draw_line([start_x, start_y], [end_x, end_y],
-                                  color=self.colors["neighbor_connection"],
-                                  thickness=2,
-                                  parent="draw_layer")
+                end = positions.get(neighbor)
+                # Neighbor links are symmetric; draw each pair once
+                if end is not None and id(note) < id(neighbor):
+                    edges.append(((note, neighbor, "neighbor"), pos, end))
+        self.layout_edges = [(key, start, end, min(start[0], end[0]), min(start[1], end[1]),
+                              max(start[0], end[0]), max(start[1], end[1]))
+                             for key, start, end in edges]
+
+    @staticmethod
+    def line_meets_rect(start: Tuple[float, float], end: Tuple[float, float],
+                        rect: Tuple[float, float, float, float]) -> bool:
+        """Whether the infinite line through `start` and `end` meets `rect`"""
+        x0, y0, x1, y1 = rect
+        (ax, ay), (bx, by) = start, end
+        # It misses the rect only when all four corners lie on the same side
+        dx, dy = bx - ax, by - ay
+        sides = [dx * (y - ay) - dy * (x - ax) for x, y in ((x0, y0), (x1, y0), (x0, y1), (x1, y1))]
+        return min(sides) <= 0 <= max(sides)
+
+    def draw_connections(self, view: Tuple[float, float, float, float], lod: bool) -> None:
+        """
+        Add, remove or move only the connections crossing the view rect,
+        which includes every connection of a visible node
+        """
+        thickness = 1 if lod else 2
+        x0, y0, x1, y1 = view
+        meets = self.line_meets_rect
+        wanted: Dict[Tuple[Note, Note, str], tuple] = {}
+        for key, start, end, left, top, right, bottom in self.layout_edges:
+            # Most connections are short: rule them out by their bounds first
+            if right < x0 or left > x1 or bottom < y0 or top > y1:
+                continue
+            if (x0 <= start[0] <= x1 and y0 <= start[1] <= y1) or meets(start, end, view):
+                wanted[key] = (start, end, thickness)
+
+        for key in [k for k in self.edge_items if k not in wanted]:
+            dpg.delete_item(self.edge_items.pop(key))
+            del self.edge_state[key]
+
+        for key, state in wanted.items():
+            if self.edge_state.get(key) == state:
+                continue
+            start, end, thickness = state
+            item = self.edge_items.get(key)
+            if item is None:
+                self.edge_items[key] = dpg.draw_line(list(start), list(end),
+                                                     color=self.colors[f"{key[2]}_connection"],
+                                                     thickness=thickness,
+                                                     parent="edge_layer")
+            else:
+                dpg.configure_item(item, p1=list(start), p2=list(end), thickness=thickness)
+            self.edge_state[key] = state
 
     def screen_to_logical(self, x: float, y: float) -> Tuple[float, float]:
         """Convert screen coordinates to logical coordinates"""
@@ -202,18 +452,10 @@ class NoteGraph:
         mouse_pos = dpg.get_mouse_pos()
         logical_pos = self.screen_to_logical(mouse_pos[0], mouse_pos[1])
 
-        # Find closest note to click position
-        closest_note = None
-        min_distance = float('inf')
-
-        for note, pos in self.positions.items():
-            distance = math.hypot(logical_pos[0] - pos[0], logical_pos[1] - pos[1])
-            if distance < min_distance:
-                min_distance = distance
-                closest_note = note
-
-        # Check if click was close enough to a node
-        if closest_note and min_distance < (self.node_radius / self.zoom_level):
+        # Find the closest note within the drawn radius, node_radius pixels
+        closest_note = self.spatial_index.nearest(logical_pos[0], logical_pos[1],
+                                                  self.node_radius / self.zoom_level)
+        if closest_note:
             self.set_active_note(closest_note)
 
     def on_mouse_scroll(self, sender, app_data) -> None:
@@ -239,14 +481,14 @@ class NoteGraph:
         self.scroll_x -= (center_x) * (zoom_delta / self.zoom_level)
         self.scroll_y -= (center_y) * (zoom_delta / self.zoom_level)
 
-        self.update_graph()
+        self.draw_graph()
 
     def on_zoom_in(self) -> None:
         """Handle zoom in button click"""
         self.zoom_level = min(10.0, self.zoom_level * 1.2)
-        self.update_graph()
+        self.draw_graph()
 
     def on_zoom_out(self) -> None:
         """Handle zoom out button click"""
         self.zoom_level = max(0.1, self.zoom_level / 1.2)
-        self.update_graph()
+        self.draw_graph()
@@ -0,0 +1,100 @@
+import time
+from datetime import datetime
+from typing import Optional
+import dearpygui.dearpygui as dpg
+from models.AutoSave import AutoSave
+from models.Note import Note
+from utils.Profiler import Profiler
+
+
+class PerfOverlay:
+    """
+    Window with frame times, span percentiles, subscriber costs and autosave figures.
+    F3 shows or hides it; a failed autosave opens it.
+    """
+
+    def __init__(self, refresh_interval: float = 0.5):
+        self.refresh_interval = refresh_interval
+        self.visible = False
+        self.keep_enabled = Profiler.enabled
+        self._last_refresh = 0.0
+        # Shown failures of autosave writes, see update()
+        self.autosave: Optional[AutoSave] = None
+        self._failures_shown = 0
+        self.create_gui()
+
+    def create_gui(self) -> None:
+        with dpg.window(label="Performance", tag="perf_overlay", pos=(10, 10),
+                        width=520, height=420, show=False, no_collapse=True,
+                        on_close=lambda: self.set_visible(False)):
+            with dpg.group(horizontal=True):
+                dpg.add_button(label="Export trace", callback=self.on_export)
+                dpg.add_button(label="Reset", callback=self.on_reset)
+            dpg.add_text("", tag="perf_overlay_save")
+            dpg.add_text("", tag="perf_overlay_summary")
+            dpg.add_text("", tag="perf_overlay_spans")
+            dpg.add_text("", tag="perf_overlay_events")
+        with dpg.handler_registry():
+            dpg.add_key_press_handler(dpg.mvKey_F3, callback=lambda: self.set_visible(not self.visible))
+
+    def set_visible(self, visible: bool) -> None:
+        self.visible = visible
+        Profiler.enabled = visible or self.keep_enabled
+        dpg.configure_item("perf_overlay", show=visible)
+        self._last_refresh = 0.0
+
+    def update(self) -> None:
+        """Refresh the shown figures; cheap to call every frame"""
+        autosave = self.autosave
+        if autosave is not None and autosave.failed_writes > self._failures_shown:
+            self._failures_shown = autosave.failed_writes
+            if not self.visible:
+                self.set_visible(True)
+        if not self.visible:
+            return
+        now = time.monotonic()
+        if now - self._last_refresh < self.refresh_interval:
+            return
+        self._last_refresh = now
+
+        if autosave is not None:
+            save = autosave.stats()
+            save_line = (f"autosave {save['saved_changes']} changes in {save['saves']} writes, "
+                         f"queued {save['queue_depth']}, max latency {save['max_latency'] * 1000:.0f} ms")
+            if save['last_error']:
+                save_line += f"\nautosave failed {save['failed_writes']} times, last: {save['last_error']}"
+            dpg.set_value("perf_overlay_save", save_line)
+
+        summary = Profiler.summary()
+        counters = Profiler.counters()
+        frame = summary.get('frame')
+        if frame is not None:
+            fps = 1000 / frame['mean_ms'] if frame['mean_ms'] else 0
+            frame_line = (f"frame {frame['mean_ms']:.1f} ms ({fps:.0f} fps)  "
+                          f"p50 {frame['p50_ms']:.1f}  p99 {frame['p99_ms']:.1f}  max {frame['max_ms']:.1f}")
+        else:
+            frame_line = "frame -"
+        dpg.set_value("perf_overlay_summary",
+                      f"{frame_line}\ndraw items {counters.get('draw_items', 0):.0f}")
+
+        lines = [f"{'span':34} {'calls':>7} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}"]
+        for name, span in sorted(summary.items(), key=lambda item: -item[1]['total_ms']):
+            if name != 'frame':
+                lines.append(f"{name:34} {span['calls']:7} {span['p50_ms']:8.2f} "
+                             f"{span['p99_ms']:8.2f} {span['max_ms']:8.2f}")
+        dpg.set_value("perf_overlay_spans", "\n".join(lines))
+
+        lines = [f"{'subscriber':34} {'events':>7} {'us/event':>8} {'total ms':>8} {'max ms':>8}"]
+        for name, stats in Note.events.stats().items():
+            lines.append(f"{name:34} {stats['events']:7} {stats['us_per_event']:8.1f} "
+                         f"{stats['total_ms']:8.2f} {stats['max_ms']:8.2f}")
+        dpg.set_value("perf_overlay_events", "\n".join(lines))
+
+    def on_reset(self) -> None:
+        Profiler.reset()
+        Note.events.reset_stats()
+
+    def on_export(self) -> None:
+        filename = f"trace-{datetime.now():%Y%m%d-%H%M%S}.json"
+        Profiler.export_trace(filename)
+        print(f"Trace written to {filename}")
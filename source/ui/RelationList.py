@@ -0,0 +1,108 @@
+import weakref
+import dearpygui.dearpygui as dpg
+from typing import Callable, Iterable, List, Tuple
+from models.Note import Note
+
+
+class RelationList:
+    """
+    One relation group of the editor as a virtualized list.
+    A fixed pool of row buttons is rebound to the rows in view, so a hub costs as many widgets as a leaf.
+    """
+
+    ROW_HEIGHT = 20
+    # Dear PyGui's default vertical spacing between items
+    ROW_SPACING = 4
+    VISIBLE_ROWS = 10
+    FILTER_MIN_ROWS = 20
+
+    # note -> (version, label, lowercase label), shared by all lists
+    _labels: 'weakref.WeakKeyDictionary[Note, Tuple[int, str, str]]' = weakref.WeakKeyDictionary()
+
+    def __init__(self, label: str, tag: str, parent, on_click: Callable):
+        self.label = label
+        self.notes: List[Note] = []
+        # The notes matching the filter, in relation order
+        self.shown: List[Note] = []
+        self.needle = ""
+        self.first = 0
+        pitch = self.ROW_HEIGHT + self.ROW_SPACING
+
+        with dpg.group(tag=tag, parent=parent, show=False):
+            self.header = dpg.add_text(label)
+            self.filter = dpg.add_input_text(hint="Filter", width=-1, show=False,
+                                             callback=lambda sender, value: self.set_filter(value))
+            with dpg.child_window(height=pitch, border=False) as self.window:
+                self.top = dpg.add_spacer(height=0, show=False)
+                # One row more than fits, for the one cut in half while scrolling
+                self.rows = [dpg.add_button(width=-1, height=self.ROW_HEIGHT, callback=on_click,
+                                            show=False)
+                             for _ in range(self.VISIBLE_ROWS + 1)]
+                self.bottom = dpg.add_spacer(height=0, show=False)
+
+    @classmethod
+    def label_of(cls, note: Note) -> Tuple[int, str, str]:
+        cached = cls._labels.get(note)
+        if cached is None or cached[0] != note.version:
+            label = f"{note.title} [{', '.join(note.tags)}]"
+            cached = cls._labels[note] = (note.version, label, label.lower())
+        return cached
+
+    def set_notes(self, notes: Iterable[Note]) -> None:
+        """Show a new set of notes, clearing the filter"""
+        self.notes = list(notes)
+        self.needle = ""
+        dpg.set_value(self.filter, "")
+        dpg.configure_item(self.filter, show=len(self.notes) > self.FILTER_MIN_ROWS)
+        dpg.configure_item(dpg.get_item_parent(self.header), show=bool(self.notes))
+        self._show(self.notes)
+
+    def set_filter(self, text: str) -> None:
+        needle = text.strip().lower()
+        # Typing more narrows the current matches instead of every note
+        candidates = self.shown if self.needle and self.needle in needle else self.notes
+        self.needle = needle
+        label_of = self.label_of
+        self._show([note for note in candidates if needle in label_of(note)[2]] if needle
+                   else self.notes)
+
+    def refresh(self) -> None:
+        """Relabel the rows in view, e.g. after a related note was renamed"""
+        if self.needle:
+            needle, self.needle = self.needle, ""
+            self.set_filter(needle)
+        else:
+            self._bind(self.first)
+
+    def update(self) -> None:
+        """Page rows in as the list scrolls; cheap to call every frame"""
+        if len(self.shown) <= self.VISIBLE_ROWS:
+            return
+        pitch = self.ROW_HEIGHT + self.ROW_SPACING
+        first = min(int(dpg.get_y_scroll(self.window) // pitch), len(self.shown) - len(self.rows))
+        if first != self.first:
+            self._bind(max(first, 0))
+
+    def _show(self, notes: List[Note]) -> None:
+        self.shown = notes
+        pitch = self.ROW_HEIGHT + self.ROW_SPACING
+        visible = max(min(len(notes), self.VISIBLE_ROWS), 1)
+        dpg.set_value(self.header, f"{self.label} ({len(notes)} of {len(self.notes)})"
+                      if len(notes) != len(self.notes) else f"{self.label} ({len(notes)})")
+        dpg.configure_item(self.window, height=visible * pitch - self.ROW_SPACING)
+        dpg.set_y_scroll(self.window, 0)
+        self._bind(0)
+
+    def _bind(self, first: int) -> None:
+        self.first = first
+        pitch = self.ROW_HEIGHT + self.ROW_SPACING
+        rows = self.shown[first:first + len(self.rows)]
+        for row, note in zip(self.rows, rows):
+            dpg.configure_item(row, label=self.label_of(note)[1], user_data=note, show=True)
+        for row in self.rows[len(rows):]:
+            dpg.configure_item(row, show=False)
+
+        # Spacer heights that keep the content as tall as all the rows
+        below = len(self.shown) - first - len(rows)
+        dpg.configure_item(self.top, height=max(first * pitch - self.ROW_SPACING, 0), show=first > 0)
+        dpg.configure_item(self.bottom, height=max(below * pitch - self.ROW_SPACING, 0), show=below > 0)
@@ -0,0 +1,139 @@
+import math
+import threading
+import time
+from typing import List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # the graph view falls back to its fixed fan layout
+    np = None
+
+
+class ForceLayout:
+    """
+    Fruchterman-Reingold layout computed with NumPy on a background thread.
+    poll() picks up the latest positions once per frame; a new run cancels the previous one.
+    """
+
+    def __init__(self, edge_length: float = 150.0, iterations: int = 300,
+                 exact_limit: int = 500):
+        self.edge_length = edge_length
+        self.iterations = iterations
+        self.exact_limit = exact_limit
+        self.tolerance = 0.5  # stop once no node moves further than this
+        self._lock = threading.Lock()
+        self._cancel: Optional[threading.Event] = None
+        self._worker: Optional[threading.Thread] = None
+        self._latest: Optional[List[List[float]]] = None
+
+    @staticmethod
+    def available() -> bool:
+        return np is not None
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and self._worker.is_alive()
+
+    def start(self, positions: Sequence[Tuple[float, float]],
+              edges: Sequence[Tuple[int, int]], pinned: int = 0) -> None:
+        """Lay out len(positions) nodes, starting from `positions`, with `pinned` held in place"""
+        self.cancel()
+        cancel = threading.Event()
+        with self._lock:
+            self._cancel = cancel
+            self._latest = None
+        self._worker = threading.Thread(target=self._run,
+                                        args=(list(positions), list(edges), pinned, cancel),
+                                        daemon=True)
+        self._worker.start()
+
+    def cancel(self) -> None:
+        with self._lock:
+            if self._cancel is not None:
+                self._cancel.set()
+            self._latest = None
+
+    def poll(self) -> Optional[List[List[float]]]:
+        """The newest positions published since the last call, if any"""
+        with self._lock:
+            latest = self._latest
+            self._latest = None
+        return latest
+
+    def _run(self, positions, edges, pinned, cancel) -> None:
+        pos = np.array(positions, dtype=np.float64).reshape(-1, 2)
+        count = len(pos)
+        if count < 2:
+            return
+        pinned_pos = pos[pinned].copy()
+        links = np.array(edges, dtype=np.int64).reshape(-1, 2)
+        sources, targets = links[:, 0], links[:, 1]
+
+        temperature = self.edge_length
+        cooling = temperature / self.iterations
+        for _ in range(self.iterations):
+            displacement = self._repulsion(pos)
+
+            # Attraction along links: k^-1 * dist^2 towards each other
+            delta = pos[sources] - pos[targets]
+            distance = np.sqrt((delta ** 2).sum(axis=1)) + 1e-9
+            pull = delta * (distance / self.edge_length)[:, None]
+            for axis in range(2):
+                displacement[:, axis] -= np.bincount(sources, pull[:, axis], count)
+                displacement[:, axis] += np.bincount(targets, pull[:, axis], count)
+
+            length = np.sqrt((displacement ** 2).sum(axis=1)) + 1e-9
+            step = displacement * (np.minimum(length, temperature) / length)[:, None]
+            pos += step
+            pos[pinned] = pinned_pos
+            temperature = max(temperature - cooling, 1.0)
+
+            with self._lock:
+                if cancel.is_set():
+                    return
+                self._latest = pos.tolist()
+            if np.abs(step).max() < self.tolerance:
+                return
+            time.sleep(0)  # let the UI thread render between iterations
+
+    def _repulsion(self, pos):
+        k2 = self.edge_length ** 2
+        if len(pos) <= self.exact_limit:
+            return self._pairwise(pos, k2)
+
+        # Aim for about sqrt(n) cells so both near and far terms cost n^1.5
+        low = pos.min(axis=0)
+        extent = max(float((pos.max(axis=0) - low).max()), 1.0)
+        side = max(1, int(round(len(pos) ** 0.25)))
+        cell_xy = np.minimum((pos - low) * (side / extent), side - 1).astype(np.int64)
+        cells, cell_of, counts = np.unique(cell_xy[:, 0] * side + cell_xy[:, 1],
+                                           return_inverse=True, return_counts=True)
+        cell_of = cell_of.reshape(-1)
+        centroids = np.empty((len(cells), 2))
+        for axis in range(2):
+            centroids[:, axis] = np.bincount(cell_of, pos[:, axis], len(cells)) / counts
+
+        # Far field: every other cell pushes as one body of `count` nodes
+        dx = np.subtract.outer(pos[:, 0], centroids[:, 0])
+        dy = np.subtract.outer(pos[:, 1], centroids[:, 1])
+        push = (k2 * counts)[None, :] / (dx * dx + dy * dy + 1e-9)
+        push[np.arange(len(pos)), cell_of] = 0.0
+        displacement = np.stack(((dx * push).sum(axis=1), (dy * push).sum(axis=1)), axis=1)
+
+        # Near field: exact forces inside each cell
+        order = np.argsort(cell_of, kind='stable')
+        bounds = np.concatenate(([0], np.cumsum(counts)))
+        for c in range(len(cells)):
+            if counts[c] > 1:
+                members = order[bounds[c]:bounds[c + 1]]
+                displacement[members] += self._pairwise(pos[members], k2)
+        return displacement
+
+    @staticmethod
+    def _pairwise(pos, k2):
+        dx = np.subtract.outer(pos[:, 0], pos[:, 0])
+        dy = np.subtract.outer(pos[:, 1], pos[:, 1])
+        distance2 = dx * dx + dy * dy
+        np.fill_diagonal(distance2, math.inf)
+        push = k2 / (distance2 + 1e-9)
+        return np.stack(((dx * push).sum(axis=1), (dy * push).sum(axis=1)), axis=1)
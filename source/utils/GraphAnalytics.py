@@ -0,0 +1,187 @@
+from typing import Any, Dict, List, Optional, Tuple
+from models.Note import Note
+from models.GraphStore import GraphStore
+
+try:
+    import numpy as np
+except ImportError:  # NoteStats reports no analytics without NumPy
+    np = None
+
+
+class GraphAnalytics:
+    """
+    Whole-vault graph measures computed with NumPy over a GraphStore.
+    Results are arrays indexed like store.notes; relations with weight 0 are left out.
+    """
+
+    DEFAULT_WEIGHTS = {'parents': 1.0, 'children': 1.0, 'neighbors': 0.5}
+
+    def __init__(self, store: GraphStore, weights: Optional[Dict[str, float]] = None):
+        if np is None:
+            raise ImportError("GraphAnalytics needs NumPy")
+        self.store = store
+        self.weights = {**self.DEFAULT_WEIGHTS, **(weights or {})}
+        self.count = len(store)
+
+        sources, targets, edge_weights = [], [], []
+        for relation in GraphStore.RELATIONS:
+            weight = self.weights[relation]
+            if weight <= 0:
+                continue
+            offsets = np.frombuffer(store.offsets[relation], dtype=np.intc)
+            related = np.frombuffer(store.targets[relation], dtype=np.intc)
+            sources.append(np.repeat(np.arange(self.count), np.diff(offsets)))
+            targets.append(related.astype(np.int64))
+            edge_weights.append(np.full(len(related), weight))
+        self.sources = np.concatenate(sources) if sources else np.zeros(0, np.int64)
+        self.targets = np.concatenate(targets) if targets else np.zeros(0, np.int64)
+        self.edge_weights = np.concatenate(edge_weights) if edge_weights else np.zeros(0)
+
+        self._components = None
+
+    @staticmethod
+    def available() -> bool:
+        return np is not None
+
+    def pagerank(self, damping: float = 0.85, tolerance: float = 1e-6,
+                 max_iterations: int = 100):
+        """Weighted PageRank; rank flows along each relation from a note to the related note"""
+        n = self.count
+        if n == 0:
+            return np.zeros(0)
+        out_weight = np.bincount(self.sources, self.edge_weights, n)
+        dangling = out_weight == 0
+        # Share of a note's rank passed along each of its edges
+        edge_share = self.edge_weights / np.where(dangling, 1.0, out_weight)[self.sources]
+
+        rank = np.full(n, 1.0 / n)
+        for _ in range(max_iterations):
+            flow = np.bincount(self.targets, edge_share * rank[self.sources], n)
+            new_rank = (1 - damping) / n + damping * (flow + rank[dangling].sum() / n)
+            change = np.abs(new_rank - rank).sum()
+            rank = new_rank
+            if change < tolerance:
+                break
+        return rank
+
+    def components(self):
+        """
+        Weakly connected component id of every note. Ids are numbered by
+        component size, so the largest component is 0.
+        """
+        if self._components is not None:
+            return self._components
+        n = self.count
+        labels = np.arange(n)
+        u, v = self.sources, self.targets
+        while True:
+            # Hook every root onto the smallest root it is linked to...
+            lu, lv = labels[u], labels[v]
+            low = np.minimum(lu, lv)
+            hooked = labels.copy()
+            np.minimum.at(hooked, lu, low)
+            np.minimum.at(hooked, lv, low)
+            # ...then jump pointers until every note points at its root
+            while True:
+                jumped = hooked[hooked]
+                if np.array_equal(jumped, hooked):
+                    break
+                hooked = jumped
+            if np.array_equal(hooked, labels):
+                break
+            labels = hooked
+
+        roots, inverse, sizes = np.unique(labels, return_inverse=True, return_counts=True)
+        order = np.argsort(-sizes, kind='stable')
+        rank = np.empty(len(roots), dtype=np.int64)
+        rank[order] = np.arange(len(roots))
+        self._components = rank[inverse.reshape(-1)]
+        return self._components
+
+    def orphan_clusters(self, min_size: int = 2) -> List[List[Note]]:
+        """
+        Groups of linked notes that are cut off from the largest component,
+        largest first. Single unlinked notes are left to isolated_notes.
+        """
+        components = self.components()
+        if len(components) == 0:
+            return []
+        sizes = np.bincount(components)
+        order = np.argsort(components, kind='stable')
+        bounds = np.concatenate(([0], np.cumsum(sizes)))
+        notes = self.store.notes
+        return [[notes[i] for i in order[bounds[c]:bounds[c + 1]]]
+                for c in range(1, len(sizes)) if sizes[c] >= min_size]
+
+    def betweenness(self, samples: int = 32, seed: int = 0):
+        """Betweenness estimated from `samples` random sources over undirected links, scaled to the vault"""
+        n = self.count
+        scores = np.zeros(n)
+        if n == 0:
+            return scores
+
+        # Undirected adjacency in CSR form; parents and children mirror each
+        # other, so both directions of every hierarchy link are present already
+        order = np.argsort(self.sources, kind='stable')
+        neighbors = self.targets[order]
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(self.sources, minlength=n))))
+
+        rng = np.random.default_rng(seed)
+        pivots = rng.choice(n, size=min(samples, n), replace=False)
+        for source in pivots:
+            distance = np.full(n, -1)
+            paths = np.zeros(n)
+            distance[source] = 0
+            paths[source] = 1.0
+            frontier = np.array([source])
+            levels: List[Tuple[Any, Any]] = []
+            depth = 0
+            while len(frontier):
+                starts = offsets[frontier]
+                counts = offsets[frontier + 1] - starts
+                total = counts.sum()
+                if total == 0:
+                    break
+                # Positions of every edge leaving the frontier
+                first = np.repeat(starts - np.cumsum(counts) + counts, counts)
+                edge = first + np.arange(total)
+                tails = np.repeat(frontier, counts)
+                heads = neighbors[edge]
+
+                depth += 1
+                fresh = heads[distance[heads] == -1]
+                distance[fresh] = depth
+                on_path = distance[heads] == depth
+                tails, heads = tails[on_path], heads[on_path]
+                paths += np.bincount(heads, paths[tails], n)
+                levels.append((tails, heads))
+                frontier = np.unique(fresh)
+
+            dependency = np.zeros(n)
+            for tails, heads in reversed(levels):
+                dependency += np.bincount(
+                    tails, paths[tails] / paths[heads] * (1 + dependency[heads]), n)
+            dependency[source] = 0
+            scores += dependency
+
+        # Each undirected path was counted from both ends
+        return scores * (n / len(pivots)) / 2
+
+    def top(self, scores, count: int = 5) -> List[Tuple[Note, float]]:
+        """The `count` notes with the highest scores, highest first"""
+        count = min(count, len(scores))
+        if count == 0:
+            return []
+        best = np.argpartition(-scores, count - 1)[:count]
+        best = best[np.argsort(-scores[best], kind='stable')]
+        return [(self.store.notes[i], float(scores[i])) for i in best]
+
+    def summary(self, top: int = 5, samples: int = 32) -> Dict[str, Any]:
+        components = self.components()
+        return {
+            'pagerank': self.top(self.pagerank(), top),
+            'betweenness': self.top(self.betweenness(samples), top),
+            'component_count': int(components.max()) + 1 if len(components) else 0,
+            'largest_component': int(np.count_nonzero(components == 0)),
+            'orphan_clusters': self.orphan_clusters(),
+        }
@@ -0,0 +1,387 @@
+import random
+from array import array
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+from models.Note import Note
+from models.NoteEvents import Subscription
+
+RELATIONS = ('parents', 'children', 'neighbors')
+# The relation leading back along each relation
+REVERSE = {'parents': 'children', 'children': 'parents', 'neighbors': 'neighbors'}
+
+
+def _related(note: Note, relations: Sequence[str]) -> List[Note]:
+    # A copy, so callers may change relations between steps of a generator
+    if len(relations) == 1:
+        return list(getattr(note, relations[0]))
+    return [other for relation in relations for other in getattr(note, relation)]
+
+
+class GraphTraversal:
+    """
+    Iterative walks over the note graph along any of the relation types.
+    Each note is reached once, and the graph may change between steps of a walk.
+    """
+
+    @staticmethod
+    def bfs(start: Note, relations: Sequence[str] = RELATIONS,
+            max_depth: Optional[int] = None) -> Iterator[Tuple[Note, int]]:
+        """(note, depth) pairs in breadth-first order, `start` first at depth 0"""
+        seen = {start}
+        frontier = [start]
+        depth = 0
+        yield start, 0
+        while frontier and (max_depth is None or depth < max_depth):
+            depth += 1
+            next_frontier = []
+            for note in frontier:
+                for other in _related(note, relations):
+                    if other not in seen:
+                        seen.add(other)
+                        next_frontier.append(other)
+                        yield other, depth
+            frontier = next_frontier
+
+    @staticmethod
+    def dfs(start: Note, relations: Sequence[str] = RELATIONS,
+            max_depth: Optional[int] = None) -> Iterator[Tuple[Note, int]]:
+        """(note, depth) pairs in depth-first preorder, `start` first at depth 0"""
+        seen = {start}
+        yield start, 0
+        stack = [(0, iter(_related(start, relations)))]
+        while stack:
+            depth, pending = stack[-1]
+            for other in pending:
+                if other not in seen:
+                    seen.add(other)
+                    yield other, depth + 1
+                    if max_depth is None or depth + 1 < max_depth:
+                        stack.append((depth + 1, iter(_related(other, relations))))
+                    break
+            else:
+                stack.pop()
+
+    @staticmethod
+    def ancestors(note: Note) -> Iterator[Note]:
+        """Every note above `note` in the hierarchy, nearest first"""
+        walk = GraphTraversal.bfs(note, ('parents',))
+        next(walk)
+        return (ancestor for ancestor, _ in walk)
+
+    @staticmethod
+    def descendants(note: Note) -> Iterator[Note]:
+        """Every note below `note` in the hierarchy, nearest first"""
+        walk = GraphTraversal.bfs(note, ('children',))
+        next(walk)
+        return (descendant for descendant, _ in walk)
+
+    @staticmethod
+    def shortest_path(source: Note, target: Note,
+                      relations: Sequence[str] = RELATIONS) -> Optional[List[Note]]:
+        """
+        Notes on a shortest path from `source` to `target`, both included, or None.
+        Bidirectional BFS that always grows the smaller frontier.
+        """
+        if source is target:
+            return [source]
+        reverse = [REVERSE[relation] for relation in relations]
+        # Each side maps the notes it reached to (previous note, distance)
+        forward: Dict[Note, Tuple[Optional[Note], int]] = {source: (None, 0)}
+        backward: Dict[Note, Tuple[Optional[Note], int]] = {target: (None, 0)}
+        forward_frontier = [source]
+        backward_frontier = [target]
+
+        while forward_frontier and backward_frontier:
+            if len(forward_frontier) <= len(backward_frontier):
+                frontier, reached, other_side, followed = forward_frontier, forward, backward, relations
+            else:
+                frontier, reached, other_side, followed = backward_frontier, backward, forward, reverse
+
+            # Finish the level: the first meeting point is not always on a
+            # shortest path, the best one of the level is
+            meeting: Optional[Note] = None
+            best = None
+            next_frontier = []
+            for note in frontier:
+                distance = reached[note][1] + 1
+                for other in _related(note, followed):
+                    if other in reached:
+                        continue
+                    reached[other] = (note, distance)
+                    next_frontier.append(other)
+                    if other in other_side:
+                        length = distance + other_side[other][1]
+                        if best is None or length < best:
+                            meeting, best = other, length
+            if meeting is not None:
+                path = []
+                note: Optional[Note] = meeting
+                while note is not None:
+                    path.append(note)
+                    note = forward[note][0]
+                path.reverse()
+                note = backward[meeting][0]
+                while note is not None:
+                    path.append(note)
+                    note = backward[note][0]
+                return path
+
+            if frontier is forward_frontier:
+                forward_frontier = next_frontier
+            else:
+                backward_frontier = next_frontier
+        return None
+
+
+class ReachabilityIndex:
+    """
+    Whether a note is below another in the hierarchy, pruned by GRAIL interval labels.
+    New links widen the labels; removals and suspended changes rebuild them when needed.
+    """
+
+    LABELS = 2
+    # Removed links, as a share of the notes, before the labels are rebuilt
+    REBUILD_RATIO = 0.25
+
+    def __init__(self, seed: int = 0):
+        self.subscription: Optional[Subscription] = None
+        self.seed = seed
+        self._index: Dict[Note, int] = {}
+        self._lows: List[array] = []
+        self._highs: List[array] = []
+        self._next_rank = 0
+        self._removals = 0
+        self._version = -1
+        self.rebuilds = 0
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def start(self) -> None:
+        """Follow Note.events; immediate, since _step checks the graph version on every change"""
+        self._ensure()
+        self.subscription = Note.events.subscribe_hooks(self, immediate=True)
+
+    def stop(self) -> None:
+        Note.events.unsubscribe(self.subscription)
+        self.subscription = None
+
+    def reaches(self, ancestor: Note, descendant: Note) -> bool:
+        """Whether `descendant` can be reached from `ancestor` along children"""
+        if ancestor is descendant:
+            return True
+        self._ensure()
+        index = self._index
+        i = index.get(ancestor)
+        j = index.get(descendant)
+        if i is None or j is None:
+            return any(note is descendant for note in GraphTraversal.descendants(ancestor))
+        if not self._contains(i, j):
+            return False
+
+        seen = {ancestor}
+        stack = [ancestor]
+        while stack:
+            for child in stack.pop().children:
+                if child is descendant:
+                    return True
+                if child in seen:
+                    continue
+                seen.add(child)
+                k = index.get(child)
+                if k is None or self._contains(k, j):
+                    stack.append(child)
+        return False
+
+    def is_ancestor(self, ancestor: Note, note: Note) -> bool:
+        return ancestor is not note and self.reaches(ancestor, note)
+
+    def would_create_cycle(self, parent: Note, child: Note) -> bool:
+        """Whether linking `child` below `parent` closes a parent/child cycle"""
+        return self.reaches(child, parent)
+
+    def _contains(self, i: int, j: int) -> bool:
+        for low, high in zip(self._lows, self._highs):
+            if low[j] < low[i] or high[j] > high[i]:
+                return False
+        return True
+
+    def _ensure(self) -> None:
+        if (self._version != Note._graph_version
+                or self._removals > max(64, len(self._index) * self.REBUILD_RATIO)):
+            self.rebuild()
+
+    def rebuild(self) -> None:
+        notes = Note.get_all_notes()
+        index = {note: i for i, note in enumerate(notes)}
+        components, count, children = self._components(notes, index)
+
+        # The condensed hierarchy: one node per cycle, no edges inside it
+        component_children: List[Set[int]] = [set() for _ in range(count)]
+        has_parent = bytearray(count)
+        for i, kids in enumerate(children):
+            c = components[i]
+            for k in kids:
+                d = components[k]
+                if d != c and d not in component_children[c]:
+                    component_children[c].add(d)
+                    has_parent[d] = 1
+        component_children_lists = [list(kids) for kids in component_children]
+        roots = [c for c in range(count) if not has_parent[c]]
+
+        rng = random.Random(self.seed)
+        self._lows, self._highs = [], []
+        for _ in range(self.LABELS):
+            low, high = self._label(component_children_lists, roots, rng)
+            self._lows.append(array('q', (low[c] for c in components)))
+            self._highs.append(array('q', (high[c] for c in components)))
+        self._index = index
+        self._next_rank = count
+        self._removals = 0
+        self._version = Note._graph_version
+        self.rebuilds += 1
+
+    @staticmethod
+    def _components(notes: List[Note], index: Dict[Note, int]) -> Tuple[List[int], int, List[List[int]]]:
+        """Strongly connected components along children (Tarjan, iterative)"""
+        n = len(notes)
+        children = [[index[child] for child in note.children if child in index] for note in notes]
+        order = [-1] * n
+        lowlink = [0] * n
+        on_stack = bytearray(n)
+        stack: List[int] = []
+        components = [-1] * n
+        count = 0
+        counter = 0
+        for start in range(n):
+            if order[start] != -1:
+                continue
+            order[start] = lowlink[start] = counter
+            counter += 1
+            stack.append(start)
+            on_stack[start] = 1
+            work = [(start, 0)]
+            while work:
+                v, position = work[-1]
+                kids = children[v]
+                if position < len(kids):
+                    work[-1] = (v, position + 1)
+                    w = kids[position]
+                    if order[w] == -1:
+                        order[w] = lowlink[w] = counter
+                        counter += 1
+                        stack.append(w)
+                        on_stack[w] = 1
+                        work.append((w, 0))
+                    elif on_stack[w] and order[w] < lowlink[v]:
+                        lowlink[v] = order[w]
+                    continue
+                work.pop()
+                if work and lowlink[v] < lowlink[work[-1][0]]:
+                    lowlink[work[-1][0]] = lowlink[v]
+                if lowlink[v] == order[v]:
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = 0
+                        components[w] = count
+                        if w == v:
+                            break
+                    count += 1
+        return components, count, children
+
+    @staticmethod
+    def _label(children: List[List[int]], roots: List[int],
+               rng: random.Random) -> Tuple[List[int], List[int]]:
+        """[lowest rank below, own post-order rank] of every node of a DAG"""
+        count = len(children)
+        low = [0] * count
+        high = [0] * count
+        visited = bytearray(count)
+        rank = 0
+        for root in rng.sample(roots, len(roots)):
+            visited[root] = 1
+            stack = [(root, iter(rng.sample(children[root], len(children[root]))))]
+            while stack:
+                node, pending = stack[-1]
+                for child in pending:
+                    if not visited[child]:
+                        visited[child] = 1
+                        stack.append((child, iter(rng.sample(children[child], len(children[child])))))
+                        break
+                else:
+                    stack.pop()
+                    lowest = rank
+                    for child in children[node]:
+                        if low[child] < lowest:
+                            lowest = low[child]
+                    low[node] = lowest
+                    high[node] = rank
+                    rank += 1
+        return low, high
+
+    def _widen(self, parent: Note, child: Note) -> None:
+        """Make the intervals of `parent` and its ancestors contain those of `child`"""
+        index = self._index
+        j = index[child]
+        stack = [parent]
+        while stack:
+            note = stack.pop()
+            i = index.get(note)
+            if i is None:
+                continue
+            changed = False
+            for low, high in zip(self._lows, self._highs):
+                if low[j] < low[i]:
+                    low[i] = low[j]
+                    changed = True
+                if high[j] > high[i]:
+                    high[i] = high[j]
+                    changed = True
+            if changed:
+                stack.extend(note.parents)
+
+    def _add_note(self, note: Note) -> None:
+        if note in self._index:
+            return
+        # A new rank above every other: nothing reaches the note yet
+        self._index[note] = len(self._lows[0]) if self._lows else 0
+        for low, high in zip(self._lows, self._highs):
+            low.append(self._next_rank)
+            high.append(self._next_rank)
+        self._next_rank += 1
+
+    def _step(self) -> None:
+        # Each event follows at most one version bump; anything more was
+        # changed while events were suspended and leaves the index to be rebuilt
+        if Note._graph_version - self._version <= 1:
+            self._version = Note._graph_version
+
+    # Note.events hooks
+
+    def note_created(self, note: Note) -> None:
+        if self._lows:
+            self._add_note(note)
+        self._step()
+
+    def note_updated(self, note: Note, fields: Dict[str, Any]) -> None:
+        self._step()
+
+    def relation_added(self, note: Note, relation: str, other: Note) -> None:
+        if relation != 'neighbor' and self._lows:
+            for end in (note, other):
+                self._add_note(end)
+            if relation == 'parent':
+                self._widen(other, note)
+            else:
+                self._widen(note, other)
+        self._step()
+
+    def relation_removed(self, note: Note, relation: str, other: Note) -> None:
+        if relation != 'neighbor':
+            self._removals += 1
+        self._step()
+
+    def tag_changed(self, note: Note, tag: str, added: bool) -> None:
+        self._step()
+
+    def note_deleted(self, note: Note) -> None:
+        self._step()
@@ -0,0 +1,60 @@
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+from models.Note import Note
+
+
+class LayoutCache:
+    """
+    LRU cache of graph layouts, bounded by the total number of stored positions.
+    Keys include the neighborhood version, so a stale layout is never found.
+    """
+
+    # Rough cost of one stored position: dict slot plus a tuple of two floats
+    BYTES_PER_POSITION = 150
+
+    def __init__(self, max_positions: int = 100_000):
+        self.max_positions = max_positions
+        self._entries: 'OrderedDict[Hashable, Dict[Note, Tuple[float, float]]]' = OrderedDict()
+        self._positions = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Dict[Note, Tuple[float, float]]]:
+        positions = self._entries.get(key)
+        if positions is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return positions
+
+    def put(self, key: Hashable, positions: Dict[Note, Tuple[float, float]]) -> None:
+        """Store a copy of `positions`; callers must not mutate what get() returns"""
+        if len(positions) > self.max_positions:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._positions -= len(old)
+        self._entries[key] = dict(positions)
+        self._positions += len(positions)
+        while self._positions > self.max_positions:
+            _, evicted = self._entries.popitem(last=False)
+            self._positions -= len(evicted)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._positions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'positions': self._positions,
+            'approx_bytes': self._positions * self.BYTES_PER_POSITION,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
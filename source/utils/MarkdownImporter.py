@@ -0,0 +1,234 @@
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from models.Note import Note
+from models.NoteEvents import NotesLoaded
+
+# (relative path without extension, id, title, text, tags, created_at,
+#  modified_at, parent links, child links, neighbor links)
+ParsedNote = Tuple[str, Optional[str], str, str, List[str], Optional[str], Optional[str],
+                   List[str], List[str], List[str]]
+
+
+class MarkdownImporter:
+    """
+    Bulk import of a directory of Markdown files into the vault.
+    Files are parsed in a process pool and linked in one pass; ids already in the vault are skipped.
+    """
+
+    FRONT_MATTER = re.compile(r'\A---[ \t]*\r?\n(.*?)\r?\n---[ \t]*(?:\r?\n|\Z)', re.S)
+    # [[target]], [[target|alias]], [[target#heading]]
+    WIKILINK = re.compile(r'\[\[([^\]|#^]+)[^\]]*\]\]')
+    # The neighbor line written by `cli.py export --format markdown`
+    RELATED_LINE = re.compile(r'\n*Related: (?:\[\[[^\]]+\]\](?:, )?)+\s*\Z')
+    # Front matter keys holding links: parents, children, neighbors
+    LINK_KEYS = {'parents': 0, 'parent': 0, 'up': 0, 'children': 1, 'child': 1,
+                 'neighbors': 2, 'related': 2}
+
+    def __init__(self, workers: Optional[int] = None, chunk_size: int = 64):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+
+    def import_directory(self, directory: str, state=None) -> Dict[str, Any]:
+        """
+        Import every .md file below `directory`, save the vault through
+        `state` (a NoteState or SqliteNoteState) if given, and return counts
+        and timings.
+        """
+        started = time.perf_counter()
+        paths = list(self._walk(directory))
+        parsed = self._parse_all(directory, paths)
+        parsed_at = time.perf_counter()
+
+        with Note.events.suspended():
+            notes, created = self._create_notes(parsed)
+            links, unresolved, touched = self._link(notes, created, parsed)
+        Note.events.publish(NotesLoaded(touched))
+        linked_at = time.perf_counter()
+
+        if state is not None:
+            state.save_notes(Note.get_all_notes())
+        finished = time.perf_counter()
+
+        total = finished - started
+        return {
+            'files': len(paths),
+            'notes': len(created),
+            'skipped': len(paths) - len(created),
+            'links': links,
+            'unresolved_links': unresolved,
+            'parse_seconds': parsed_at - started,
+            'link_seconds': linked_at - parsed_at,
+            'save_seconds': finished - linked_at,
+            'files_per_second': len(paths) / total if total else 0.0,
+        }
+
+    @staticmethod
+    def _walk(directory: str) -> Iterator[str]:
+        for root, folders, files in os.walk(directory):
+            # Hidden folders hold editor settings and trash, not notes
+            folders[:] = sorted(folder for folder in folders if not folder.startswith('.'))
+            for name in sorted(files):
+                if name.lower().endswith('.md'):
+                    yield os.path.join(root, name)
+
+    def _parse_all(self, directory: str, paths: List[str]) -> List[ParsedNote]:
+        if self.workers <= 1 or len(paths) < 4 * self.chunk_size:
+            return [self.parse_file(path, directory) for path in paths]
+        with ProcessPoolExecutor(self.workers) as pool:
+            return list(pool.map(self.parse_file, paths, [directory] * len(paths),
+                                 chunksize=self.chunk_size))
+
+    @classmethod
+    def parse_file(cls, path: str, directory: str) -> ParsedNote:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            content = f.read()
+        relative = os.path.splitext(os.path.relpath(path, directory))[0].replace(os.sep, '/')
+
+        fields: Dict[str, Any] = {}
+        match = cls.FRONT_MATTER.match(content)
+        if match:
+            fields = cls.parse_front_matter(match.group(1))
+            content = content[match.end():]
+
+        links: List[List[str]] = [[], [], []]
+        for key, slot in cls.LINK_KEYS.items():
+            values = fields.get(key) or []
+            for value in values if isinstance(values, list) else [values]:
+                links[slot].extend(cls.WIKILINK.findall(value) or [value])
+        links[2].extend(cls.WIKILINK.findall(content))
+        text = cls.RELATED_LINE.sub('', content).rstrip('\n')
+
+        tags = [tag.lstrip('#') for tag in cls._as_list(fields.get('tags', fields.get('tag')))]
+        # An empty title in front matter stays empty, as `cli.py export` writes it
+        title = fields['title'] if fields.get('title') is not None else os.path.basename(relative)
+        return (relative, fields.get('id') or None, str(title), text, [t for t in tags if t],
+                fields.get('created_at'), fields.get('modified_at'), *links)
+
+    @classmethod
+    def parse_front_matter(cls, block: str) -> Dict[str, Any]:
+        """
+        The subset of YAML used in note front matter: `key: value`, inline
+        lists (`[a, "b"]`) and block lists (`- item` lines)
+        """
+        fields: Dict[str, Any] = {}
+        key = None
+        for line in block.splitlines():
+            stripped = line.strip()
+            if not stripped or stripped.startswith('#'):
+                continue
+            if stripped.startswith('- ') and key is not None:
+                if not isinstance(fields[key], list):
+                    fields[key] = []
+                fields[key].append(cls._scalar(stripped[2:]))
+                continue
+            name, colon, value = line.partition(':')
+            if not colon:
+                continue
+            key = name.strip().lower()
+            value = value.strip()
+            if value.startswith('[') and value.endswith(']') and not value.startswith('[['):
+                try:
+                    fields[key] = [str(item) for item in json.loads(value)]
+                except ValueError:
+                    fields[key] = [cls._scalar(item) for item in value[1:-1].split(',') if item.strip()]
+            else:
+                fields[key] = cls._scalar(value) if value else []
+        return fields
+
+    @staticmethod
+    def _scalar(value: str) -> str:
+        value = value.strip()
+        if len(value) >= 2 and value[0] == value[-1] == '"':
+            try:
+                return str(json.loads(value))
+            except ValueError:
+                return value[1:-1]
+        if len(value) >= 2 and value[0] == value[-1] == "'":
+            return value[1:-1].replace("''", "'")
+        return value
+
+    @staticmethod
+    def _as_list(value: Any) -> List[str]:
+        if value is None:
+            return []
+        if isinstance(value, list):
+            return value
+        # `tags: a, b` or `tags: a b`
+        return [item for item in re.split(r'[,\s]+', value) if item]
+
+    @staticmethod
+    def _create_notes(parsed: List[ParsedNote]) -> Tuple[Dict[str, Note], List[Note]]:
+        """Notes by relative path; ids already in the vault are skipped"""
+        notes: Dict[str, Note] = {}
+        created = []
+        times: Tuple[List[Optional[str]], List[Optional[str]]] = ([], [])
+        # Files without dates get the time of the import
+        now = datetime.now().isoformat()
+        for relative, note_id, title, text, tags, created_at, modified_at, *_ in parsed:
+            if note_id is not None and Note.get_note(note_id) is not None:
+                continue
+            note = Note(title, text, note_id)
+            note.tags = [sys.intern(tag) for tag in dict.fromkeys(tags)]
+            notes[relative] = note
+            created.append(note)
+            times[0].append(created_at or now)
+            times[1].append(modified_at or created_at or now)
+        Note.set_iso_times(created, *times)
+        return notes, created
+
+    @staticmethod
+    def _link(notes: Dict[str, Note], created: List[Note],
+              parsed: List[ParsedNote]) -> Tuple[Dict[str, int], int, List[Note]]:
+        """
+        Resolve every link and add the relations in one pass. Also returns
+        the created notes followed by the existing ones that got relations.
+        """
+        targets: Dict[str, Note] = {}
+        # Titles first so that file names and paths win on conflicts
+        for note in Note.get_all_notes():
+            targets.setdefault(note.title.lower(), note)
+        for relative, note in notes.items():
+            targets[os.path.basename(relative).lower()] = note
+        for relative, note in notes.items():
+            targets[relative.lower()] = note
+
+        counts = {'parent': 0, 'child': 0, 'neighbor': 0}
+        unresolved = 0
+        touched = dict.fromkeys(created)
+        for relative, *_, parent_links, child_links, neighbor_links in parsed:
+            note = notes.get(relative)
+            if note is None:
+                continue
+            for kind, names in (('parent', parent_links), ('child', child_links),
+                                ('neighbor', neighbor_links)):
+                for name in names:
+                    other = targets.get(name.strip().lower().removesuffix('.md'))
+                    if other is None or other is note:
+                        unresolved += other is None
+                        continue
+                    if kind == 'parent':
+                        added = other not in note.parents
+                        note.parents[other] = None
+                        other.children[note] = None
+                    elif kind == 'child':
+                        added = other not in note.children
+                        note.children[other] = None
+                        other.parents[note] = None
+                    else:
+                        added = other not in note.neighbors
+                        note.neighbors[other] = None
+                        other.neighbors[note] = None
+                    counts[kind] += added
+                    touched[other] = None
+
+        # One version bump for the whole import, as a load does
+        Note._graph_version += 1
+        for note in touched:
+            note.relations_version = Note._graph_version
+        return counts, unresolved, list(touched)
@@ -1,18 +1,198 @@
+import json
+from bisect import bisect_left
+from collections import deque
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import Any, Deque, Dict, List, Optional, Tuple, Union
+from models.Note import Note
+from models.NoteEvents import Subscription
+
+# timestamp, note id, note title at the time, change type, details
+Entry = Tuple[str, str, str, str, str]
 
 
 class NoteHistory:
-    def __init__(self):
-        self.history: List[Dict[str, Any]] = []
-
-    def add_change(self, note_title: str, change_type: str, details: str) -> None:
-        self.history.append({
-            'timestamp': datetime.now().isoformat(),
-            'note_title': note_title,
-            'change_type': change_type,
-            'details': details
-        })
-
-    def get_note_history(self, note_title: str) -> List[Dict[str, Any]]:
-        return [h for h in self.history if h['note_title'] == note_title]
\ No newline at end of file
+    """
+    Change history of notes by note id, so renames don't split it.
+    The newest `retention` entries stay in memory; older ones go to an append-only log.
+    """
+
+    FIELDS = ('timestamp', 'note_id', 'note_title', 'change_type', 'details')
+    # The same link as seen from the other note
+    REVERSE_RELATIONS = {'parent': 'child', 'child': 'parent', 'neighbor': 'neighbor'}
+
+    def __init__(self, filename: Optional[str] = "notes.history", retention: int = 10000):
+        self.filename = filename
+        self.retention = retention
+        # Evict a tenth of the buffer at a time to keep log writes batched
+        self.spill_batch = max(1, retention // 10)
+        self.subscription: Optional[Subscription] = None
+        self._entries: Deque[Entry] = deque()
+        self._by_note: Dict[str, Deque[Entry]] = {}
+        # Offsets of each note's log lines, built by the first query for a note
+        self._log_offsets: Optional[Dict[str, List[int]]] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def start(self) -> None:
+        """Follow Note.events; immediate, since it records the time and title as of the change"""
+        self.subscription = Note.events.subscribe_hooks(self, immediate=True)
+
+    def stop(self) -> None:
+        Note.events.unsubscribe(self.subscription)
+        self.subscription = None
+
+    def close(self) -> None:
+        """Move everything still in memory to the log"""
+        self.stop()
+        self._spill(len(self._entries))
+
+    def add_change(self, note: Note, change_type: str, details: str) -> None:
+        entry = (datetime.now().isoformat(), note.id, note.title, change_type, details)
+        if len(self._entries) >= self.retention:
+            self._spill(self.spill_batch)
+        self._entries.append(entry)
+        self._by_note.setdefault(note.id, deque()).append(entry)
+
+    def get_note_history(self, note: Union[Note, str]) -> List[Dict[str, Any]]:
+        """
+        In-memory changes of one note, oldest first. A title string, as
+        before notes had ids, matches the title each change was made under.
+        """
+        if isinstance(note, str):
+            return [self._as_dict(entry) for entry in self._entries if entry[2] == note]
+        return [self._as_dict(entry) for entry in self._by_note.get(note.id, ())]
+
+    def query(self, since: Optional[str] = None, until: Optional[str] = None,
+              note: Optional[Note] = None) -> List[Dict[str, Any]]:
+        """
+        Changes with since <= timestamp < until (ISO strings, either bound
+        optional), from the log and from memory, oldest first.
+        """
+        source = self._entries if note is None else self._by_note.get(note.id, ())
+        results = self._query_log(since, until, note.id if note is not None else None)
+        results.extend(self._as_dict(entry) for entry in source
+                       if (since is None or entry[0] >= since)
+                       and (until is None or entry[0] < until))
+        return results
+
+    def _spill(self, count: int) -> None:
+        lines = []
+        for _ in range(min(count, len(self._entries))):
+            entry = self._entries.popleft()
+            # The oldest entry overall is also the oldest of its note
+            note_entries = self._by_note[entry[1]]
+            note_entries.popleft()
+            if not note_entries:
+                del self._by_note[entry[1]]
+            lines.append((entry[1], (json.dumps(self._as_dict(entry), ensure_ascii=False,
+                                                separators=(',', ':')) + '\n').encode('utf-8')))
+        if lines and self.filename is not None:
+            with open(self.filename, 'ab') as f:
+                offset = f.tell()
+                f.write(b''.join(line for _, line in lines))
+            if self._log_offsets is not None:
+                for note_id, line in lines:
+                    self._log_offsets.setdefault(note_id, []).append(offset)
+                    offset += len(line)
+
+    def _query_log(self, since: Optional[str], until: Optional[str],
+                   note_id: Optional[str]) -> List[Dict[str, Any]]:
+        if self.filename is None:
+            return []
+        try:
+            f = open(self.filename, 'rb')
+        except FileNotFoundError:
+            return []
+
+        results = []
+        with f:
+            f.seek(0, 2)
+            start = self._find_line(f, f.tell(), since) if since is not None else 0
+            if note_id is not None:
+                return self._query_note_log(f, start, until, note_id)
+            f.seek(start)
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn write at the end of the log
+                if until is not None and record['timestamp'] >= until:
+                    break
+                results.append(record)
+        return results
+
+    def _query_note_log(self, f, start: int, until: Optional[str],
+                        note_id: str) -> List[Dict[str, Any]]:
+        """Log lines of one note from offset `start` on, read through the offset index"""
+        if self._log_offsets is None:
+            self._log_offsets = {}
+            f.seek(0)
+            offset = 0
+            for line in f:
+                try:
+                    self._log_offsets.setdefault(json.loads(line)['note_id'], []).append(offset)
+                except ValueError:
+                    pass  # torn write at the end of the log
+                offset += len(line)
+
+        offsets = self._log_offsets.get(note_id, [])
+        results = []
+        for offset in offsets[bisect_left(offsets, start):]:
+            f.seek(offset)
+            record = json.loads(f.readline())
+            if until is not None and record['timestamp'] >= until:
+                break
+            results.append(record)
+        return results
+
+    def _find_line(self, f, size: int, timestamp: str) -> int:
+        """Offset of the first log line with a timestamp >= `timestamp`"""
+        def line_start(offset: int) -> int:
+            # First line starting at or after offset
+            if offset == 0:
+                return 0
+            f.seek(offset - 1)
+            f.readline()
+            return f.tell()
+
+        low, high = 0, size
+        while low < high:
+            middle = (low + high) // 2
+            f.seek(line_start(middle))
+            line = f.readline()
+            try:
+                before = bool(line) and json.loads(line)['timestamp'] < timestamp
+            except ValueError:
+                before = False
+            if before:
+                low = middle + 1
+            else:
+                high = middle
+        return line_start(low)
+
+    @classmethod
+    def _as_dict(cls, entry: Entry) -> Dict[str, Any]:
+        return dict(zip(cls.FIELDS, entry))
+
+    # Note.events hooks
+
+    def note_created(self, note: Note) -> None:
+        self.add_change(note, 'create', note.title)
+
+    def note_updated(self, note: Note, fields: Dict[str, Any]) -> None:
+        self.add_change(note, 'update', ', '.join(fields))
+
+    def relation_added(self, note: Note, relation: str, other: Note) -> None:
+        self.add_change(note, 'link', f"{relation} {other.id}")
+        self.add_change(other, 'link', f"{self.REVERSE_RELATIONS[relation]} {note.id}")
+
+    def relation_removed(self, note: Note, relation: str, other: Note) -> None:
+        self.add_change(note, 'unlink', f"{relation} {other.id}")
+        self.add_change(other, 'unlink', f"{self.REVERSE_RELATIONS[relation]} {note.id}")
+
+    def tag_changed(self, note: Note, tag: str, added: bool) -> None:
+        self.add_change(note, 'tag' if added else 'untag', tag)
+
+    def note_deleted(self, note: Note) -> None:
+        self.add_change(note, 'delete', note.title)
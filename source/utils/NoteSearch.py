@@ -1,21 +1,108 @@
-from typing import List
+from typing import Dict, List, Optional, Tuple
 from models.Note import Note
+from models.NoteEvents import (NoteCreated, NoteDeleted, NoteEvent, NotesLoaded, NoteUpdated,
+                               Subscription, TagChanged)
+from models.GraphStore import GraphStore
+from utils.Profiler import Profiler
+from utils.SearchIndex import SearchIndex
+from utils.TagIndex import TagIndex
+from utils.TermIndex import TermIndex
 
 
 class NoteSearch:
+    index: SearchIndex = SearchIndex()
+    ranked: TermIndex = TermIndex()
+    # Set once a running TagIndex follows the vault, see main
+    tags: Optional[TagIndex] = None
+    # Set while the indexes follow Note.events, see follow()
+    subscription: Optional[Subscription] = None
+
     @staticmethod
+    @Profiler.timed('NoteSearch.search_notes')
     def search_notes(notes: List[Note], query: str) -> List[Note]:
-        query = query.lower()
-        results = []
+        return NoteSearch.index.search(notes, query)
+
+    @staticmethod
+    @Profiler.timed('NoteSearch.search_ranked')
+    def search_ranked(notes: List[Note], query: str, k: int = 10) -> List[Tuple[Note, float]]:
+        """The `k` notes best matching the words of `query` by BM25, best first"""
+        NoteSearch.ranked.sync(notes)
+        return NoteSearch.ranked.search(query, k)
+
+    @staticmethod
+    def update_note(note: Note) -> None:
+        NoteSearch.index.update_note(note)
+        # The ranked index is built by the first ranked search
+        if len(NoteSearch.ranked):
+            NoteSearch.ranked.update_note(note)
 
-        for note in notes:
-            if (query in note.title.lower() or
-                    query in note.text.lower() or
-                    any(query in tag.lower() for tag in note.tags)):
-                results.append(note)
+    @staticmethod
+    def remove_note(note: Note) -> None:
+        NoteSearch.index.remove_note(note)
+        NoteSearch.ranked.remove_note(note)
 
-        return results
+    @staticmethod
+    def follow() -> None:
+        """Keep the indexes up to date from Note.events, once per batch"""
+        if NoteSearch.subscription is None:
+            NoteSearch.subscription = Note.events.subscribe(NoteSearch.on_events, 'NoteSearch')
 
     @staticmethod
+    def unfollow() -> None:
+        Note.events.unsubscribe(NoteSearch.subscription)
+        NoteSearch.subscription = None
+
+    @staticmethod
+    def on_events(events: List[NoteEvent]) -> None:
+        # Reindex every changed note once, however often it changed
+        changed: Dict[Note, None] = {}
+        for event in events:
+            if isinstance(event, (NoteCreated, NoteUpdated, TagChanged, NoteDeleted)):
+                changed[event.note] = None
+            elif isinstance(event, NotesLoaded):
+                changed.update(dict.fromkeys(event.notes))
+        index, ranked = NoteSearch.index, NoteSearch.ranked
+        # Notes the search index lacks are left to SearchIndex.build, unless
+        # it covers the rest of the vault: then they are new notes at its
+        # end, and indexing them now keeps the index in vault order
+        new = [note for note in changed if note not in index and Note.get_note(note.id) is note]
+        extend = bool(index) and len(index) + len(new) == len(Note.get_all_notes())
+        for note in changed:
+            live = Note.get_note(note.id) is note
+            if note in index:
+                if live:
+                    index.update_note(note)
+                else:
+                    index.remove_note(note)
+            # The ranked index is built by the first ranked search
+            if len(ranked):
+                if live:
+                    ranked.update_note(note)
+                else:
+                    ranked.remove_note(note)
+        if extend:
+            for note in new:
+                index.update_note(note)
+        index.mark_current()
+        ranked.mark_current()
+
+    @staticmethod
+    @Profiler.timed('NoteSearch.filter_by_tag')
     def filter_by_tag(notes: List[Note], tag: str) -> List[Note]:
-        return [note for note in notes if tag in note.tags]
\ No newline at end of file
+        if NoteSearch.tags is not None and notes is Note.get_all_notes():
+            return NoteSearch.tags.with_tag(tag)
+        return [note for note in notes if tag in note.tags]
+
+    @staticmethod
+    @Profiler.timed('NoteSearch.query_tags')
+    def query_tags(expression: str) -> List[Note]:
+        """Notes of the vault matching a boolean tag expression, see TagIndex.query"""
+        index = NoteSearch.tags
+        if index is None:
+            # Not following the vault: index it for this query only
+            index = TagIndex(Note.get_all_notes())
+        return index.query(expression)
+
+    @staticmethod
+    def filter_store_by_tag(store: GraphStore, tag: str) -> List[Note]:
+        return [store.notes[i] for i in store.notes_with_tag(tag)]
@@ -1,6 +1,9 @@
-from collections import Counter
-from typing import Dict, List, Any
+from collections import Counter, deque
+from heapq import nlargest
+from typing import Dict, Iterable, List, Any, Optional, Tuple
 from models.Note import Note
+from models.GraphStore import GraphStore
+from utils.GraphAnalytics import GraphAnalytics
 
 
 class NoteStats:
@@ -13,7 +16,8 @@ class NoteStats:
             'most_connected_notes': [],
             'isolated_notes': [],
             'tag_distribution': Counter(),
-            'depth_distribution': Counter()
+            'depth_distribution': Counter(),
+            'notes_in_cycles': []
         }
 
         if stats['total_notes'] > 0:
@@ -29,4 +33,72 @@ class NoteStats:
             for tag in note.tags:
                 stats['tag_distribution'][tag] += 1
 
-        return stats
\ No newline at end of file
+        stats['depth_distribution'], stats['notes_in_cycles'] = NoteStats.get_depths(notes)
+
+        return stats
+
+    @staticmethod
+    def get_store_stats(store: GraphStore, analytics: bool = False) -> Dict[str, Any]:
+        """
+        Same result as get_note_stats, computed from the CSR arrays. With
+        `analytics`, also includes get_graph_analytics under 'analytics'.
+        """
+        degrees = store.degrees()
+        stats = {
+            'total_notes': len(store),
+            'total_connections': store.edge_count(),
+            'avg_connections_per_note': 0,
+            'most_connected_notes': [],
+            'isolated_notes': [],
+            'tag_distribution': Counter(store.tag_counts()),
+            'depth_distribution': Counter(),
+            'notes_in_cycles': []
+        }
+
+        if stats['total_notes'] > 0:
+            stats['avg_connections_per_note'] = stats['total_connections'] / stats['total_notes']
+
+        top = nlargest(5, range(len(degrees)), key=degrees.__getitem__)
+        stats['most_connected_notes'] = [(store.notes[i], degrees[i]) for i in top]
+        stats['isolated_notes'] = [store.notes[i] for i, count in enumerate(degrees) if count == 0]
+        stats['depth_distribution'], stats['notes_in_cycles'] = NoteStats.get_depths(store.notes)
+        if analytics:
+            stats['analytics'] = NoteStats.get_graph_analytics(store)
+
+        return stats
+
+    @staticmethod
+    def get_graph_analytics(store: GraphStore, top: int = 5) -> Optional[Dict[str, Any]]:
+        """PageRank, betweenness and component summary, or None without NumPy"""
+        if not GraphAnalytics.available():
+            return None
+        return GraphAnalytics(store).summary(top)
+
+    @staticmethod
+    def get_depths(notes: Iterable[Note]) -> Tuple[Counter, List[Note]]:
+        """
+        Count notes per hierarchy depth (longest parent chain) in O(notes + links).
+        Notes on or below a parent/child cycle have no depth and are returned second.
+        """
+        notes = list(notes)
+        pending = dict.fromkeys(notes, 0)
+        for note in notes:
+            pending[note] = sum(1 for parent in note.parents if parent in pending)
+
+        # Kahn's algorithm: a note is placed once all of its parents are
+        depths = {note: 0 for note, count in pending.items() if count == 0}
+        queue = deque(depths)
+        while queue:
+            note = queue.popleft()
+            depth = depths[note] + 1
+            for child in note.children:
+                if child not in pending:
+                    continue
+                if depth > depths.get(child, 0):
+                    depths[child] = depth
+                pending[child] -= 1
+                if pending[child] == 0:
+                    queue.append(child)
+
+        distribution = Counter(depths[note] for note in notes if pending[note] == 0)
+        return distribution, [note for note in notes if pending[note] > 0]
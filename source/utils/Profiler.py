@@ -0,0 +1,149 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+_NULL_SPAN = nullcontext()
+
+
+class Profiler:
+    """
+    Timing spans and counters for the hot paths of the app.
+    Off until `enabled` is set; export_trace() writes the Chrome trace event format.
+    """
+
+    enabled = False
+    window = 1000
+    max_events = 200_000
+
+    _durations: Dict[str, Deque[float]] = {}
+    _totals: Dict[str, List[float]] = {}
+    _counters: Dict[str, float] = {}
+    _events: Deque[Dict[str, Any]] = deque(maxlen=max_events)
+    _origin = time.perf_counter()
+    _last_frame: Optional[float] = None
+
+    @staticmethod
+    def timed(name: str) -> Callable[[Callable], Callable]:
+        """Decorator recording every call of the function as span `name`"""
+        def decorate(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not Profiler.enabled:
+                    return func(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    Profiler.record(name, start, time.perf_counter())
+            wrapper.__wrapped_span__ = name
+            return wrapper
+        return decorate
+
+    @staticmethod
+    def instrument(owner: type, method: str, name: Optional[str] = None) -> None:
+        """Wrap `owner.method` in place like timed(), once"""
+        func = getattr(owner, method)
+        if getattr(func, '__wrapped_span__', None) is None:
+            setattr(owner, method, Profiler.timed(name or f"{owner.__name__}.{method}")(func))
+
+    @staticmethod
+    def span(name: str):
+        """Context manager timing a block as span `name`"""
+        if not Profiler.enabled:
+            return _NULL_SPAN
+        return Profiler._span(name)
+
+    @staticmethod
+    @contextmanager
+    def _span(name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            Profiler.record(name, start, time.perf_counter())
+
+    @classmethod
+    def record(cls, name: str, start: float, end: float) -> None:
+        duration = end - start
+        durations = cls._durations.get(name)
+        if durations is None:
+            durations = cls._durations[name] = deque(maxlen=cls.window)
+            cls._totals[name] = [0, 0.0]
+        durations.append(duration)
+        totals = cls._totals[name]
+        totals[0] += 1
+        totals[1] += duration
+        cls._events.append({'name': name, 'ph': 'X', 'ts': (start - cls._origin) * 1e6,
+                            'dur': duration * 1e6, 'pid': os.getpid(),
+                            'tid': threading.get_ident()})
+
+    @classmethod
+    def count(cls, name: str, value: float = 1) -> None:
+        """Add to counter `name`; callers in loops should check `enabled` first"""
+        if cls.enabled:
+            cls.gauge(name, cls._counters.get(name, 0) + value)
+
+    @classmethod
+    def gauge(cls, name: str, value: float) -> None:
+        """Set gauge `name`, e.g. the number of draw items"""
+        if not cls.enabled:
+            return
+        cls._counters[name] = value
+        cls._events.append({'name': name, 'ph': 'C',
+                            'ts': (time.perf_counter() - cls._origin) * 1e6,
+                            'pid': os.getpid(), 'args': {'value': value}})
+
+    @classmethod
+    def frame(cls) -> None:
+        """Call once per rendered frame; the time between calls is span 'frame'"""
+        now = time.perf_counter()
+        if cls.enabled and cls._last_frame is not None:
+            cls.record('frame', cls._last_frame, now)
+        cls._last_frame = now
+
+    @classmethod
+    def reset(cls) -> None:
+        cls._durations.clear()
+        cls._totals.clear()
+        cls._counters.clear()
+        cls._events.clear()
+        cls._last_frame = None
+
+    @classmethod
+    def summary(cls) -> Dict[str, Dict[str, float]]:
+        """Per span: calls, total, and the mean, p50, p99 and max of recent calls, in ms"""
+        result = {}
+        for name, durations in list(cls._durations.items()):
+            recent = sorted(durations)
+            if not recent:
+                continue
+            calls, total = cls._totals[name]
+            result[name] = {
+                'calls': calls,
+                'total_ms': total * 1000,
+                'mean_ms': sum(recent) / len(recent) * 1000,
+                'p50_ms': recent[len(recent) // 2] * 1000,
+                'p99_ms': recent[min(len(recent) - 1, int(len(recent) * 0.99))] * 1000,
+                'max_ms': recent[-1] * 1000,
+            }
+        return result
+
+    @classmethod
+    def counters(cls) -> Dict[str, float]:
+        return dict(cls._counters)
+
+    @classmethod
+    def export_trace(cls, filename: str) -> None:
+        """Write the recorded spans and counters as a Chrome trace JSON file"""
+        data = {
+            'traceEvents': list(cls._events),
+            'displayTimeUnit': 'ms',
+            'otherData': {'summary': cls.summary(), 'counters': cls.counters()},
+        }
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
@@ -0,0 +1,282 @@
+import time
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from models.Note import Note
+
+try:
+    import numpy as np
+except ImportError:  # postings are intersected in Python instead
+    np = None
+
+# title, text and tags of a note as last indexed, the note's own objects
+Fields = Tuple[str, str, Tuple[str, ...]]
+
+
+class SearchIndex:
+    """
+    Trigram index over the lowercased title, text and tags of notes.
+    Candidates are verified with the same test as a full scan; until covers() holds, the rest is scanned.
+    """
+
+    GRAM_SIZE = 3
+    # Characters of context around an edited span, so lowercasing the span
+    # sees the same neighbours as lowercasing the whole field
+    MARGIN = GRAM_SIZE + 1
+    # Seconds a search may spend indexing notes not indexed yet
+    SEARCH_BUDGET = 0.02
+
+    def __init__(self):
+        self._postings: Dict[str, array] = {}
+        self._slots: Dict[Note, int] = {}
+        # By slot; None once the note was removed, slots are not reused
+        self._notes: List[Optional[Note]] = []
+        self._fields: List[Optional[Fields]] = []
+        # The list build() walks, whose order the slots follow, and the
+        # position in it
+        self._order: Optional[List[Note]] = None
+        self._cursor = 0
+        # Note._graph_version when the index last caught up with the vault
+        self._version = -1
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, note: Note) -> bool:
+        return note in self._slots
+
+    def add_notes(self, notes: Iterable[Note]) -> None:
+        for note in notes:
+            self.update_note(note)
+
+    def covers(self, notes: List[Note]) -> bool:
+        """
+        Whether the index holds exactly the notes of `notes`, in list order:
+        the list build() walks, fully indexed, with no note created, deleted
+        or retagged since (see mark_current).
+        """
+        return (notes is self._order and len(self._slots) == len(notes)
+                and self._version == Note._graph_version)
+
+    def mark_current(self) -> None:
+        """Record that every change to the vault so far has been applied"""
+        self._version = Note._graph_version
+
+    def build(self, notes: List[Note], seconds: Optional[float] = None) -> bool:
+        """
+        Index the notes of `notes` not indexed yet, in list order, for up to
+        `seconds`; cheap to call every frame. True once all of them are.
+        Only the list the index was started with is indexed.
+        """
+        if self.covers(notes):
+            return True
+        if self._slots and notes is not self._order:
+            return False
+        if notes is not self._order or self._cursor >= len(notes):
+            self._order, self._cursor = notes, 0
+        deadline = time.perf_counter() + seconds if seconds is not None else None
+        slots = self._slots
+        position = self._cursor
+        while position < len(notes):
+            note = notes[position]
+            position += 1
+            if note not in slots:
+                self.update_note(note)
+                if deadline is not None and not position & 31 and time.perf_counter() > deadline:
+                    break
+        self._cursor = position
+        if position < len(notes):
+            return False
+        self.mark_current()
+        return True
+
+    def update_note(self, note: Note) -> None:
+        """Index a new note or refresh the entries of a changed one"""
+        fields = (note.title, note.text, tuple(note.tags))
+        slot = self._slots.get(note)
+        if slot is None:
+            slot = self._slots[note] = len(self._notes)
+            self._notes.append(note)
+            self._fields.append(fields)
+            # The new slot is the highest, so appending keeps postings sorted
+            postings = self._postings
+            for gram in self._grams(fields):
+                posting = postings.get(gram)
+                if posting is None:
+                    posting = postings[gram] = array('i')
+                posting.append(slot)
+            return
+
+        old = self._fields[slot]
+        if old == fields:
+            return
+        self._fields[slot] = fields
+
+        removed: Set[str] = set()
+        added: Set[str] = set()
+        for old_value, new_value in zip(old[:2], fields[:2]):
+            if old_value != new_value:
+                gone, new = self._changed_grams(old_value, new_value)
+                removed |= gone
+                added |= new
+        if old[2] != fields[2]:
+            removed |= self._tag_grams(old[2])
+            added |= self._tag_grams(fields[2])
+
+        for gram in added:
+            self._insert(gram, slot)
+        removed -= added
+        if removed:
+            # Still in the note outside the edited span: keep the entry
+            title, text, tags = fields
+            lowered = (title.lower(), text.lower()) + tuple(tag.lower() for tag in tags)
+            for gram in removed:
+                if not any(gram in value for value in lowered):
+                    self._discard(gram, slot)
+
+    def remove_note(self, note: Note) -> None:
+        slot = self._slots.pop(note, None)
+        if slot is None:
+            return
+        for gram in self._grams(self._fields[slot]):
+            self._discard(gram, slot)
+        self._notes[slot] = None
+        self._fields[slot] = None
+
+    def candidates(self, query: str) -> Optional[List[int]]:
+        """
+        Slots of the indexed notes that contain every trigram of a
+        lowercased query, in slot order, or None when the query is too
+        short to narrow anything down.
+        """
+        if len(query) < self.GRAM_SIZE:
+            return None
+
+        postings = []
+        for gram in self._split(query):
+            posting = self._postings.get(gram)
+            if not posting:
+                return []
+            postings.append(posting)
+
+        postings.sort(key=len)
+        if np is not None and len(postings) > 1:
+            result = np.frombuffer(postings[0], dtype=np.int32)
+            for posting in postings[1:]:
+                if not len(result):
+                    break
+                result = np.intersect1d(result, np.frombuffer(posting, dtype=np.int32),
+                                        assume_unique=True)
+            return result.tolist()
+
+        result = postings[0].tolist()
+        for posting in postings[1:]:
+            if not result:
+                break
+            if len(result) * 16 < len(posting):
+                # Few candidates left: probe the long posting for each
+                size = len(posting)
+                result = [slot for slot in result
+                          if (i := bisect_left(posting, slot)) < size and posting[i] == slot]
+            else:
+                result = sorted(set(result).intersection(posting))
+        return result
+
+    @staticmethod
+    def matches(note: Note, query: str) -> bool:
+        """The substring test the index narrows down, for a lowercased query"""
+        title, text = note.title, note.text
+        # Lowercase text found as is is still there once lowercased: only
+        # the misses pay for lowercasing
+        return (query in text or query in title or query in text.lower()
+                or query in title.lower() or any(query in tag.lower() for tag in note.tags))
+
+    def search(self, notes: List[Note], query: str) -> List[Note]:
+        """Return the notes from `notes` matching `query`, in list order"""
+        query = query.lower()
+        if not self.covers(notes):
+            self.build(notes, self.SEARCH_BUDGET)
+        candidates = self.candidates(query)
+
+        if candidates is not None and self.covers(notes):
+            # The index covers `notes`, and indexes them in list order
+            matches = self.matches
+            return [note for note in map(self._notes.__getitem__, candidates)
+                    if matches(note, query)]
+
+        # Still building, or a short query: scan, skipping the indexed
+        # notes that lack a trigram of the query
+        known = set(candidates) if candidates is not None else None
+        slots = self._slots
+        results = []
+        for note in notes:
+            if known is not None:
+                slot = slots.get(note)
+                if slot is not None and slot not in known:
+                    continue
+            if self.matches(note, query):
+                results.append(note)
+        return results
+
+    def _insert(self, gram: str, slot: int) -> None:
+        posting = self._postings.get(gram)
+        if posting is None:
+            self._postings[gram] = array('i', (slot,))
+            return
+        i = bisect_left(posting, slot)
+        if i == len(posting) or posting[i] != slot:
+            posting.insert(i, slot)
+
+    def _discard(self, gram: str, slot: int) -> None:
+        posting = self._postings.get(gram)
+        if posting is None:
+            return
+        i = bisect_left(posting, slot)
+        if i < len(posting) and posting[i] == slot:
+            if len(posting) == 1:
+                del self._postings[gram]
+            else:
+                del posting[i]
+
+    def _changed_grams(self, old: str, new: str) -> Tuple[Set[str], Set[str]]:
+        """Trigrams of the edited span that `old` has and `new` lacks, and the reverse"""
+        limit = min(len(old), len(new))
+        # Binary search over slice comparisons keeps the scanning in C
+        low, high = 0, limit
+        while low < high:
+            middle = (low + high + 1) // 2
+            if old[:middle] == new[:middle]:
+                low = middle
+            else:
+                high = middle - 1
+        prefix = low
+        low, high = 0, limit - prefix
+        while low < high:
+            middle = (low + high + 1) // 2
+            if old[len(old) - middle:] == new[len(new) - middle:]:
+                low = middle
+            else:
+                high = middle - 1
+        suffix = low
+
+        start = max(prefix - self.MARGIN, 0)
+        old_grams = self._split(old[start:len(old) - suffix + self.MARGIN].lower())
+        new_grams = self._split(new[start:len(new) - suffix + self.MARGIN].lower())
+        return old_grams - new_grams, new_grams - old_grams
+
+    @classmethod
+    def _split(cls, value: str) -> Set[str]:
+        # Joining zipped shifted copies beats slicing at every position
+        return set(map(''.join, zip(*(value[i:] for i in range(cls.GRAM_SIZE)))))
+
+    @classmethod
+    def _tag_grams(cls, tags: Tuple[str, ...]) -> Set[str]:
+        grams: Set[str] = set()
+        for tag in tags:
+            grams |= cls._split(tag.lower())
+        return grams
+
+    @classmethod
+    def _grams(cls, fields: Fields) -> Set[str]:
+        title, text, tags = fields
+        return cls._split(title.lower()) | cls._split(text.lower()) | cls._tag_grams(tags)
@@ -0,0 +1,61 @@
+import math
+from typing import Dict, List, Optional, Tuple
+from models.Note import Note
+
+
+class SpatialIndex:
+    """
+    Uniform grid over note positions for nearest-note picking and rectangle
+    queries. Both only visit the cells overlapping the query area, so their
+    cost depends on the local density rather than the number of points.
+    """
+
+    def __init__(self, cell_size: float = 100.0):
+        self.cell_size = cell_size
+        self._cells: Dict[Tuple[int, int], List[Tuple[Note, float, float]]] = {}
+
+    def __len__(self) -> int:
+        return sum(len(cell) for cell in self._cells.values())
+
+    def rebuild(self, positions: Dict[Note, Tuple[float, float]]) -> None:
+        self._cells = {}
+        for note, (x, y) in positions.items():
+            self._cells.setdefault(self._cell(x, y), []).append((note, x, y))
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def _cells_in(self, x0: float, y0: float, x1: float, y1: float):
+        cx0, cy0 = self._cell(x0, y0)
+        cx1, cy1 = self._cell(x1, y1)
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(self._cells):
+            # The area covers more cells than are occupied: scan those instead
+            for (cx, cy), cell in self._cells.items():
+                if cx0 <= cx <= cx1 and cy0 <= cy <= cy1:
+                    yield cell
+            return
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                cell = self._cells.get((cx, cy))
+                if cell:
+                    yield cell
+
+    def nearest(self, x: float, y: float, max_distance: float) -> Optional[Note]:
+        """The note closest to (x, y), if one lies within max_distance"""
+        closest = None
+        min_distance = max_distance
+        for cell in self._cells_in(x - max_distance, y - max_distance,
+                                   x + max_distance, y + max_distance):
+            for note, ix, iy in cell:
+                distance = math.hypot(x - ix, y - iy)
+                if distance < min_distance:
+                    min_distance = distance
+                    closest = note
+        return closest
+
+    def query_rect(self, x0: float, y0: float, x1: float, y1: float) -> List[Note]:
+        """Notes inside the rectangle, in no particular order"""
+        return [note
+                for cell in self._cells_in(x0, y0, x1, y1)
+                for note, ix, iy in cell
+                if x0 <= ix <= x1 and y0 <= iy <= y1]
@@ -0,0 +1,172 @@
+import heapq
+import itertools
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from models.Note import Note
+from models.NoteEvents import Subscription
+from utils.NoteStats import NoteStats
+
+
+class StatsEngine:
+    """
+    Note statistics kept up to date from Note.events.
+    Depths are recomputed by NoteStats.get_depths when the hierarchy changed since the last call.
+    """
+
+    def __init__(self, notes: Iterable[Note]):
+        self.subscription: Optional[Subscription] = None
+        self._degrees: Dict[Note, int] = {}
+        self._isolated: Dict[Note, None] = {}
+        self._tags: Dict[Note, Tuple[str, ...]] = {}
+        self._tag_counts: Counter = Counter()
+        self._heap: List[Tuple[int, int, Note]] = []
+        self._sequence = itertools.count()
+        self.total_connections = 0
+        self._relation_changes = 0
+        self._depths = None
+        self._depths_at = -1
+
+        self._load(notes)
+        self._rebuild_heap()
+
+    def __len__(self) -> int:
+        return len(self._degrees)
+
+    def start(self) -> None:
+        """Follow Note.events; batched, the counters only need the end state"""
+        self.subscription = Note.events.subscribe_hooks(self)
+
+    def stop(self) -> None:
+        Note.events.unsubscribe(self.subscription)
+        self.subscription = None
+
+    def get_stats(self, top: int = 5) -> Dict[str, Any]:
+        """Same keys as NoteStats.get_note_stats"""
+        total = len(self._degrees)
+        if self._depths_at != self._relation_changes:
+            self._depths = NoteStats.get_depths(self._degrees)
+            self._depths_at = self._relation_changes
+        depth_distribution, notes_in_cycles = self._depths
+        return {
+            'total_notes': total,
+            'total_connections': self.total_connections,
+            'avg_connections_per_note': self.total_connections / total if total else 0,
+            'most_connected_notes': self.most_connected(top),
+            'isolated_notes': list(self._isolated),
+            'tag_distribution': +self._tag_counts,
+            'depth_distribution': depth_distribution,
+            'notes_in_cycles': notes_in_cycles,
+        }
+
+    def most_connected(self, count: int = 5) -> List[Tuple[Note, int]]:
+        """The `count` notes with the most connections, most connected first"""
+        heap = self._heap
+        result = []
+        kept = []
+        seen = set()
+        while heap and len(result) < count:
+            entry = heapq.heappop(heap)
+            negative_degree, _, note = entry
+            if self._degrees.get(note) != -negative_degree or note in seen:
+                # Superseded by a later entry for the same note, or an older
+                # one from when it last had this degree
+                continue
+            seen.add(note)
+            result.append((note, -negative_degree))
+            kept.append(entry)
+        for entry in kept:
+            heapq.heappush(heap, entry)
+        return result
+
+    def _load(self, notes: Iterable[Note]) -> None:
+        """Count notes, and their links, that appeared without events"""
+        for note in notes:
+            if note not in self._degrees:
+                self._add_note(note)
+            degree = len(note.parents) + len(note.children) + len(note.neighbors)
+            old = self._degrees[note]
+            if degree != old:
+                self._degrees[note] = degree
+                if degree:
+                    self._isolated.pop(note, None)
+                else:
+                    self._isolated[note] = None
+                self.total_connections += degree - old
+
+    def _add_note(self, note: Note) -> None:
+        self._degrees[note] = 0
+        self._isolated[note] = None
+        self._tags[note] = tuple(note.tags)
+        self._tag_counts.update(note.tags)
+        heapq.heappush(self._heap, (0, next(self._sequence), note))
+
+    def _set_degree(self, note: Note, degree: int) -> None:
+        self._degrees[note] = degree
+        if degree:
+            self._isolated.pop(note, None)
+        heapq.heappush(self._heap, (-degree, next(self._sequence), note))
+        if len(self._heap) > 2 * len(self._degrees) + 64:
+            # Mostly superseded entries by now: start over from the degrees
+            self._rebuild_heap()
+
+    def _rebuild_heap(self) -> None:
+        self._heap = [(-degree, next(self._sequence), note)
+                      for note, degree in self._degrees.items()]
+        heapq.heapify(self._heap)
+
+    def _retag(self, note: Note, tags: Iterable[str]) -> None:
+        self._tag_counts.subtract(self._tags.get(note, ()))
+        self._tags[note] = tuple(tags)
+        self._tag_counts.update(self._tags[note])
+
+    # Note.events hooks
+
+    def note_created(self, note: Note) -> None:
+        self._add_note(note)
+        self._relation_changes += 1
+
+    def note_updated(self, note: Note, fields: Dict[str, Any]) -> None:
+        if 'tags' in fields:
+            self._retag(note, fields['tags'])
+
+    def relation_added(self, note: Note, relation: str, other: Note) -> None:
+        # One link adds an entry on both ends, e.g. parents and children
+        ends = self._ends(note, relation, other)
+        for end in ends:
+            if end not in self._degrees:
+                self._add_note(end)
+            self._set_degree(end, self._degrees[end] + 1)
+        self.total_connections += len(ends)
+        self._relation_changes += 1
+
+    def relation_removed(self, note: Note, relation: str, other: Note) -> None:
+        ends = self._ends(note, relation, other)
+        for end in ends:
+            degree = self._degrees.get(end)
+            if degree:
+                self._set_degree(end, degree - 1)
+                if degree == 1:
+                    self._isolated[end] = None
+        self.total_connections -= len(ends)
+        self._relation_changes += 1
+
+    @staticmethod
+    def _ends(note: Note, relation: str, other: Note) -> Tuple[Note, ...]:
+        """Notes that gain or lose a relation entry; a note linked to itself as a neighbor only one"""
+        return (note,) if other is note and relation == 'neighbor' else (note, other)
+
+    def tag_changed(self, note: Note, tag: str, added: bool) -> None:
+        self._retag(note, note.tags)
+
+    def notes_loaded(self, notes: List[Note]) -> None:
+        self._load(notes)
+        self._relation_changes += 1
+        self._rebuild_heap()
+
+    def note_deleted(self, note: Note) -> None:
+        # Its links were removed one by one before this call
+        self._degrees.pop(note, None)
+        self._isolated.pop(note, None)
+        self._retag(note, ())
+        del self._tags[note]
+        self._relation_changes += 1
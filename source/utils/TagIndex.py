@@ -0,0 +1,235 @@
+import re
+import sys
+from typing import Any, Callable, Collection, Dict, Iterable, List, Optional, Tuple
+from models.Note import Note
+from models.NoteEvents import Subscription
+
+
+class TagIndex:
+    """
+    Tag -> note bitset index with boolean tag queries.
+    Matches come back in the order of Note._all_notes.
+    """
+
+    TOKEN = re.compile(r'"([^"]*)"|([()])|([^\s()"]+)')
+    OPERATORS = ('AND', 'OR', 'NOT')
+
+    def __init__(self, notes: Iterable[Note]):
+        self.subscription: Optional[Subscription] = None
+        self._masks: Dict[str, int] = {}
+        self._slots: Dict[Note, int] = {}
+        self._notes: List[Optional[Note]] = []
+        self._tags: Dict[Note, Tuple[str, ...]] = {}
+        self._live = 0
+        self._build([(note, note.tags) for note in dict.fromkeys(notes)])
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def start(self) -> None:
+        """Follow Note.events; batched, like StatsEngine"""
+        self.subscription = Note.events.subscribe_hooks(self)
+
+    def stop(self) -> None:
+        Note.events.unsubscribe(self.subscription)
+        self.subscription = None
+
+    def tags(self) -> List[str]:
+        return [tag for tag, mask in self._masks.items() if mask]
+
+    def with_tag(self, tag: str) -> List[Note]:
+        return self._select(self._masks.get(tag, 0))
+
+    def query(self, expression: str) -> List[Note]:
+        """
+        Notes matching a tag expression such as `work AND (urgent OR today) NOT done`.
+        Terms next to each other are ANDed; quote tags containing spaces or parentheses.
+        """
+        return self._select(self.mask(expression))
+
+    def count(self, expression: str) -> int:
+        return bin(self.mask(expression)).count('1')
+
+    def mask(self, expression: str) -> int:
+        """Bitset of the notes matching `expression`"""
+        return self._evaluate(self.parse(expression))
+
+    def _evaluate(self, node: Tuple) -> int:
+        kind = node[0]
+        if kind == 'tag':
+            return self._masks.get(node[1], 0)
+        if kind == 'not':
+            return self._live & ~self._evaluate(node[1])
+        left, right = self._evaluate(node[1]), self._evaluate(node[2])
+        return left & right if kind == 'and' else left | right
+
+    @classmethod
+    def matcher(cls, expression: str) -> Callable[[Collection[str]], bool]:
+        """Test for the tags of a single note, for notes that are not indexed"""
+        def matches(node: Tuple, tags: Collection[str]) -> bool:
+            kind = node[0]
+            if kind == 'tag':
+                return node[1] in tags
+            if kind == 'not':
+                return not matches(node[1], tags)
+            if kind == 'and':
+                return matches(node[1], tags) and matches(node[2], tags)
+            return matches(node[1], tags) or matches(node[2], tags)
+
+        tree = cls.parse(expression)
+        return lambda tags: matches(tree, tags)
+
+    @classmethod
+    def parse(cls, expression: str) -> Tuple:
+        """
+        Syntax tree of a tag expression: ('tag', name), ('not', node) or
+        ('and' / 'or', left, right). Raises ValueError on malformed input.
+        """
+        tokens = []
+        for quoted, bracket, word in cls.TOKEN.findall(expression):
+            if bracket:
+                tokens.append(bracket)
+            elif word and word.upper() in cls.OPERATORS:
+                tokens.append(word.upper())
+            else:
+                # Quoted and plain tags are kept apart from operators and brackets
+                tokens.append(('tag', quoted or word))
+        position, tree = cls._parse_or(tokens, 0)
+        if position != len(tokens):
+            raise ValueError(f"Unexpected {cls._describe(tokens[position])} in tag expression")
+        return tree
+
+    @classmethod
+    def _parse_or(cls, tokens: List[Any], position: int) -> Tuple[int, Tuple]:
+        position, tree = cls._parse_and(tokens, position)
+        while position < len(tokens) and tokens[position] == 'OR':
+            position, other = cls._parse_and(tokens, position + 1)
+            tree = ('or', tree, other)
+        return position, tree
+
+    @classmethod
+    def _parse_and(cls, tokens: List[Any], position: int) -> Tuple[int, Tuple]:
+        position, tree = cls._parse_term(tokens, position)
+        while position < len(tokens) and tokens[position] not in ('OR', ')'):
+            if tokens[position] == 'AND':
+                position += 1
+            position, other = cls._parse_term(tokens, position)
+            tree = ('and', tree, other)
+        return position, tree
+
+    @classmethod
+    def _parse_term(cls, tokens: List[Any], position: int) -> Tuple[int, Tuple]:
+        if position == len(tokens):
+            raise ValueError("Tag expression ends early")
+        token = tokens[position]
+        if token == 'NOT':
+            position, tree = cls._parse_term(tokens, position + 1)
+            return position, ('not', tree)
+        if token == '(':
+            position, tree = cls._parse_or(tokens, position + 1)
+            if position == len(tokens) or tokens[position] != ')':
+                raise ValueError("Missing ) in tag expression")
+            return position + 1, tree
+        if isinstance(token, tuple):
+            return position + 1, token
+        raise ValueError(f"Unexpected {cls._describe(token)} in tag expression")
+
+    @staticmethod
+    def _describe(token: Any) -> str:
+        return repr(token[1]) if isinstance(token, tuple) else repr(token)
+
+    def _select(self, mask: int) -> List[Note]:
+        notes = self._notes
+        # Lowest bit first; str.find skips runs of zero bits in C
+        bits = bin(mask)[:1:-1]
+        result = []
+        i = bits.find('1')
+        while i >= 0:
+            result.append(notes[i])
+            i = bits.find('1', i + 1)
+        return result
+
+    def _add_note(self, note: Note) -> None:
+        if note in self._slots:
+            return
+        slot = len(self._notes)
+        self._slots[note] = slot
+        self._notes.append(note)
+        self._live |= 1 << slot
+        self._tags[note] = ()
+        self._retag(note, note.tags)
+
+    def _remove_note(self, note: Note) -> None:
+        slot = self._slots.get(note)
+        if slot is None:
+            return
+        self._retag(note, ())
+        del self._slots[note]
+        del self._tags[note]
+        self._notes[slot] = None
+        self._live &= ~(1 << slot)
+        if len(self._notes) > 64 and len(self._slots) * 2 < len(self._notes):
+            self._compact()
+
+    def _retag(self, note: Note, tags: Iterable[str]) -> None:
+        bit = 1 << self._slots[note]
+        old = self._tags[note]
+        new = tuple(dict.fromkeys(sys.intern(tag) for tag in tags))
+        masks = self._masks
+        for tag in old:
+            if tag not in new:
+                mask = masks[tag] & ~bit
+                if mask:
+                    masks[tag] = mask
+                else:
+                    del masks[tag]
+        for tag in new:
+            if tag not in old:
+                masks[tag] = masks.get(tag, 0) | bit
+        self._tags[note] = new
+
+    def _compact(self) -> None:
+        """Hand out bit positions again to the live notes, keeping their order"""
+        self._build([(note, self._tags[note]) for note in self._notes if note is not None])
+
+    def _build(self, entries: List[Tuple[Note, Iterable[str]]]) -> None:
+        """Index notes from scratch, setting bits in byte buffers rather than in ints"""
+        size = (len(entries) + 7) // 8
+        buffers: Dict[str, bytearray] = {}
+        self._slots = {}
+        self._notes = []
+        self._tags = {}
+        for slot, (note, tags) in enumerate(entries):
+            self._slots[note] = slot
+            self._notes.append(note)
+            tags = self._tags[note] = tuple(dict.fromkeys(sys.intern(tag) for tag in tags))
+            for tag in tags:
+                buffer = buffers.get(tag)
+                if buffer is None:
+                    buffer = buffers[tag] = bytearray(size)
+                buffer[slot >> 3] |= 1 << (slot & 7)
+        self._masks = {tag: int.from_bytes(buffer, 'little') for tag, buffer in buffers.items()}
+        self._live = (1 << len(entries)) - 1
+
+    # Note.events hooks
+
+    def note_created(self, note: Note) -> None:
+        self._add_note(note)
+
+    def note_updated(self, note: Note, fields: Dict[str, Any]) -> None:
+        if 'tags' in fields and note in self._slots:
+            self._retag(note, fields['tags'])
+
+    def tag_changed(self, note: Note, tag: str, added: bool) -> None:
+        if note in self._slots:
+            self._retag(note, note.tags)
+
+    def note_deleted(self, note: Note) -> None:
+        self._remove_note(note)
+
+    def notes_loaded(self, notes: List[Note]) -> None:
+        for note in notes:
+            if note in self._slots:
+                self._retag(note, note.tags)
+            else:
+                self._add_note(note)
@@ -0,0 +1,236 @@
+import heapq
+import itertools
+import math
+import re
+from operator import itemgetter
+from typing import Dict, Iterable, List, Set, Tuple
+from models.Note import Note
+
+
+class TermIndex:
+    """
+    Word-level inverted index with BM25F ranking and top-k queries.
+    Long posting lists are read by decreasing impact and stop early (Fagin's threshold algorithm).
+    """
+
+    # Posting lists longer than this are read in impact order
+    SCAN_LIMIT = 2000
+    # Impact orders kept at a time, and how stale they may get
+    MAX_CACHED_TERMS = 64
+    MAX_SCALE_DRIFT = 0.05
+
+    TOKEN = re.compile(r'\w+')
+
+    def __init__(self, title_boost: float = 3.0, tag_boost: float = 2.0,
+                 k1: float = 1.2, b: float = 0.75):
+        self.title_boost = title_boost
+        self.tag_boost = tag_boost
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[Note, float]] = {}
+        self._terms: Dict[Note, Dict[str, float]] = {}
+        self._lengths: Dict[Note, float] = {}
+        self._total_length = 0.0
+        # term -> (notes by decreasing impact, their impacts, length scale used)
+        self._impacts: Dict[str, Tuple[List[Note], List[float], float]] = {}
+        # Notes whose entry changed since the impact order of a term was cached
+        self._dirty: Dict[str, Set[Note]] = {}
+        # Note._graph_version when the index last caught up with the vault
+        self._version = -1
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def __contains__(self, note: Note) -> bool:
+        return note in self._terms
+
+    def tokenize(self, value: str) -> List[str]:
+        return self.TOKEN.findall(value.lower())
+
+    def document_frequency(self, term: str) -> int:
+        return len(self._postings.get(term.lower(), ()))
+
+    def sync(self, notes: Iterable[Note]) -> None:
+        """
+        Index notes missing from the index and drop the ones gone from `notes`.
+        Only compared when notes were created or deleted since the last sync or mark_current().
+        """
+        notes = list(notes)
+        if len(notes) == len(self._terms) and self._version == Note._graph_version:
+            return
+        current = set(notes)
+        for note in [n for n in self._terms if n not in current]:
+            self.remove_note(note)
+        for note in notes:
+            if note not in self._terms:
+                self.update_note(note)
+        self.mark_current()
+
+    def mark_current(self) -> None:
+        """Record that every change to the vault so far has been applied"""
+        self._version = Note._graph_version
+
+    def term_frequencies(self, title: str, text: str, tags: Iterable[str]) -> Dict[str, float]:
+        """Boosted frequency of every term of a note with these fields"""
+        terms: Dict[str, float] = {}
+        for token in self.tokenize(text):
+            terms[token] = terms.get(token, 0.0) + 1.0
+        for token in self.tokenize(title):
+            terms[token] = terms.get(token, 0.0) + self.title_boost
+        for tag in tags:
+            for token in self.tokenize(tag):
+                terms[token] = terms.get(token, 0.0) + self.tag_boost
+        return terms
+
+    def score(self, terms: Dict[str, float], length: float, frequencies: Dict[str, int],
+              count: int, average_length: float) -> float:
+        """
+        BM25 score of one document from its query term frequencies and
+        length, given the document frequencies of the query terms, for
+        scoring notes that are not in the index
+        """
+        norm = self.k1 * (1 - self.b + self.b * length / (average_length or 1.0))
+        total = 0.0
+        for term, frequency in frequencies.items():
+            tf = terms.get(term)
+            if tf:
+                weight = math.log(1 + (count - frequency + 0.5) / (frequency + 0.5)) * (self.k1 + 1)
+                total += weight * tf / (tf + norm)
+        return total
+
+    def update_note(self, note: Note) -> None:
+        """Index a new note or replace the terms of a changed one"""
+        terms = self.term_frequencies(note.title, note.text, note.tags)
+        old_terms = self._terms.get(note)
+        if old_terms == terms:
+            return
+        # A new length changes the impact of every term of the note
+        for term in terms.keys() | (old_terms or {}).keys():
+            dirty = self._dirty.get(term)
+            if dirty is not None:
+                dirty.add(note)
+        if old_terms is not None:
+            for term in old_terms.keys() - terms.keys():
+                posting = self._postings[term]
+                del posting[note]
+                if not posting:
+                    del self._postings[term]
+            self._total_length -= self._lengths[note]
+
+        for term, frequency in terms.items():
+            self._postings.setdefault(term, {})[note] = frequency
+        self._terms[note] = terms
+        self._lengths[note] = length = sum(terms.values())
+        self._total_length += length
+
+    def remove_note(self, note: Note) -> None:
+        terms = self._terms.pop(note, None)
+        if terms is None:
+            return
+        for term in terms:
+            dirty = self._dirty.get(term)
+            if dirty is not None:
+                dirty.add(note)
+            posting = self._postings[term]
+            del posting[note]
+            if not posting:
+                del self._postings[term]
+        self._total_length -= self._lengths.pop(note)
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[Note, float]]:
+        """The `k` best matching notes for `query` with their scores, best first"""
+        count = len(self._terms)
+        if count == 0 or k <= 0:
+            return []
+        k1 = self.k1
+        # Length normalisation of BM25: k1 * (1 - b + b * length / average)
+        base = k1 * (1 - self.b)
+        scale = k1 * self.b * count / (self._total_length or 1.0)
+        lengths = self._lengths
+
+        terms = {}
+        for term in set(self.tokenize(query)):
+            posting = self._postings.get(term)
+            if posting:
+                frequency = len(posting)
+                terms[term] = math.log(1 + (count - frequency + 0.5) / (frequency + 0.5)) * (k1 + 1)
+        postings = self._postings
+
+        def score(note: Note) -> float:
+            norm = base + scale * lengths[note]
+            total = 0.0
+            for term, weight in terms.items():
+                tf = postings[term].get(note)
+                if tf:
+                    total += weight * tf / (tf + norm)
+            return total
+
+        best: List[Tuple[float, int, Note]] = []
+        seen: Set[Note] = set()
+        sequence = itertools.count()
+
+        def offer(note: Note) -> None:
+            if note in seen:
+                return
+            seen.add(note)
+            entry = (score(note), next(sequence), note)
+            if len(best) < k:
+                heapq.heappush(best, entry)
+            elif entry[0] > best[0][0]:
+                heapq.heapreplace(best, entry)
+
+        long_lists = []
+        for term, weight in terms.items():
+            posting = postings[term]
+            if len(posting) <= self.SCAN_LIMIT:
+                for note in posting:
+                    offer(note)
+                continue
+            notes, impacts, cached_scale = self._impact_order(term, base, scale)
+            dirty = self._dirty[term]
+            for note in dirty:
+                if note in posting:
+                    offer(note)
+            # Impacts were computed with cached_scale; this bounds them for the current one
+            factor = max(1.0, cached_scale / scale)
+            long_lists.append((notes, impacts, weight * factor, dirty))
+
+        depth = 0
+        while long_lists:
+            threshold = 0.0
+            active = False
+            for notes, impacts, weight, dirty in long_lists:
+                if depth < len(notes):
+                    active = True
+                    note = notes[depth]
+                    if note not in dirty:
+                        offer(note)
+                    threshold += weight * impacts[depth]
+            # No note deeper in any list can score above the threshold
+            if not active or (len(best) == k and best[0][0] >= threshold):
+                break
+            depth += 1
+
+        return [(note, value) for value, _, note in sorted(best, reverse=True)]
+
+    def _impact_order(self, term: str, base: float,
+                      scale: float) -> Tuple[List[Note], List[float], float]:
+        """Cached notes of a long posting list by decreasing impact, rebuilt when stale"""
+        posting = self._postings[term]
+        cached = self._impacts.get(term)
+        if (cached is None
+                or abs(cached[2] / scale - 1) > self.MAX_SCALE_DRIFT
+                or len(self._dirty[term]) * 8 > len(posting)):
+            lengths = self._lengths
+            order = sorted(((tf / (tf + base + scale * lengths[note]), note)
+                            for note, tf in posting.items()),
+                           key=itemgetter(0), reverse=True)
+            cached = ([note for _, note in order], [impact for impact, _ in order], scale)
+            self._impacts.pop(term, None)
+            if len(self._impacts) >= self.MAX_CACHED_TERMS:
+                oldest = next(iter(self._impacts))
+                del self._impacts[oldest]
+                del self._dirty[oldest]
+            self._impacts[term] = cached
+            self._dirty[term] = set()
+        return cached
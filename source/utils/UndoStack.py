@@ -0,0 +1,392 @@
+import sys
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+from models.Note import Note
+from models.NoteEvents import Subscription
+
+# An operation is a tuple whose first item names its kind:
+#   ('text', note, start, removed, inserted, checkpoint)
+#   ('field', note, name, old, new)
+#   ('link', note, relation, other, added)
+#   ('tag', note, tag, added)
+#   ('create', note) / ('delete', note)
+# A step is the list of operations undone or redone together.
+Operation = Tuple[Any, ...]
+
+
+class UndoStack:
+    """
+    Undo/redo of note edits, relations and tags, recorded from Note.events.
+    Field updates are undoable for notes created while it runs and notes passed to track().
+    """
+
+    def __init__(self, coalesce_window: float = 1.0, checkpoint_interval: int = 50,
+                 max_steps: int = 1000):
+        self.coalesce_window = coalesce_window
+        self.checkpoint_interval = checkpoint_interval
+        self.max_steps = max_steps
+        self.clock = time.monotonic
+        self.subscription: Optional[Subscription] = None
+        self._undo: Deque[List[Operation]] = deque()
+        self._redo: List[List[Operation]] = []
+        self._group: Optional[List[Operation]] = None
+        self._applying = False
+        # Last known (title, text, tags) of tracked notes; strings are shared, not copied
+        self._shadow: Dict[Note, Tuple[str, str, Tuple[str, ...]]] = {}
+        self._text_edits: Dict[Note, int] = {}
+        # Operations on both stacks that refer to each note
+        self._references: Dict[Note, int] = {}
+        self._tracked: Optional[Note] = None
+        self._typing_step: Optional[List[Operation]] = None
+        self._typing_note: Optional[Note] = None
+        self._last_edit = 0.0
+
+    def start(self) -> None:
+        """Follow Note.events; immediate, since it records the state before each change"""
+        self.subscription = Note.events.subscribe_hooks(self, immediate=True)
+
+    def stop(self) -> None:
+        Note.events.unsubscribe(self.subscription)
+        self.subscription = None
+
+    def track(self, note: Note) -> None:
+        """Remember the current fields of `note` so its updates can be undone"""
+        previous = self._tracked
+        if previous is not None and previous is not note and previous not in self._references:
+            self._forget(previous)
+        self._tracked = note
+        if note not in self._shadow:
+            self._shadow[note] = (note.title, note.text, tuple(note.tags))
+
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    @contextmanager
+    def step(self):
+        """Record everything inside the block as one undo step, and one batch of events"""
+        if self._group is not None:
+            yield
+            return
+        self._group = []
+        try:
+            with Note.events.batch():
+                yield
+        finally:
+            operations, self._group = self._group, None
+            if operations:
+                self._push(operations)
+
+    def undo(self, count: int = 1) -> Set[Note]:
+        """Undo up to `count` steps, returning the notes they touched"""
+        steps = []
+        while self._undo and len(steps) < count:
+            steps.append(self._undo.pop())
+        if not steps:
+            return set()
+
+        self._applying = True
+        try:
+            # Batched subscribers hear of all the steps at once
+            with Note.events.batch():
+                self._undo_texts(steps)
+                for step in steps:
+                    for operation in reversed(step):
+                        if operation[0] != 'text':
+                            self._apply(operation, undo=True)
+        finally:
+            self._applying = False
+        self._typing_step = None
+        # Newest first in `steps`, so the oldest undone step ends up on top
+        self._redo.extend(steps)
+        return self._touched(steps)
+
+    def redo(self, count: int = 1) -> Set[Note]:
+        steps = []
+        while self._redo and len(steps) < count:
+            steps.append(self._redo.pop())
+        if not steps:
+            return set()
+
+        self._applying = True
+        try:
+            with Note.events.batch():
+                for step in steps:
+                    for operation in step:
+                        self._apply(operation, undo=False)
+        finally:
+            self._applying = False
+        self._typing_step = None
+        self._undo.extend(steps)
+        return self._touched(steps)
+
+    def stats(self) -> Dict[str, Any]:
+        operations = [op for steps in (self._undo, self._redo) for step in steps for op in step]
+        return {
+            'undo_steps': len(self._undo),
+            'redo_steps': len(self._redo),
+            'operations': len(operations),
+            'approx_bytes': sum(self._operation_size(op) for op in operations),
+        }
+
+    @staticmethod
+    def _operation_size(operation: Operation) -> int:
+        size = sys.getsizeof(operation)
+        for value in operation[2:]:
+            if isinstance(value, (str, list)):
+                size += sys.getsizeof(value)
+        return size
+
+    @staticmethod
+    def _notes_of(operation: Operation) -> Tuple[Note, ...]:
+        return (operation[1], operation[3]) if operation[0] == 'link' else (operation[1],)
+
+    @classmethod
+    def _touched(cls, steps: List[List[Operation]]) -> Set[Note]:
+        touched = set()
+        for step in steps:
+            for operation in step:
+                touched.update(cls._notes_of(operation))
+        return touched
+
+    def _undo_texts(self, steps: List[List[Operation]]) -> None:
+        """Set every note's text to what it was before the oldest undone edit"""
+        edits: Dict[Note, List[Operation]] = {}
+        for step in reversed(steps):
+            for operation in step:
+                if operation[0] == 'text':
+                    edits.setdefault(operation[1], []).append(operation)
+
+        for note, operations in edits.items():
+            # Start from the oldest checkpoint when there is one, so only the
+            # edits before it have to be reversed
+            first = next((i for i, op in enumerate(operations) if op[5] is not None),
+                         len(operations))
+            text = operations[first][5] if first < len(operations) else note.text
+            for _, _, start, removed, inserted, _ in reversed(operations[:first]):
+                text = text[:start] + removed + text[start + len(inserted):]
+            note.update(text=text)
+
+    def _apply(self, operation: Operation, undo: bool) -> None:
+        kind, note = operation[0], operation[1]
+        if kind == 'text':
+            _, _, start, removed, inserted, _ = operation
+            text = note.text
+            if undo:
+                note.update(text=text[:start] + removed + text[start + len(inserted):])
+            else:
+                note.update(text=text[:start] + inserted + text[start + len(removed):])
+        elif kind == 'field':
+            _, _, name, old, new = operation
+            note.update(**{name: old if undo else new})
+        elif kind == 'link':
+            _, _, relation, other, added = operation
+            prefix = 'add_' if added != undo else 'remove_'
+            getattr(note, prefix + relation)(other)
+        elif kind == 'tag':
+            _, _, tag, added = operation
+            if added != undo:
+                note.add_tag(tag)
+            else:
+                note.remove_tag(tag)
+        elif (kind == 'create') == undo:
+            note.delete()
+        else:
+            note.restore()
+
+    def _push(self, step: List[Operation]) -> None:
+        self._undo.append(step)
+        self._refer(step)
+        dropped = []
+        while len(self._undo) > self.max_steps:
+            dropped.append(self._undo.popleft())
+        dropped.extend(self._redo)
+        self._redo.clear()
+        if dropped:
+            self._release(dropped)
+
+    def _refer(self, operations: List[Operation]) -> None:
+        references = self._references
+        for operation in operations:
+            for note in self._notes_of(operation):
+                references[note] = references.get(note, 0) + 1
+
+    def _release(self, steps: List[List[Operation]]) -> None:
+        """Drop the references of steps leaving the stacks, forgetting notes no step needs"""
+        references = self._references
+        for step in steps:
+            for operation in step:
+                for note in self._notes_of(operation):
+                    count = references[note] - 1
+                    if count:
+                        references[note] = count
+                    else:
+                        del references[note]
+                        if note is not self._tracked:
+                            self._forget(note)
+
+    def _forget(self, note: Note) -> None:
+        self._shadow.pop(note, None)
+        self._text_edits.pop(note, None)
+
+    def _record(self, operation: Operation) -> None:
+        if self._applying:
+            return
+        self._typing_step = None
+        if self._group is not None:
+            self._group.append(operation)
+        else:
+            self._push([operation])
+
+    def _record_text(self, note: Note, old: str, new: str) -> None:
+        if self._applying:
+            return
+        start, removed, inserted = self._diff(old, new)
+        now = self.clock()
+        step = self._typing_step
+        if self._continues_typing(note, now) and step[-1][0] == 'text':
+            merged = self._merge(step[-1], start, removed, inserted)
+            if merged is not None:
+                step[-1] = merged
+            else:
+                operation = self._text_operation(note, old, start, removed, inserted)
+                step.append(operation)
+                self._refer([operation])
+            self._last_edit = now
+            return
+
+        operation = self._text_operation(note, old, start, removed, inserted)
+        if self._group is not None:
+            self._group.append(operation)
+            return
+        step = [operation]
+        self._push(step)
+        self._typing_step = step
+        self._typing_note = note
+        self._last_edit = now
+
+    def _record_field(self, note: Note, name: str, old: Any, new: Any) -> None:
+        if self._applying:
+            return
+        now = self.clock()
+        step = self._typing_step
+        if (self._continues_typing(note, now) and len(step) == 1
+                and step[0][:3] == ('field', note, name)):
+            step[0] = ('field', note, name, step[0][3], new)
+            self._last_edit = now
+            return
+
+        self._record(('field', note, name, old, new))
+        if self._group is None:
+            self._typing_step = self._undo[-1]
+            self._typing_note = note
+            self._last_edit = now
+
+    def _continues_typing(self, note: Note, now: float) -> bool:
+        """Whether an edit of `note` at `now` belongs to the step being typed"""
+        step = self._typing_step
+        return (step is not None and self._group is None and self._typing_note is note
+                and bool(self._undo) and step is self._undo[-1]
+                and now - self._last_edit <= self.coalesce_window)
+
+    def _text_operation(self, note: Note, old: str, start: int,
+                        removed: str, inserted: str) -> Operation:
+        count = self._text_edits.get(note, 0)
+        self._text_edits[note] = count + 1
+        checkpoint = old if count % self.checkpoint_interval == self.checkpoint_interval - 1 else None
+        return ('text', note, start, removed, inserted, checkpoint)
+
+    @staticmethod
+    def _merge(last: Operation, start: int, removed: str, inserted: str) -> Optional[Operation]:
+        """Combine two consecutive edits of one note into one when they touch"""
+        kind, note, last_start, last_removed, last_inserted, checkpoint = last
+        end = last_start + len(last_inserted)
+        if start == end:
+            # Typing on after the previous edit
+            return (kind, note, last_start, last_removed + removed, last_inserted + inserted, checkpoint)
+        if last_start <= start and start + len(removed) == end:
+            # Deleting back into what the previous edit inserted
+            kept = last_inserted[:start - last_start]
+            return (kind, note, last_start, last_removed, kept + inserted, checkpoint)
+        if start + len(removed) == last_start:
+            # Deleting the text just before the previous edit
+            return (kind, note, start, removed + last_removed, inserted + last_inserted, checkpoint)
+        return None
+
+    @staticmethod
+    def _diff(old: str, new: str) -> Tuple[int, str, str]:
+        """The single span replaced to turn `old` into `new`"""
+        limit = min(len(old), len(new))
+        # Binary search over slice comparisons keeps the scanning in C
+        low, high = 0, limit
+        while low < high:
+            middle = (low + high + 1) // 2
+            if old[:middle] == new[:middle]:
+                low = middle
+            else:
+                high = middle - 1
+        prefix = low
+
+        low, high = 0, limit - prefix
+        while low < high:
+            middle = (low + high + 1) // 2
+            if old[len(old) - middle:] == new[len(new) - middle:]:
+                low = middle
+            else:
+                high = middle - 1
+        suffix = low
+        return prefix, old[prefix:len(old) - suffix], new[prefix:len(new) - suffix]
+
+    # Note.events hooks
+
+    def note_created(self, note: Note) -> None:
+        self._shadow[note] = (note.title, note.text, tuple(note.tags))
+        self._record(('create', note))
+
+    def note_updated(self, note: Note, fields: Dict[str, Any]) -> None:
+        previous = self._shadow.get(note)
+        if previous is not None:
+            title, text, tags = previous
+            # One update() changing several fields is one step
+            grouped = self._group is None and len(fields) > 1
+            if grouped:
+                self._group = []
+            try:
+                if 'title' in fields:
+                    self._record_field(note, 'title', title, fields['title'])
+                if 'tags' in fields:
+                    self._record_field(note, 'tags', list(tags), list(fields['tags']))
+                if 'text' in fields:
+                    self._record_text(note, text, fields['text'])
+            finally:
+                if grouped:
+                    operations, self._group = self._group, None
+                    if operations:
+                        self._push(operations)
+            self._shadow[note] = (note.title, note.text, tuple(note.tags))
+
+    def relation_added(self, note: Note, relation: str, other: Note) -> None:
+        self._record(('link', note, relation, other, True))
+
+    def relation_removed(self, note: Note, relation: str, other: Note) -> None:
+        self._record(('link', note, relation, other, False))
+
+    def tag_changed(self, note: Note, tag: str, added: bool) -> None:
+        previous = self._shadow.get(note)
+        # A restored note announces the tags it came back with; undoing
+        # the restore must not strip them from the note
+        if added and previous is not None and tag in previous[2]:
+            return
+        self._record(('tag', note, tag, added))
+        if previous is not None:
+            title, text, _ = previous
+            self._shadow[note] = (title, text, tuple(note.tags))
+
+    def note_deleted(self, note: Note) -> None:
+        self._record(('delete', note))
+        # Restoring it publishes NoteCreated, which remembers its fields again
+        self._forget(note)